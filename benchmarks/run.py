@@ -0,0 +1,309 @@
+import argparse
+import datetime
+import json
+import logging
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+import logreporter
+from logreporter.formatter.discordreportformatter import DiscordReportFormatter
+from logreporter.report.discordwhreporter import DiscordWHReporter
+from logreporter.report.ratelimiter import RateLimiter
+from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.storage.abstractstorage import AbstractStorage
+from webhookstub import WebhookStub
+
+# Version of the format of the results file.
+RESULTS_FORMAT = 1
+# Units whose smaller values are better. The other units are throughputs.
+TIME_UNITS = ("s",)
+RECORD_TEXT = "2021-01-01 00:00:00,000:WARNING:benchmark:A warning message of the benchmark with an argument {:08d}"
+
+class Benchmark(object):
+  """
+  A measured operation. `run()` returns the value of one round in `unit`.
+  """
+
+  def __init__(self, name, unit, run):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    name: str
+      Name of the benchmark. It is the key to compare the results of different versions.
+    unit: str
+      Unit of the value, such as "records/s", "MB/s" or "s".
+    run: func(Path) -> float
+      Function that runs one round in the specified empty folder and returns the value.
+    """
+    self.name = name
+    self.unit = unit
+    self.run = run
+
+def write_backlog(filename, size):
+  """
+  Write a log file of the specified number of bytes directly, without the handler.
+
+  Returns
+  ----
+  records: int
+    Number of the records written.
+  """
+  records = 0
+  written = 0
+  with open(filename, mode="w", encoding="utf-8", newline="") as f:
+    while written < size:
+      block = "".join(RECORD_TEXT.format(records + i) + AbstractStorage.RECORD_END for i in range(1000))
+      f.write(block)
+      written += len(block.encode("utf-8"))
+      records += 1000
+  return records
+
+def make_logger(name, handler):
+  """
+  Get a logger that writes only to the handler.
+  """
+  logger = logging.getLogger("benchmark." + name)
+  logger.handlers.clear()
+  logger.propagate = False
+  logger.setLevel(logging.WARNING)
+  logger.addHandler(handler)
+  return logger
+
+def bench_emit(count):
+  """
+  Measure `logger.warning()` with `DiscordReportFormatter` in records per second.
+  """
+  def run(folder):
+    handler = ReporterLogHandler(folder / "emit.log")
+    handler.setFormatter(DiscordReportFormatter("%(asctime)s:%(levelname)s:%(name)s:%(message)s"))
+    logger = make_logger("emit", handler)
+    start = time.perf_counter()
+    for i in range(count):
+      logger.warning("A warning message of the benchmark with an argument %08d", i)
+    handler.flush()
+    elapsed = time.perf_counter() - start
+    logger.removeHandler(handler)
+    handler.close()
+    return count / elapsed
+  return run
+
+def bench_append_log(count):
+  """
+  Measure `ReporterLogHandler#append_log()` in records per second.
+  """
+  def run(folder):
+    handler = ReporterLogHandler(folder / "append.log")
+    start = time.perf_counter()
+    for i in range(count):
+      handler.append_log(RECORD_TEXT.format(i))
+    handler.flush()
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return count / elapsed
+  return run
+
+def bench_iter_chunks(size):
+  """
+  Measure cutting the whole backlog into embed-sized chunks with `ReporterLogHandler#iter_chunks()` in megabytes per second.
+  """
+  def run(folder):
+    filename = folder / "chunks.log"
+    write_backlog(filename, size)
+    handler = ReporterLogHandler(filename)
+    start = time.perf_counter()
+    for chunk in handler.iter_chunks(DiscordWHReporter.EMBED_LENGTH):
+      pass
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return size / 1024 / 1024 / elapsed
+  return run
+
+def bench_get_text(size, count=100):
+  """
+  Measure the seconds of `ReporterLogHandler#get_text()` for one embed-sized chunk at the head of the backlog, with the commit.
+  """
+  def run(folder):
+    filename = folder / "get_text.log"
+    write_backlog(filename, size)
+    handler = ReporterLogHandler(filename)
+    start = time.perf_counter()
+    for i in range(count):
+      handler.get_text(max_length=DiscordWHReporter.EMBED_LENGTH)
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return elapsed / count
+  return run
+
+def bench_drain(size):
+  """
+  Measure sending the whole backlog to a local webhook stub with `DiscordWHReporter` in megabytes per second.
+  The rate limit of Discord is not applied, so the value is the cost of the chunking, the requests and the commits.
+  """
+  def run(folder):
+    filename = folder / "drain.log"
+    write_backlog(filename, size)
+    handler = ReporterLogHandler(filename)
+    stub = WebhookStub()
+    reporter = DiscordWHReporter(stub.url, ratelimiter=RateLimiter(limit=1000000, period=1.0), max_embeds=DiscordWHReporter.MAX_EMBEDS)
+    try:
+      start = time.perf_counter()
+      reporter.request_report(handler)
+      elapsed = time.perf_counter() - start
+      if handler.has_text:
+        raise RuntimeError("The backlog was not drained.")
+    finally:
+      reporter.close()
+      stub.close()
+      handler.close()
+    return size / 1024 / 1024 / elapsed
+  return run
+
+def get_benchmarks(sizes, records, drain_size):
+  """
+  Get the benchmarks of the suite.
+
+  Parameters
+  ----
+  sizes: list of int
+    Sizes of the backlogs of the chunk extraction in megabytes.
+  records: int
+    Number of records written in a round of the write benchmarks.
+  drain_size: int
+    Size of the backlog of the drain in megabytes.
+  """
+  benchmarks = [
+    Benchmark("emit_discordformatter", "records/s", bench_emit(records)),
+    Benchmark("append_log", "records/s", bench_append_log(records)),
+  ]
+  for size in sizes:
+    benchmarks.append(Benchmark("iter_chunks_{}mb".format(size), "MB/s", bench_iter_chunks(size * 1024 * 1024)))
+    benchmarks.append(Benchmark("get_text_{}mb".format(size), "s", bench_get_text(size * 1024 * 1024)))
+  benchmarks.append(Benchmark("drain_webhookstub_{}mb".format(drain_size), "MB/s", bench_drain(drain_size * 1024 * 1024)))
+  return benchmarks
+
+def get_commit():
+  """
+  Get the commit of the working tree, or None if it is not a git repository.
+  """
+  try:
+    return subprocess.run(["git", "rev-parse", "HEAD"], cwd=str(ROOT), capture_output=True, check=True, text=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def run_suite(benchmarks, repeat, pattern=None):
+  """
+  Run the benchmarks and get the results.
+
+  Parameters
+  ----
+  benchmarks: list of Benchmark
+    Benchmarks to run.
+  repeat: int
+    Number of rounds of each benchmark. Each round runs in a new temporary folder.
+  pattern: str
+    Only the benchmarks whose names contain this string are run. None runs all.
+
+  Returns
+  ----
+  results: dict
+    Results that can be saved as JSON and compared with `compare()`.
+  """
+  results = {
+    "format": RESULTS_FORMAT,
+    "version": logreporter.__version__,
+    "commit": get_commit(),
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    "benchmarks": {},
+  }
+  for benchmark in benchmarks:
+    if pattern is not None and pattern not in benchmark.name:
+      continue
+    values = []
+    for i in range(repeat):
+      with tempfile.TemporaryDirectory() as folder:
+        values.append(benchmark.run(Path(folder)))
+    best = min(values) if benchmark.unit in TIME_UNITS else max(values)
+    results["benchmarks"][benchmark.name] = {
+      "unit": benchmark.unit,
+      "values": values,
+      "median": statistics.median(values),
+      "best": best,
+    }
+    print("{:<28}{:>16.6g} {:<10}(best {:.6g})".format(benchmark.name, statistics.median(values), benchmark.unit, best))
+  return results
+
+def compare(base, current, threshold):
+  """
+  Print the changes of the medians between two results.
+
+  Parameters
+  ----
+  base: dict
+    Results of the version compared with.
+  current: dict
+    Results of the version being checked.
+  threshold: float
+    Ratio of the change in the worse direction that is reported as a regression, such as 0.1 for 10%.
+
+  Returns
+  ----
+  regressions: list of str
+    Names of the benchmarks that regressed.
+  """
+  regressions = []
+  for name, result in current["benchmarks"].items():
+    old = base["benchmarks"].get(name)
+    if old is None or old["unit"] != result["unit"]:
+      print("{:<28}{:>16} -> {:.6g} {}".format(name, "-", result["median"], result["unit"]))
+      continue
+    change = result["median"] / old["median"] - 1
+    # A positive loss is a change in the worse direction.
+    loss = change if result["unit"] in TIME_UNITS else -change
+    mark = ""
+    if loss > threshold:
+      mark = "  REGRESSION"
+      regressions.append(name)
+    print("{:<28}{:>16.6g} -> {:.6g} {} ({:+.1%}){}".format(name, old["median"], result["median"], result["unit"], change, mark))
+  return regressions
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Run the benchmarks of LogReporter, or compare two results files.")
+  parser.add_argument("-o", "--output", help="JSON file the results are written to.")
+  parser.add_argument("-k", "--pattern", help="Run only the benchmarks whose names contain this string.")
+  parser.add_argument("--repeat", type=int, default=5, help="Number of rounds of each benchmark.")
+  parser.add_argument("--records", type=int, default=20000, help="Number of records of the write benchmarks.")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="Backlog sizes of the chunk extraction in MB.")
+  parser.add_argument("--drain-size", type=int, default=1, help="Backlog size of the drain in MB.")
+  parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+    help="Compare with a results file, or compare two results files without running the benchmarks.")
+  parser.add_argument("--threshold", type=float, default=0.1, help="Ratio of the change reported as a regression.")
+  args = parser.parse_args(argv)
+  if args.compare is not None and len(args.compare) > 2:
+    parser.error("--compare takes one or two results files.")
+  if args.compare is not None and len(args.compare) == 2:
+    base, current = [json.loads(Path(f).read_text(encoding="utf-8")) for f in args.compare]
+  else:
+    current = run_suite(get_benchmarks(args.sizes, args.records, args.drain_size), args.repeat, args.pattern)
+    if args.output is not None:
+      Path(args.output).write_text(json.dumps(current, indent=2), encoding="utf-8")
+    if args.compare is None:
+      return 0
+    base = json.loads(Path(args.compare[0]).read_text(encoding="utf-8"))
+  print()
+  return 1 if len(compare(base, current, args.threshold)) > 0 else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,131 @@
+import threading
+import time
+
+class AutoFlusher(object):
+  """
+  Uploads the log of a `Reporter` automatically on a background thread.
+  An upload is started when the unreported log exceeds a number of bytes, or when a period of time has passed since the oldest unreported log was written.
+  The records of the priority level of the handler can have a shorter period.
+  """
+
+  def __init__(self, reporter, max_bytes=1024 * 1024, interval=60.0, message="", poll=1.0, priority_interval=None):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    reporter: Reporter
+      Reporter object that uploads the log.
+    max_bytes: int
+      Number of bytes of the unreported log that starts an upload.
+    interval: float
+      Number of seconds from the oldest unreported log to an upload.
+      After a failed upload, the next one also waits for this time.
+    message: str
+      Additional message when sending logs.
+    poll: float
+      Number of seconds between checks of the log.
+    priority_interval: float
+      Number of seconds from the oldest unreported record of the priority level to an upload. None means `interval`.
+    """
+    self.reporter = reporter
+    self.max_bytes = max_bytes
+    self.interval = interval
+    self.message = message
+    self.poll = poll
+    self.priority_interval = priority_interval
+    self.last_error = None
+    self._event = threading.Event()
+    self._requested = False
+    self._stopping = False
+    self._flush_on_stop = True
+    self._retry_at = None
+    self._thread = threading.Thread(target=self._run, name="AutoFlusher", daemon=True)
+
+  @property
+  def running(self):
+    """
+    Whether the background thread is running.
+    """
+    return self._thread.is_alive()
+
+  def start(self):
+    """
+    Start the background thread.
+    """
+    self._thread.start()
+
+  def request(self):
+    """
+    Request an upload regardless of the amount of the log.
+    Requests made before the upload starts are combined into one upload.
+    """
+    self._requested = True
+    self._event.set()
+
+  def stop(self, flush=True, timeout=None):
+    """
+    Stop the background thread.
+
+    Parameters
+    ----
+    flush: bool
+      Whether to upload the remaining log before the thread stops.
+    timeout: float
+      Maximum number of seconds to wait for the thread. None means waiting until the thread stops.
+
+    Returns
+    ----
+    stopped: bool
+      False if the thread is still running after the timeout.
+    """
+    self._flush_on_stop = flush
+    self._stopping = True
+    self._event.set()
+    if self._thread.is_alive():
+      self._thread.join(timeout)
+    return not self._thread.is_alive()
+
+  def _run(self):
+    """
+    The body of the background thread.
+    """
+    while True:
+      self._event.wait(self.poll)
+      self._event.clear()
+      if self._stopping:
+        if self._flush_on_stop:
+          self._upload()
+        break
+      if self._requested or self._due():
+        self._upload()
+
+  def _due(self):
+    """
+    Check whether an upload should be started.
+    """
+    now = time.monotonic()
+    if self._retry_at is not None and now < self._retry_at:
+      return False
+    handler = self.reporter._handler
+    if handler is None:
+      return False
+    since = handler.pending_since
+    if since is not None and now - since >= self.interval or handler.pending_bytes >= self.max_bytes:
+      return True
+    since = handler.priority_pending_since
+    return self.priority_interval is not None and since is not None and now - since >= self.priority_interval
+
+  def _upload(self):
+    """
+    Upload the log and keep the error if it fails.
+    The log that could not be sent is left for the next upload.
+    """
+    self._requested = False
+    try:
+      self.reporter.upload_report(self.message)
+      self.last_error = None
+      self._retry_at = None
+    except Exception as e:
+      self.last_error = e
+      self._retry_at = time.monotonic() + self.interval
@@ -0,0 +1,132 @@
+import collections
+import random
+import threading
+import time
+
+from logreporter.report.ratelimiter import RateLimiter
+
+class SamplingRule(object):
+  """
+  A rule of `RecordSampler` that limits the records of a logger and its child loggers.
+  """
+
+  def __init__(self, logger="", level=None, limit=-1, period=60.0, sample=1.0):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    logger: str
+      Name of the logger. The rule also applies to its child loggers. An empty string means all the loggers.
+    level: int
+      Level of the records the rule applies to. None means all the levels.
+    limit: int
+      Number of records of each logger and level written in `period` seconds. -1 means no limit.
+      The records are limited by a token bucket, so up to `limit` records are written at once after a quiet period.
+    period: float
+      Length of the window of `limit` in seconds.
+    sample: float
+      Probability that a record is written, from 0.0 to 1.0. It is applied before `limit`.
+    """
+    if limit != -1 and limit < 1:
+      raise ValueError("The value of limit is out of range.")
+    if sample < 0 or sample > 1:
+      raise ValueError("The value of sample is out of range.")
+    self.logger = logger
+    self.level = level
+    self.limit = limit
+    self.period = period
+    self.sample = sample
+
+  def matches(self, record):
+    """
+    Check if the rule applies to the record.
+    """
+    if self.level is not None and record.levelno != self.level:
+      return False
+    return self.logger == "" or record.name == self.logger or record.name.startswith(self.logger + ".")
+
+class RecordSampler(object):
+  """
+  Decides which records `ReporterLogHandler` writes, before they are formatted.
+  The first rule that matches a record is applied, and the records that no rule matches are always written.
+  Each rule has a token bucket for each logger and level, so a chatty logger does not use up the records of the others.
+  The records that are not written are counted, and the handler writes the counts before the log is read.
+  """
+
+  def __init__(self, rules, random=random.random, clock=time.monotonic):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    rules: list of SamplingRule
+      Rules applied to the records, in order of priority.
+    random: func() -> float
+      Function that returns a random number from 0.0 to 1.0. Used for testing.
+    clock: func() -> float
+      Function that returns the current time in seconds. Used for testing.
+    """
+    self.rules = list(rules)
+    self.sampled_records = 0
+    self._random = random
+    self._clock = clock
+    self._lock = threading.Lock()
+    self._buckets = {}
+    self._counts = collections.OrderedDict()
+
+  @property
+  def has_counts(self):
+    """
+    Whether there are records that have not been written since the last `pop_counts()`.
+    """
+    return len(self._counts) > 0
+
+  def allow(self, record):
+    """
+    Decide whether the record is written, and count it if it is not.
+
+    Returns
+    ----
+    allowed: bool
+      False if the record must not be written.
+    """
+    for i, rule in enumerate(self.rules):
+      if rule.matches(record):
+        break
+    else:
+      return True
+    with self._lock:
+      if rule.sample >= 1 or self._random() < rule.sample:
+        if rule.limit == -1:
+          return True
+        key = (i, record.name, record.levelno)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+          bucket = self._buckets[key] = RateLimiter(limit=rule.limit, period=rule.period, clock=self._clock)
+        if bucket.take():
+          return True
+      self.sampled_records += 1
+      entry = self._counts.get((record.name, record.levelno))
+      if entry is None:
+        # [count, first, last, name, levelno, levelname]
+        self._counts[(record.name, record.levelno)] = [1, record.created, record.created, record.name, record.levelno, record.levelname]
+      else:
+        entry[0] += 1
+        entry[2] = record.created
+      return False
+
+  def pop_counts(self):
+    """
+    Get the numbers of the records that have not been written since the last call, and reset them.
+
+    Returns
+    ----
+    counts: list of tuple
+      `(count, first, last, name, levelno, levelname)` for each logger and level,
+      where `first` and `last` are the `created` times of the first and the last record not written.
+    """
+    with self._lock:
+      counts = [tuple(e) for e in self._counts.values()]
+      self._counts.clear()
+    return counts
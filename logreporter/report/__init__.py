@@ -1 +1,4 @@
-from logreporter.report.discordwhreporter import DiscordWHReporter
\ No newline at end of file
+from logreporter.report.discordwhreporter import DiscordWHReporter
+from logreporter.report.discordwhasyncreporter import DiscordWHAsyncReporter
+from logreporter.report.ratelimiter import RateLimiter
+from logreporter.report.fanoutreporter import FanOutReporter
@@ -0,0 +1,30 @@
+from abc import abstractmethod
+
+class AbstractAsyncReporter(object):
+  """
+  The base class of the Reporter for asyncio applications. This class is inherited and used.
+  It is the counterpart of `AbstractReporter`, and the log is transmitted without blocking the event loop.
+  """
+  @abstractmethod
+  async def request_report(self, log_handler, message=""):
+    """
+    Actually send a log message to the upper platform.
+    When the coroutine is awaited, `request_reporter()` uploads the string in the log to the higher platform as much as possible.
+    If the upload fails, or if all uploads are not possible, log the data that could not be sent without deleting it.
+    The blocking operations of `log_handler` must be run in an executor.
+
+    Parameters
+    ----
+    log_handler: ReporterLogHandler
+      `ReporterLogHandler` that stores the log.
+    message: str
+      Optional additional messages.
+    """
+    raise NotImplementedError
+
+  def close(self):
+    """
+    Release the resources held by the reporter, such as connections.
+    It is called when `Reporter` is closed. Nothing is done by default.
+    """
+    pass
@@ -20,3 +20,10 @@ class AbstractReporter(object):
       Optional additional messages.
     """
     raise NotImplementedError
+
+  def close(self):
+    """
+    Release the resources held by the reporter, such as connections.
+    It is called when `Reporter` is closed. Nothing is done by default.
+    """
+    pass
@@ -0,0 +1,120 @@
+import asyncio
+import functools
+
+try:
+  import aiohttp
+except ImportError:
+  aiohttp = None
+
+from logreporter.report.abstractasyncreporter import AbstractAsyncReporter
+from logreporter.report.discordwhreporter import DiscordWHReporter
+from logreporter.report.ratelimiter import RateLimiter
+
+class DiscordWHAsyncReporter(AbstractAsyncReporter):
+  """
+  Reporter notifications using Discord webhooks for asyncio applications.
+  aiohttp is required to use this class.
+  """
+  def __init__(self, url, concurrency=1, timeout=30, ratelimiter=None, rate_limit_retries=10, max_embeds=1, idempotency_keys=False):
+    """
+    constructor.
+
+    Parameters
+    ----
+    url: str
+      Webhook URL
+      ex). https://discordapp.com/api/webhooks/***
+    concurrency: int
+      Number of requests sent at the same time.
+      The chunks are always committed in the order of the log, but Discord may show the messages sent at the same time in a different order.
+    timeout: float
+      Timeout in seconds of one request.
+    ratelimiter: RateLimiter
+      Object that paces the requests. If omitted, Discord's webhook limit (5 requests per 2 seconds) is assumed.
+    rate_limit_retries: int
+      Number of times to send a chunk again when it is rejected by the rate limit (HTTP 429).
+    max_embeds: int
+      Maximum number of chunks packed into one request as embeds. Up to `DiscordWHReporter.MAX_EMBEDS`.
+    idempotency_keys: bool
+      If True, the key of each chunk is put in the footer of its embed.
+    """
+    if aiohttp is None:
+      raise ImportError("aiohttp is required to use DiscordWHAsyncReporter.")
+    if max_embeds < 1 or max_embeds > DiscordWHReporter.MAX_EMBEDS:
+      raise ValueError("The value of max_embeds is out of range.")
+    self.url = str(url)
+    self.concurrency = concurrency
+    self.timeout = timeout
+    self.ratelimiter = RateLimiter() if ratelimiter is None else ratelimiter
+    self.rate_limit_retries = rate_limit_retries
+    self.max_embeds = max_embeds
+    self.idempotency_keys = idempotency_keys
+
+  async def request_report(self, log_handler, message=""):
+    """
+    Send logs using Discord's Webhook.
+    Up to `concurrency` requests are sent at the same time, and the file operations of `log_handler` are run in the default executor.
+    The requests are committed in order, and the log after the first failed request is left in the log.
+    """
+    loop = asyncio.get_event_loop()
+    def run(func, *args):
+      return loop.run_in_executor(None, functools.partial(func, *args))
+    total_length = DiscordWHReporter.EMBEDS_LENGTH
+    if self.idempotency_keys:
+      total_length -= DiscordWHReporter.KEY_LENGTH * self.max_embeds
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+      while True:
+        groups = []
+        start = None
+        while len(groups) < self.concurrency:
+          chunks = await run(log_handler.read_chunks, DiscordWHReporter.EMBED_LENGTH, self.max_embeds, total_length, start)
+          if len(chunks) == 0:
+            break
+          groups.append(chunks)
+          start = chunks[-1].end
+        if len(groups) == 0:
+          break
+        results = await asyncio.gather(*[self._send(session, chunks, message) for chunks in groups], return_exceptions=True)
+        for chunks, result in zip(groups, results):
+          if isinstance(result, BaseException):
+            raise result
+          for chunk in chunks:
+            await run(log_handler.commit_chunk, chunk)
+
+  async def _send(self, session, chunks, message):
+    """
+    Send one request to the webhook.
+
+    Parameters
+    ----
+    session: aiohttp.ClientSession
+      Session used for the request.
+    chunks: list of LogChunk
+      Chunks packed into the request as embeds.
+    message: str
+      Optional additional messages.
+    """
+    payload = {
+      "content": message[:2000] if message != "" else __class__.__name__,
+      "embeds": [
+        {
+          "type": "article",
+          "description": chunk.text
+        } for chunk in chunks
+      ]
+    }
+    if self.idempotency_keys:
+      for embed, chunk in zip(payload["embeds"], chunks):
+        embed["footer"] = {"text": chunk.key}
+    for _ in range(self.rate_limit_retries + 1):
+      await self.ratelimiter.wait_async()
+      async with session.post(self.url, json=payload) as res:
+        body = None
+        if res.status == 429:
+          try:
+            body = await res.json(content_type=None)
+          except ValueError:
+            pass
+        if not self.ratelimiter.update_status(res.status, res.headers, body):
+          break
+    res.raise_for_status()
@@ -1,13 +1,102 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+
 import requests
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from logreporter.report.abstractreporter import AbstractReporter
+from logreporter.report.ratelimiter import RateLimiter
+
+class _MultipartBody(io.RawIOBase):
+  """
+  The body of a multipart/form-data request whose file part is read from an open file.
+  It is sent in blocks, so the file is never loaded into memory.
+  """
+
+  def __init__(self, boundary, fields, name, filename, content_type, stream):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    boundary: str
+      Boundary of the parts.
+    fields: dict
+      Names and values of the text parts.
+    name: str
+      Name of the file part.
+    filename: str
+      File name of the file part.
+    content_type: str
+      Content type of the file.
+    stream: BinaryIO
+      Seekable stream of the file.
+    """
+    super().__init__()
+    head = "".join("--{}\r\nContent-Disposition: form-data; name=\"{}\"\r\nContent-Type: application/json\r\n\r\n{}\r\n".format(
+      boundary, k, v) for k, v in fields.items())
+    head += "--{}\r\nContent-Disposition: form-data; name=\"{}\"; filename=\"{}\"\r\nContent-Type: {}\r\n\r\n".format(
+      boundary, name, filename, content_type)
+    self._head = head.encode("utf-8")
+    self._tail = "\r\n--{}--\r\n".format(boundary).encode("utf-8")
+    self._stream = stream
+    self._size = stream.seek(0, os.SEEK_END)
+    self._position = 0
+
+  def __len__(self):
+    return len(self._head) + self._size + len(self._tail)
+
+  def readable(self):
+    return True
+
+  def seekable(self):
+    return True
+
+  def tell(self):
+    return self._position
+
+  def seek(self, offset, whence=os.SEEK_SET):
+    self._position = offset if whence == os.SEEK_SET else (self._position if whence == os.SEEK_CUR else len(self)) + offset
+    return self._position
+
+  def readinto(self, buffer):
+    head = len(self._head)
+    if self._position < head:
+      data = self._head[self._position:self._position + len(buffer)]
+    elif self._position < head + self._size:
+      self._stream.seek(self._position - head)
+      data = self._stream.read(min(len(buffer), head + self._size - self._position))
+    else:
+      data = self._tail[self._position - head - self._size:][:len(buffer)]
+    buffer[:len(data)] = data
+    self._position += len(data)
+    return len(data)
 
 class DiscordWHReporter(AbstractReporter):
   """
   Reporter notifications using Discord webhooks.
   """
-  def __init__(self, url):
+  # Maximum number of characters of the description of an embed.
+  EMBED_LENGTH = 2000
+  # Maximum number of characters of all the embeds in a message.
+  EMBEDS_LENGTH = 6000
+  # Maximum number of embeds in a message.
+  MAX_EMBEDS = 10
+  # Number of characters of the idempotency key put in the footer of an embed.
+  KEY_LENGTH = 32
+  # Maximum number of uncompressed bytes of the log in an attachment.
+  ATTACHMENT_BYTES = 8 * 1024 * 1024
+  # Number of characters of the chunks read to make an attachment.
+  ATTACHMENT_CHUNK_LENGTH = 65536
+  ATTACHMENT_MESSAGE = "{size} bytes of the log are attached as {filename}."
+
+  def __init__(self, url, pool_size=1, timeout=(10, 30), retries=3, ratelimiter=None, rate_limit_retries=10, max_embeds=1,
+    idempotency_keys=False, attach_threshold=-1, attach_gzip=True):
     """
     constructor.
 
@@ -16,27 +105,149 @@ class DiscordWHReporter(AbstractReporter):
     url: str
       Webhook URL
       ex). https://discordapp.com/api/webhooks/***
+    pool_size: int
+      Maximum number of connections kept alive for the webhook.
+    timeout: float or tuple
+      Timeout in seconds of one request. A tuple of (connect timeout, read timeout) can also be specified.
+    retries: int
+      Number of times to retry a request when the connection fails or is reset.
+    ratelimiter: RateLimiter
+      Object that paces the requests. If omitted, Discord's webhook limit (5 requests per 2 seconds) is assumed.
+    rate_limit_retries: int
+      Number of times to send a chunk again when it is rejected by the rate limit (HTTP 429).
+    max_embeds: int
+      Maximum number of chunks packed into one request as embeds. Up to `MAX_EMBEDS`.
+      If 2 or more is set, each request is filled with as many chunks as Discord's limits allow.
+    idempotency_keys: bool
+      If True, the key of each chunk is put in the footer of its embed,
+      so the receiver can find the chunk sent again after a crash before it was committed.
+    attach_threshold: int
+      Number of bytes of the log above which the log is sent as a file attached to one request instead of embeds.
+      -1 never attaches the log.
+    attach_gzip: bool
+      Whether to compress the attached file with gzip.
     """
+    if max_embeds < 1 or max_embeds > self.MAX_EMBEDS:
+      raise ValueError("The value of max_embeds is out of range.")
     self.url = str(url)
+    self.timeout = timeout
+    self.ratelimiter = RateLimiter() if ratelimiter is None else ratelimiter
+    self.rate_limit_retries = rate_limit_retries
+    self.max_embeds = max_embeds
+    self.idempotency_keys = idempotency_keys
+    self.attach_threshold = attach_threshold
+    self.attach_gzip = attach_gzip
+    # The connections are reused by all the requests while this object is alive.
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+      max_retries=Retry(total=retries, connect=retries, read=retries, status=0, allowed_methods=None, raise_on_status=False))
+    self.session.mount("https://", adapter)
+    self.session.mount("http://", adapter)
 
   def request_report(self, log_handler, message=""):
     """
     Send logs using Discord's Webhook.
+    The requests are paced by `ratelimiter`, and a chunk rejected by the rate limit is sent again after the specified time.
+    The chunks packed into a request are committed only when the request succeeds.
+    If the log exceeds `attach_threshold` bytes, it is sent as attached files first.
     """
-    def send(text):
+    def send(texts, keys=None):
       payload = {
         "content": message[:2000] if message != "" else __class__.__name__,
         "embeds": [
           {
             "type": "article",
             "description": text
-          }
+          } for text in texts
         ]
       }
-      res = requests.post(self.url, json=payload, headers=headers)
-      res.raise_for_status()
+      if keys is not None:
+        for embed, key in zip(payload["embeds"], keys):
+          embed["footer"] = {"text": key}
+      self._post(json=payload, headers=headers)
       return True
     headers = {"Content-Type": "application/json"}
-    while log_handler.has_text:
-      log_handler.get_text(max_length=2000, report=send)
-      time.sleep(0.01)
\ No newline at end of file
+    if self.attach_threshold != -1:
+      while log_handler.pending_bytes > self.attach_threshold:
+        if not self._send_attachment(log_handler, message):
+          break
+    if not self.idempotency_keys:
+      # The log may remain without being readable, such as a record being written by another process.
+      while log_handler.has_text:
+        if len(log_handler.get_texts(max_length=self.EMBED_LENGTH, count=self.max_embeds, total_length=self.EMBEDS_LENGTH, report=send)) == 0:
+          break
+      return
+    # The footers also count toward the limit of all the embeds.
+    total_length = self.EMBEDS_LENGTH - self.KEY_LENGTH * self.max_embeds
+    while True:
+      chunks = log_handler.read_chunks(self.EMBED_LENGTH, self.max_embeds, total_length)
+      if len(chunks) == 0:
+        break
+      send([c.text for c in chunks], [c.key for c in chunks])
+      for chunk in chunks:
+        log_handler.commit_chunk(chunk)
+
+  def _send_attachment(self, log_handler, message):
+    """
+    Send the log as a file attached to one request, and commit the whole range when the request succeeds.
+    The log is written to a temporary file and sent from it, so it is never loaded into memory.
+    Up to `ATTACHMENT_BYTES` bytes of the log are attached, unless the first chunk is larger than that.
+
+    Returns
+    ----
+    sent: bool
+      False if no log could be read.
+    """
+    filename = "log.txt.gz" if self.attach_gzip else "log.txt"
+    with tempfile.TemporaryFile() as f:
+      out = gzip.GzipFile(fileobj=f, mode="wb") if self.attach_gzip else f
+      first = None
+      last = None
+      size = 0
+      for chunk in log_handler.iter_chunks(self.ATTACHMENT_CHUNK_LENGTH):
+        data = (chunk.text + "\n").encode("utf-8")
+        if first is not None and size + len(data) > self.ATTACHMENT_BYTES:
+          # The chunk is left for the next attachment. Only the first chunk may exceed the limit by itself.
+          break
+        out.write(data)
+        size += len(data)
+        if first is None:
+          first = chunk
+        last = chunk
+        if size >= self.ATTACHMENT_BYTES:
+          break
+      if self.attach_gzip:
+        out.close()
+      if first is None:
+        return False
+      payload = {
+        "content": "{}\n{}".format(message[:1000] if message != "" else __class__.__name__,
+          self.ATTACHMENT_MESSAGE.format(size=size, filename=filename)),
+        "attachments": [{"id": 0, "filename": filename}]
+      }
+      boundary = uuid.uuid4().hex
+      body = _MultipartBody(boundary, {"payload_json": json.dumps(payload)}, "files[0]", filename,
+        "application/gzip" if self.attach_gzip else "text/plain; charset=utf-8", f)
+      self._post(data=body, headers={"Content-Type": "multipart/form-data; boundary=" + boundary})
+    log_handler.commit_chunk(first._replace(text="", end=last.end))
+    return True
+
+  def _post(self, **kwargs):
+    """
+    Send a request to the webhook, and send it again while it is rejected by the rate limit.
+    A stream in `data` is sent again from the beginning.
+    """
+    for _ in range(self.rate_limit_retries + 1):
+      if "data" in kwargs:
+        kwargs["data"].seek(0)
+      self.ratelimiter.wait()
+      res = self.session.post(self.url, timeout=self.timeout, **kwargs)
+      if not self.ratelimiter.update(res):
+        break
+    res.raise_for_status()
+
+  def close(self):
+    """
+    Close the connections kept alive for the webhook.
+    """
+    self.session.close()
@@ -0,0 +1,208 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from logreporter.report.abstractasyncreporter import AbstractAsyncReporter
+from logreporter.report.abstractreporter import AbstractReporter
+from logreporter.storage.abstractstorage import LogChunk
+
+class _SinkHandler(object):
+  """
+  The log handler seen by one reporter of `FanOutReporter`.
+  It reads the log of the actual handler from the position the reporter has acknowledged,
+  and the chunks committed by the reporter only advance that position.
+  """
+
+  def __init__(self, handler):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    handler: ReporterLogHandler
+      `ReporterLogHandler` that stores the log.
+    """
+    self.handler = handler
+    self._lock = threading.Lock()
+    self._offset = handler.storage.offset
+    self._generation = handler.storage.generation
+
+  @property
+  def offset(self):
+    """
+    The position acknowledged by the reporter.
+    It is moved to the committed position of the storage when the storage has dropped the log before it.
+    """
+    storage = self.handler.storage
+    with self._lock:
+      if self._generation != storage.generation:
+        self._offset = storage.offset
+        self._generation = storage.generation
+      self._offset = max(self._offset, storage.offset)
+      return self._offset
+
+  @property
+  def has_text(self):
+    """
+    Check if the log text that the reporter has not acknowledged exists.
+    It is only checked while the reporter is sending the log, so the pending records are written to the storage first.
+    """
+    self.handler._flush_pending()
+    return self.handler.has_text and self.handler.storage.end > self.offset
+
+  @property
+  def pending_bytes(self):
+    """
+    Number of bytes of the log that the reporter has not acknowledged.
+    """
+    return max(self.handler.pending_bytes - (self.offset - self.handler.storage.offset), 0)
+
+  def get_text(self, max_length=-1, report=None):
+    """
+    Same as `ReporterLogHandler#get_text()`, but only the position of the reporter is committed.
+    """
+    if max_length == 0 or max_length == 1:
+      raise ValueError("The value of max_length is out of range.")
+    self.handler._flush_pending()
+    chunks = self.handler.storage.read_chunks(max_length, start=self.offset)
+    if len(chunks) == 0:
+      return ""
+    if report is None or report(chunks[0].text):
+      self.commit_chunk(chunks[0])
+    return chunks[0].text
+
+  def get_texts(self, max_length, count, total_length=-1, report=None):
+    """
+    Same as `ReporterLogHandler#get_texts()`, but only the position of the reporter is committed.
+    """
+    chunks = self.read_chunks(max_length, count, total_length)
+    texts = [c.text for c in chunks]
+    if len(chunks) > 0 and (report is None or report(texts)):
+      for chunk in chunks:
+        self.commit_chunk(chunk)
+    return texts
+
+  def read_chunks(self, max_length, count=1, total_length=-1, start=None):
+    """
+    Same as `ReporterLogHandler#read_chunks()`, but the chunks start at the position of the reporter by default.
+    """
+    return self.handler.read_chunks(max_length, count, total_length, self.offset if start is None else start)
+
+  def iter_chunks(self, max_length, start=None):
+    """
+    Same as `ReporterLogHandler#iter_chunks()`, but the chunks start at the position of the reporter by default.
+    """
+    return self.handler.iter_chunks(max_length, self.offset if start is None else start)
+
+  def commit_chunk(self, chunk):
+    """
+    Record that the reporter has sent the chunk.
+    The log is not removed from the storage until `FanOutReporter` commits it.
+
+    Returns
+    ----
+    committed: bool
+      False if the chunks before it have not been committed, or the storage has dropped the log since the chunk was read.
+    """
+    offset = self.offset
+    with self._lock:
+      if chunk.start > offset or chunk.generation != self._generation:
+        return False
+      self._offset = max(self._offset, chunk.end)
+      return True
+
+class FanOutReporter(AbstractReporter):
+  """
+  Reporter that sends the same log to several reporters at the same time.
+  Each reporter runs on a thread pool and reads the log from its own position,
+  and the log is removed only when all the reporters, or `quorum` of them, have sent it.
+  The positions of the reporters are kept in memory, so after a restart the reporters resume from the committed position.
+  """
+
+  def __init__(self, reporters, quorum=None, max_workers=None):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    reporters: list of AbstractReporter or AbstractAsyncReporter
+      Reporters the log is sent to. An `AbstractAsyncReporter` runs on its own event loop in the thread pool.
+    quorum: int
+      Number of reporters that must have sent the log before it is removed. If omitted, all the reporters are required.
+      The log that the other reporters have not sent yet is skipped by them.
+    max_workers: int
+      Number of threads of the pool. If omitted, one thread per reporter.
+    """
+    if len(reporters) == 0:
+      raise ValueError("At least one reporter is required.")
+    quorum = len(reporters) if quorum is None else quorum
+    if quorum < 1 or quorum > len(reporters):
+      raise ValueError("The value of quorum is out of range.")
+    self.reporters = list(reporters)
+    self.quorum = quorum
+    self.errors = [None] * len(self.reporters)
+    self._executor = ThreadPoolExecutor(max_workers=max_workers or len(self.reporters), thread_name_prefix="FanOutReporter")
+    self._sinks = None
+
+  def request_report(self, log_handler, message=""):
+    """
+    Send the log to all the reporters at the same time, and remove the log that `quorum` reporters have sent.
+    The exception of each reporter is kept in `errors`.
+    If fewer than `quorum` reporters have succeeded, the first exception is raised.
+    The handler must not have the priority storage, because only the position in the main storage is kept for each reporter.
+    """
+    if log_handler.priority_storage is not None:
+      raise ValueError("FanOutReporter does not support priority_level.")
+    if self._sinks is None or self._sinks[0].handler is not log_handler:
+      self._sinks = [_SinkHandler(log_handler) for _ in self.reporters]
+    futures = [self._executor.submit(self._run, reporter, sink, message) for reporter, sink in zip(self.reporters, self._sinks)]
+    succeeded = 0
+    for i, future in enumerate(futures):
+      try:
+        future.result()
+        self.errors[i] = None
+        succeeded += 1
+      except Exception as e:
+        self.errors[i] = e
+    self._commit(log_handler)
+    if succeeded < self.quorum:
+      raise next(e for e in self.errors if e is not None)
+
+  def close(self):
+    """
+    Close all the reporters and stop the thread pool.
+    """
+    self._executor.shutdown()
+    for reporter in self.reporters:
+      reporter.close()
+
+  @property
+  def offsets(self):
+    """
+    The positions acknowledged by the reporters. Empty before the first report.
+    """
+    return [] if self._sinks is None else [sink.offset for sink in self._sinks]
+
+  @staticmethod
+  def _run(reporter, sink, message):
+    """
+    Run a reporter on a thread of the pool.
+    """
+    if isinstance(reporter, AbstractAsyncReporter):
+      loop = asyncio.new_event_loop()
+      try:
+        loop.run_until_complete(reporter.request_report(sink, message))
+      finally:
+        loop.close()
+    else:
+      reporter.request_report(sink, message)
+
+  def _commit(self, log_handler):
+    """
+    Commit the log up to the position that `quorum` reporters have acknowledged.
+    """
+    storage = log_handler.storage
+    with storage.lock:
+      position = sorted((sink.offset for sink in self._sinks), reverse=True)[self.quorum - 1]
+      if position > storage.offset:
+        log_handler.commit_chunk(LogChunk("", storage.offset, position, storage.generation))
@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+class RateLimiter(object):
+  """
+  A token bucket that paces the requests to a web service.
+  The bucket is refilled at a constant rate, and it is synchronized with the rate limit headers returned by the service.
+  """
+
+  def __init__(self, limit=5, period=2.0, clock=time.monotonic, sleep=time.sleep):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    limit: int
+      Number of requests allowed in `period` seconds. It is also the capacity of the bucket.
+    period: float
+      Length of the rate limit window in seconds.
+    clock: func() -> float
+      Function that returns the current time in seconds. Used for testing.
+    sleep: func(float)
+      Function that waits for the specified number of seconds. Used for testing.
+    """
+    self.limit = limit
+    self.period = period
+    self._clock = clock
+    self._sleep = sleep
+    self._tokens = float(limit)
+    self._updated = clock()
+    self._blocked_until = None
+
+  @property
+  def remaining(self):
+    """
+    Number of requests that can be sent without waiting.
+    """
+    self._refill()
+    return int(self._tokens)
+
+  @property
+  def delay(self):
+    """
+    Number of seconds to wait before the next request can be sent.
+    """
+    now = self._refill()
+    delay = 0.0 if self._tokens >= 1 else (1 - self._tokens) * self.period / self.limit
+    if self._blocked_until is not None:
+      delay = max(delay, self._blocked_until - now)
+    return delay
+
+  @property
+  def state(self):
+    """
+    The current pacing state as a dictionary, for inspection.
+    """
+    return {
+      "limit": self.limit,
+      "period": self.period,
+      "remaining": self.remaining,
+      "delay": self.delay,
+    }
+
+  def wait(self):
+    """
+    Wait until the next request can be sent, and take a token from the bucket.
+    """
+    delay = self.delay
+    while delay > 0:
+      self._sleep(delay)
+      delay = self.delay
+    self._tokens -= 1
+
+  def take(self):
+    """
+    Take a token from the bucket only if the next request can be sent without waiting.
+
+    Returns
+    ----
+    taken: bool
+      False if the bucket is empty.
+    """
+    if self.delay > 0:
+      return False
+    self._tokens -= 1
+    return True
+
+  async def wait_async(self):
+    """
+    Coroutine version of `wait()`. The event loop is not blocked while waiting.
+    """
+    delay = self.delay
+    while delay > 0:
+      await asyncio.sleep(delay)
+      delay = self.delay
+    self._tokens -= 1
+
+  def update(self, response):
+    """
+    Synchronize the bucket with the rate limit headers of the response.
+
+    Parameters
+    ----
+    response: requests.Response
+      Response of the request.
+
+    Returns
+    ----
+    limited: bool
+      True if the request was rejected by the rate limit (HTTP 429) and should be sent again.
+    """
+    body = None
+    if response.status_code == 429:
+      try:
+        body = response.json()
+      except ValueError:
+        pass
+    return self.update_status(response.status_code, response.headers, body)
+
+  def update_status(self, status, headers, body=None):
+    """
+    Synchronize the bucket with the status and the rate limit headers of a response.
+    Use this method for responses of HTTP clients other than requests.
+
+    Parameters
+    ----
+    status: int
+      HTTP status code.
+    headers: Mapping
+      Response headers. The keys must be case-insensitive.
+    body: dict
+      JSON body of the response, if any.
+
+    Returns
+    ----
+    limited: bool
+      True if the request was rejected by the rate limit (HTTP 429) and should be sent again.
+    """
+    now = self._refill()
+    if "X-RateLimit-Limit" in headers:
+      self.limit = int(headers["X-RateLimit-Limit"])
+    reset_after = headers.get("X-RateLimit-Reset-After")
+    if "X-RateLimit-Remaining" in headers:
+      remaining = float(headers["X-RateLimit-Remaining"])
+      self._tokens = min(self._tokens, remaining)
+      if remaining < 1 and reset_after is not None:
+        self._blocked_until = now + float(reset_after)
+    if status != 429:
+      return False
+    retry_after = headers.get("Retry-After")
+    if retry_after is None and isinstance(body, dict):
+      retry_after = body.get("retry_after")
+    if retry_after is None:
+      retry_after = reset_after if reset_after is not None else self.period
+    self._tokens = 0.0
+    self._blocked_until = now + float(retry_after)
+    return True
+
+  def _refill(self):
+    """
+    Add the tokens for the elapsed time to the bucket.
+
+    Returns
+    ----
+    now: float
+      The current time.
+    """
+    now = self._clock()
+    self._tokens = min(float(self.limit), self._tokens + (now - self._updated) * self.limit / self.period)
+    self._updated = now
+    if self._blocked_until is not None and self._blocked_until <= now:
+      self._blocked_until = None
+    return now
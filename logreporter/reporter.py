@@ -1,34 +1,60 @@
 
+import asyncio
+import atexit
 import logging
+import threading
 
+from logreporter.autoflusher import AutoFlusher
+from logreporter.report.abstractasyncreporter import AbstractAsyncReporter
 from logreporter.reporterloghandler import ReporterLogHandler
 
 class Reporter(object):
   """
   The main class that reports logs.
-  This object has a singleton implementation. Therefore, the same object can always be obtained on one application.
+  There is one object for each name in the process. Therefore, the same object can always be obtained with the same name,
+  and `Reporter()` always returns the default object.
+  The objects with different names have their own log, formatter, reporter and upload, so that they never wait for each other.
   """
-  _instance = None
+  _instances = {}
+  _instanceslock = threading.Lock()
+  # Number of seconds between the tries to take the upload lock in `upload_report_async()`.
+  LOCK_POLL = 0.05
 
   def __init__(self, *args, **kwargs):
     pass
 
-  def __new__(cls, *args, **kwargs):
-    if cls._instance is None:
-      cls._instance = super().__new__(cls)
-      cls._instance.__initialize(*args, **kwargs)
-    return cls._instance
+  def __new__(cls, name=None, *args, **kwargs):
+    with cls._instanceslock:
+      instance = cls._instances.get(name)
+      if instance is None:
+        instance = super().__new__(cls)
+        instance.__initialize(name)
+        cls._instances[name] = instance
+    return instance
 
-  def __initialize(self):
+  def __initialize(self, name):
     """
     A method that behaves as a constructor.
-    This method is only executed when there is no instance of this class in the process.
+    This method is only executed when there is no instance of this name in the process.
+
+    Parameters
+    ----
+    name: str or None
+      Name of the object. None for the default object.
     """
+    self.name = name
     self._handler = None
     self.logger = None
     self.reporter = None
+    self._autoflusher = None
+    self._exit_timeout = None
+    self._uploadlock = threading.Lock()
+    atexit.register(self.close)
 
-  def setup(self, logger, reporter, filename=None, format=None, enabled=True, ):
+  def setup(self, logger, reporter, filename=None, format=None, enabled=True,
+      async_mode=False, queue_size=1000, overflow=ReporterLogHandler.OVERFLOW_BLOCK, storage=None, dedupe_size=0,
+      lazy_format=False, shared=False, flush_records=1, flush_interval=None, flush_level=logging.ERROR,
+      priority_level=None, priority_share=4, sampler=None):
     """
     Set up the Reporter object.
 
@@ -36,21 +62,59 @@ class Reporter(object):
     ----
     logger: logging.Logger
       Logger object.
-    reporter: AbstractReporter
+    reporter: AbstractReporter or AbstractAsyncReporter
       Reporter object.
     filename: Path or str
       Log file name. If omitted, it will be created in the same folder as the module file.
+      The log file of a named object is named after the object.
     format: logging.Formatter or str
       Log output format.
     enabled: bool
       A flag that indicates whether to enable log collection. No logs are collected when set to False.
+    async_mode: bool
+      If True, logs are written to the log file by a writer thread instead of the logging thread.
+    queue_size: int
+      Maximum number of records waiting to be written in asynchronous mode.
+    overflow: str
+      What to do when the queue is full in asynchronous mode. See `ReporterLogHandler`.
+    storage: AbstractStorage
+      Storage that keeps the log, such as `MemoryStorage`. If omitted, the log is kept in the file of `filename`.
+    dedupe_size: int
+      Number of kinds of records whose duplicates are summarized instead of being written. 0 disables it. See `ReporterLogHandler`.
+    lazy_format: bool
+      If True, records are serialized when they are logged and formatted when the log is uploaded. See `ReporterLogHandler`.
+    shared: bool
+      If True, the log file is shared by several processes, and only one of them uploads at a time. See `SharedFileStorage`.
+    flush_records: int
+      Number of records kept in the write buffer before it is flushed. See `ReporterLogHandler`.
+    flush_interval: float
+      Maximum number of seconds a record is kept in the write buffer. None means no limit.
+    flush_level: int
+      Level of the records that are flushed at once.
+    priority_level: int
+      Level of the records that are reported before the other records. None disables it. See `ReporterLogHandler`.
+    priority_share: int
+      Number of chunks of the priority records reported in a row before the other records. See `ReporterLogHandler`.
+    sampler: RecordSampler
+      Sampler that limits the records written for each logger and level. See `RecordSampler`.
     """
-    self._handler = ReporterLogHandler(filename=filename)
-    self.setformat(format)
-    self.enabled = enabled
-    self.logger = logger
-    self.reporter = reporter
-    logger.addHandler(self._handler)
+    if filename is None and storage is None and self.name is not None:
+      default = ReporterLogHandler.get_defaultfilename()
+      filename = default.with_name("{}.{}{}".format(default.stem, self.name, default.suffix))
+    with self._uploadlock:
+      # The handler and the reporter of the previous setup are released.
+      self._detach()
+      if self.reporter is not None and self.reporter is not reporter:
+        self.reporter.close()
+      self._handler = ReporterLogHandler(filename=filename, async_mode=async_mode, queue_size=queue_size, overflow=overflow,
+        storage=storage, dedupe_size=dedupe_size, lazy_format=lazy_format, shared=shared,
+        flush_records=flush_records, flush_interval=flush_interval, flush_level=flush_level,
+        priority_level=priority_level, priority_share=priority_share, sampler=sampler)
+      self.setformat(format)
+      self.enabled = enabled
+      self.logger = logger
+      self.reporter = reporter
+      logger.addHandler(self._handler)
 
   def setformat(self, format):
     """
@@ -81,6 +145,43 @@ class Reporter(object):
     """
     Extract the log and send it.
     The transmission process depends on the reporter object set in `Reporter # setup ()`.
+    If it is an `AbstractAsyncReporter`, it is run on a new event loop. Use `upload_report_async()` in a running event loop.
+    If the log is shared by several processes and another process is uploading it, nothing is sent.
+
+    Parameters
+    ----
+    message: str
+      Additional message when sending logs.
+
+    Returns
+    ----
+    successful: bool
+      A value that indicates whether all logs have been sent. If the log remains, it will be False.
+    """
+    result = True
+    if self.reporter is not None:
+      with self._uploadlock:
+        self._handler.flush_queue()
+        storage = self._handler.storage
+        if storage.acquire_uploader():
+          try:
+            if isinstance(self.reporter, AbstractAsyncReporter):
+              loop = asyncio.new_event_loop()
+              try:
+                loop.run_until_complete(self.reporter.request_report(self._handler, message))
+              finally:
+                loop.close()
+            else:
+              self.reporter.request_report(self._handler, message)
+          finally:
+            storage.release_uploader()
+        result = not self._handler.has_text
+    return result
+
+  async def upload_report_async(self, message=""):
+    """
+    Coroutine version of `upload_report()`. The event loop is never blocked.
+    An `AbstractAsyncReporter` is awaited directly, and an `AbstractReporter` is run in the default executor.
 
     Parameters
     ----
@@ -94,10 +195,135 @@ class Reporter(object):
     """
     result = True
     if self.reporter is not None:
-      self.reporter.request_report(self._handler, message)
-      result = not self._handler.has_text
+      loop = asyncio.get_running_loop()
+      # The lock is taken on this thread without waiting, so it is never left taken when the coroutine is cancelled.
+      while not self._uploadlock.acquire(blocking=False):
+        await asyncio.sleep(self.LOCK_POLL)
+      try:
+        await loop.run_in_executor(None, self._handler.flush_queue)
+        storage = self._handler.storage
+        # The uploader lock does not wait either, and it is released by the same thread that has taken it.
+        if storage.acquire_uploader():
+          try:
+            if isinstance(self.reporter, AbstractAsyncReporter):
+              await self.reporter.request_report(self._handler, message)
+            else:
+              await loop.run_in_executor(None, self.reporter.request_report, self._handler, message)
+          finally:
+            storage.release_uploader()
+        result = not await loop.run_in_executor(None, lambda: self._handler.has_text)
+      finally:
+        self._uploadlock.release()
     return result
 
+  def start_autoflush(self, max_bytes=1024 * 1024, interval=60.0, exit_timeout=10.0, message="", poll=1.0, priority_interval=None):
+    """
+    Start uploading the log automatically on a background thread.
+    The log is uploaded when it exceeds `max_bytes`, or when `interval` seconds have passed since the oldest log that has not been sent.
+
+    Parameters
+    ----
+    max_bytes: int
+      Number of bytes of the log that starts an upload.
+    interval: float
+      Number of seconds from the oldest log that has not been sent to an upload.
+    exit_timeout: float
+      Maximum number of seconds for the last upload when `close()` is called. None means no limit.
+    message: str
+      Additional message when sending logs.
+    poll: float
+      Number of seconds between checks of the log.
+    priority_interval: float
+      Number of seconds from the oldest record of the priority level that has not been sent to an upload.
+      It is the latency target of those records. None means `interval`.
+    """
+    self.stop_autoflush(flush=False)
+    self._exit_timeout = exit_timeout
+    self._autoflusher = AutoFlusher(self, max_bytes=max_bytes, interval=interval, message=message, poll=poll,
+      priority_interval=priority_interval)
+    self._autoflusher.start()
+
+  def stop_autoflush(self, flush=True, timeout=None):
+    """
+    Stop uploading the log automatically.
+
+    Parameters
+    ----
+    flush: bool
+      Whether to upload the remaining log before stopping.
+    timeout: float
+      Maximum number of seconds to wait for the last upload. None means no limit.
+
+    Returns
+    ----
+    stopped: bool
+      False if the last upload is still running after the timeout.
+    """
+    stopped = True
+    if self._autoflusher is not None:
+      stopped = self._autoflusher.stop(flush=flush, timeout=timeout)
+      self._autoflusher = None
+    return stopped
+
+  def request_upload(self):
+    """
+    Ask the background thread started by `start_autoflush()` to upload the log.
+    The requests made before the upload starts are combined into one upload.
+    If the background thread is not running, the log is uploaded immediately.
+    """
+    if self._autoflusher is not None:
+      self._autoflusher.request()
+    else:
+      self.upload_report()
+
+  def close(self):
+    """
+    Close the reporter object and the log file.
+    If the log is uploaded automatically, the remaining log is uploaded within `exit_timeout` seconds first.
+    This method is called automatically when the application exits.
+
+    Returns
+    ----
+    closed: bool
+      False if the last upload is still running after `exit_timeout` seconds.
+    """
+    if not self.stop_autoflush(timeout=self._exit_timeout):
+      # The last upload is still running. The log file and the connections are left to the end of the process.
+      return False
+    if self.reporter is not None:
+      self.reporter.close()
+    if self._handler is not None:
+      self._handler.close()
+    return True
+
+  def teardown(self):
+    """
+    Close the object, remove its handler from the logger and forget the object.
+    The next call with the same name creates a new object.
+    """
+    closed = self.close()
+    self._detach(close=closed)
+    atexit.unregister(self.close)
+    with self._instanceslock:
+      if self._instances.get(self.name) is self:
+        del self._instances[self.name]
+
+  def _detach(self, close=True):
+    """
+    Remove the handler from the logger and close it.
+
+    Parameters
+    ----
+    close: bool
+      Whether to close the handler. It is left open while the last upload is using it.
+    """
+    if self._handler is not None:
+      if self.logger is not None:
+        self.logger.removeHandler(self._handler)
+      if close:
+        self._handler.close()
+      self._handler = None
+
   #region properties
 
   @property
@@ -114,6 +340,20 @@ class Reporter(object):
     """
     self._handler.enabled = value
 
+  @property
+  def dropped_records(self):
+    """
+    Returns the number of logs discarded because the queue was full in asynchronous mode.
+    """
+    return self._handler.dropped_records
+
+  @property
+  def last_upload_error(self):
+    """
+    Returns the exception of the last failed upload on the background thread, or None.
+    """
+    return self._autoflusher.last_error if self._autoflusher is not None else None
+
   @property
   def log_remaining(self):
     """
@@ -128,9 +368,9 @@ class Reporter(object):
   @staticmethod
   def reset():
     """
-    Destroy an instance of the class and reset all states.
+    Destroy all the instances of the class and reset all states.
     This method is only used for unit tests.
     """
-    Reporter._instance = None
+    Reporter._instances = {}
 
   #endregion
@@ -1,12 +1,50 @@
+import collections
+import copy
+import json
 import logging
 from pathlib import Path
+import queue
+import threading
+import time
 
-class ReporterLogHandler(logging.FileHandler):
+from logreporter.storage.abstractstorage import AbstractStorage
+from logreporter.storage.filestorage import FileStorage
+from logreporter.storage.memorystorage import MemoryStorage
+from logreporter.storage.sharedfilestorage import SharedFileStorage
+
+_default_formatter = logging.Formatter()
+
+def _is_json_value(value):
+  """
+  Check if an argument of the log message is the same value after it is serialized in JSON and restored.
+  Subclasses such as enums are formatted differently from the restored values, so only the exact types are accepted.
+  """
+  return value is None or type(value) in (str, int, float, bool)
+
+class ReporterLogHandler(logging.Handler):
   """
   Log handler for Reporter processing.
+  The log is kept in a storage object. By default, it is a `FileStorage`.
   """
+  OVERFLOW_BLOCK = "block"
+  OVERFLOW_DROP_OLDEST = "drop_oldest"
+  OVERFLOW_DROP_NEWEST = "drop_newest"
+  # Maximum number of records the writer thread writes with a single flush.
+  WRITE_BATCH_SIZE = 100
+  _STOP = object()
+  # Records end with the record separator so that the chunker can tell the records that have line breaks.
+  terminator = AbstractStorage.RECORD_END
+  DUPLICATE_MESSAGE = "\"{message}\" was repeated {count} more times from {first} to {last}."
+  SAMPLED_MESSAGE = "{count} {levelname} records of \"{name}\" were not written by the sampling from {first} to {last}."
+  # Attributes of the record kept in lazy format mode.
+  RECORD_FIELDS = ("name", "msg", "args", "levelname", "levelno", "pathname", "filename", "module", "lineno", "funcName",
+    "created", "msecs", "relativeCreated", "thread", "threadName", "processName", "process", "exc_text", "stack_info")
+  # Number of bytes of the serialized records read at a time in lazy format mode.
+  RENDER_BLOCK = 65536
 
-  def __init__(self, filename=None):
+  def __init__(self, filename=None, async_mode=False, queue_size=1000, overflow=OVERFLOW_BLOCK, storage=None, dedupe_size=0,
+      lazy_format=False, raw_storage=None, shared=False, flush_records=1, flush_interval=None, flush_level=logging.ERROR,
+      priority_level=None, priority_storage=None, priority_share=4, sampler=None):
     """
     Constructor.
 
@@ -14,12 +52,133 @@ class ReporterLogHandler(logging.FileHandler):
     ----
     filename: Path or str
       Log file name. If omitted, it will be created in the same folder as the module file.
+      It is ignored if `storage` is specified.
+    async_mode: bool
+      If True, `emit()` only puts the record in a queue and a writer thread writes it to the storage.
+    queue_size: int
+      Maximum number of records waiting in the queue in asynchronous mode.
+    overflow: str
+      What to do when the queue is full in asynchronous mode.
+      `OVERFLOW_BLOCK` waits for a free space, `OVERFLOW_DROP_OLDEST` discards the oldest record in the queue,
+      and `OVERFLOW_DROP_NEWEST` discards the record being added.
+    storage: AbstractStorage
+      Storage that keeps the log. If omitted, a `FileStorage` of `filename` is used.
+    dedupe_size: int
+      Number of kinds of records whose duplicates are counted instead of being written. 0 disables it.
+      A record with the same logger, level, message template and exception location as a counted record is not written,
+      and a line telling how many times it was repeated is written before the log is read.
+    lazy_format: bool
+      If True, `emit()` only serializes the fields of the record to `raw_storage`,
+      and the records are formatted and moved to `storage` when the log is read, that is, on the thread that uploads the log.
+    raw_storage: AbstractStorage
+      Storage that keeps the serialized records in lazy format mode.
+      If omitted, a `FileStorage` next to the log file is used, or a `MemoryStorage` if the log is not kept in a file.
+    shared: bool
+      If True, the log file is a `SharedFileStorage` that several processes write to and only one of them uploads at a time.
+      It is ignored if `storage` is specified.
+    flush_records: int
+      Number of records kept in the write buffer of the storage before it is flushed. 1 flushes every record.
+    flush_interval: float
+      Maximum number of seconds a record is kept in the write buffer. None means no limit.
+    flush_level: int
+      Level of the records that are flushed at once together with the buffered records.
+      The buffered records are also flushed whenever the log is read, so `has_text`, `get_text()` and the reporters always see them.
+    priority_level: int
+      Level of the records that are reported before the other records. None disables it.
+      These records are formatted and written to `priority_storage` at once, even in lazy format mode,
+      and the chunks are read from it first.
+    priority_storage: AbstractStorage
+      Storage that keeps the records of `priority_level` or higher.
+      If omitted, a `FileStorage` next to the log file is used, or a `MemoryStorage` if the log is not kept in a file.
+    priority_share: int
+      Number of chunks read from `priority_storage` in a row before the chunks of the other records are read,
+      so that the other records are still reported while high-level records keep being written.
+      A read of several chunks, such as `get_texts()`, returns fewer chunks so that this number is not exceeded.
+      The chunks read ahead with the `start` of `read_chunks()` continue the same storage and are not limited.
+    sampler: RecordSampler
+      Sampler that decides which records are written, before they are formatted. None writes all the records.
+      A line telling how many records of each logger and level were not written is written before the log is read.
     """
-    # Place the log file in the same folder as the application or directly under the user folder.
-    self._filename = self.get_defaultfilename() if filename is None else filename
-    super().__init__(self._filename, encoding="utf-8", delay=True)
+    if flush_records < 1:
+      raise ValueError("The value of flush_records is out of range.")
+    if priority_share < 1:
+      raise ValueError("The value of priority_share is out of range.")
+    if overflow not in (self.OVERFLOW_BLOCK, self.OVERFLOW_DROP_OLDEST, self.OVERFLOW_DROP_NEWEST):
+      raise ValueError("The value of overflow is invalid.")
+    super().__init__()
     self.setLevel(logging.WARNING)
     self._enabled = True
+    if storage is None:
+      # Place the log file in the same folder as the application or directly under the user folder.
+      self._filename = Path(self.get_defaultfilename() if filename is None else filename)
+      storage = SharedFileStorage(self._filename) if shared else FileStorage(self._filename)
+    else:
+      self._filename = getattr(storage, "filename", None)
+    self._storage = storage
+    self._rawstorage = None
+    if lazy_format:
+      if raw_storage is None:
+        if self._filename is None:
+          raw_storage = MemoryStorage(max_bytes=-1)
+        else:
+          raw_filename = self._filename.with_name(self._filename.name + ".raw")
+          raw_storage = SharedFileStorage(raw_filename) if isinstance(storage, SharedFileStorage) else FileStorage(raw_filename)
+      self._rawstorage = raw_storage
+      self._recover_raw()
+    # Storage the records are written to.
+    self._sink = storage if self._rawstorage is None else self._rawstorage
+    self._priority_level = priority_level
+    self._prioritystorage = None
+    if priority_level is not None:
+      if priority_storage is None:
+        if self._filename is None:
+          priority_storage = MemoryStorage(max_bytes=-1)
+        else:
+          priority_filename = self._filename.with_name(self._filename.name + ".priority")
+          priority_storage = (SharedFileStorage(priority_filename) if isinstance(storage, SharedFileStorage)
+            else FileStorage(priority_filename))
+      self._prioritystorage = priority_storage
+    # Storages the chunks are read from. The index is the lane of the chunks.
+    self._lanes = [storage] if self._prioritystorage is None else [storage, self._prioritystorage]
+    self._priority_share = priority_share
+    # Number of chunks committed from the priority storage in a row, and the lane of the last chunks read.
+    self._prioritystreak = 0
+    self._readlane = 0
+    self._renderlock = threading.Lock()
+    self._overflow = overflow
+    self._dropped = 0
+    self._queue = None
+    self._writer = None
+    if async_mode:
+      self._queue = queue.Queue(maxsize=queue_size)
+      self._writer = threading.Thread(target=self._write_queue, name="ReporterLogHandler", daemon=True)
+      self._writer.start()
+    self._dedupe_size = dedupe_size
+    self._sampler = sampler
+    self._duplicates = collections.OrderedDict()
+    self._flush_records = flush_records
+    self._flush_interval = flush_interval
+    self._flush_level = flush_level
+    # Number of records in the write buffer, the time of the first of them and the timer that flushes them.
+    self._unflushed = 0
+    self._unflushed_since = None
+    self._flushtimer = None
+    self._pending_since = time.monotonic() if any(s.has_text for s in self._lanes) or self._sink.has_text else None
+    self._priority_since = time.monotonic() if self._prioritystorage is not None and self._prioritystorage.has_text else None
+
+  @property
+  def storage(self):
+    """
+    Storage that keeps the log.
+    """
+    return self._storage
+
+  @property
+  def priority_storage(self):
+    """
+    Storage that keeps the records of `priority_level` or higher. None if it is disabled.
+    """
+    return self._prioritystorage
 
   @property
   def enabled(self):
@@ -41,16 +200,67 @@ class ReporterLogHandler(logging.FileHandler):
   def has_text(self):
     """
     Check if the log text exists.
+    The records in the queue and the write buffer, and the counts of the duplicates and the sampled records, are also included.
+    Nothing is written by this property, so checking it does not end the counting of the duplicates.
+    """
+    return (any(s.has_text for s in self._lanes) or self._rawstorage is not None and self._rawstorage.has_text or
+      self._unflushed > 0 or self._queue is not None and self._queue.unfinished_tasks > 0 or self._has_summaries())
+
+  @property
+  def pending_bytes(self):
+    """
+    Number of bytes of the log that has not been reported yet.
+    In lazy format mode, the records that have not been formatted yet are counted by their serialized size.
+    The records in the queue are not counted.
+    """
+    pending = sum(s.pending_bytes for s in self._lanes)
+    return pending if self._rawstorage is None else pending + self._rawstorage.pending_bytes
+
+  @property
+  def pending_records(self):
+    """
+    Number of records that have not been reported completely yet.
+    The records in the queue are not counted.
     """
-    return self._filename.exists() and self._filename.stat().st_size > 0
+    pending = sum(s.pending_records for s in self._lanes)
+    return pending if self._rawstorage is None else pending + self._rawstorage.pending_records
+
+  @property
+  def pending_since(self):
+    """
+    The time of `time.monotonic()` when the oldest log that has not been reported yet was written.
+    None if there is no such log.
+    """
+    return self._pending_since
+
+  @property
+  def priority_pending_since(self):
+    """
+    The time of `time.monotonic()` when the oldest record of `priority_level` or higher that has not been reported yet was written.
+    None if there is no such record.
+    """
+    return self._priority_since
+
+  @property
+  def dropped_records(self):
+    """
+    Number of records discarded because the queue was full in asynchronous mode.
+    """
+    return self._dropped
 
   def emit(self, record):
     """
     Override method.
     If the value of enabled is False, no processing is performed.
+    In asynchronous mode, the record is only put in the queue.
     """
     if self.enabled:
-      super().emit(record)
+      self._mark_pending()
+      if self._sampler is not None and not self._sampler.allow(record):
+        return
+      if self._dedupe_size > 0 and self._count_duplicate(record):
+        return
+      self._write_record(record)
 
   def append_log(self, message):
     """
@@ -61,21 +271,106 @@ class ReporterLogHandler(logging.FileHandler):
     message: str
       String to write to log.
     """
-    if self.stream is None:
-      self.stream = self._open()
+    self._mark_pending()
+    if self._writer is not None and self._try_enqueue(message):
+      return
     try:
-      stream = self.stream
-      stream.write(message + self.terminator)
-      self.flush()
+      with self._sink.lock:
+        self._sink.write_record(self._serialize_text(message))
+        self._written(1, logging.NOTSET)
     except Exception:
-      self.handleError(message)
+      self.handleError(logging.makeLogRecord({"msg": message}))
+
+  def flush(self):
+    """
+    Override method.
+    Flush the written text to the storage.
+    """
+    with self._sink.lock:
+      self._sink.flush()
+      self._unflushed = 0
+      self._unflushed_since = None
+      timer, self._flushtimer = self._flushtimer, None
+    if timer is not None:
+      timer.cancel()
+
+  def flush_queue(self):
+    """
+    Wait until all the records in the queue have been written to the storage.
+    Nothing is done unless in asynchronous mode.
+    """
+    if self._queue is not None:
+      self._queue.join()
+
+  def flush_duplicates(self):
+    """
+    Write the lines telling how many times the records were repeated, and forget the counted records.
+    The next record of the same kind is written again.
+    """
+    with self.lock:
+      entries = [e for e in self._duplicates.values() if e[0] > 0]
+      self._duplicates.clear()
+    for entry in entries:
+      self._write_duplicate(entry)
+
+  def flush_sampled(self):
+    """
+    Write the lines telling how many records of each logger and level were not written by the sampler.
+    Nothing is done if no sampler is set.
+    """
+    if self._sampler is None:
+      return
+    for count, first, last, name, levelno, levelname in self._sampler.pop_counts():
+      record = logging.makeLogRecord({
+        "name": name, "levelno": levelno, "levelname": levelname, "created": last,
+        "msg": self.SAMPLED_MESSAGE.format(count=count, levelname=levelname, name=name,
+          first=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first)),
+          last=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last)))})
+      self._write_record(record)
+
+  def close(self):
+    """
+    Override method.
+    In asynchronous mode, the writer thread is stopped after writing all the records in the queue.
+    """
+    self.flush_duplicates()
+    self.flush_sampled()
+    # The queue is kept, and the records emitted after the writer thread is stopped are written directly.
+    self.acquire()
+    try:
+      writer = self._writer
+      self._writer = None
+      if writer is not None:
+        self._queue.put(self._STOP)
+    finally:
+      self.release()
+    if writer is not None:
+      writer.join()
+    self.flush()
+    if self._rawstorage is not None:
+      self._rawstorage.close()
+    if self._prioritystorage is not None:
+      self._prioritystorage.close()
+    self._storage.close()
+    super().close()
 
   def clear(self):
     """
     Delete all the log text of the actual acquisition.
     """
-    with open(self._filename, mode="w", encoding="utf-8") as f:
-      f.write("")
+    with self.lock:
+      self._duplicates.clear()
+    if self._sampler is not None:
+      self._sampler.pop_counts()
+    self.flush_queue()
+    with self._storage.lock:
+      if self._rawstorage is not None:
+        self._rawstorage.clear()
+      if self._prioritystorage is not None:
+        self._prioritystorage.clear()
+      self._storage.clear()
+      self._pending_since = None
+      self._priority_since = None
 
   def get_text(self, max_length=-1, report=None):
     """
@@ -100,40 +395,520 @@ class ReporterLogHandler(logging.FileHandler):
     ----
     text: str
       Log string.
+      If `priority_level` is set, the chunk is cut out of the records of that level or higher first,
+      and the whole log starts with them when max_length is -1.
     """
     if max_length == 0 or max_length == 1:
       raise ValueError("The value of max_length is out of range.")
-    self.close()
-    text = ""
-    if self._filename.exists():
-      with open(self._filename, mode="r", encoding="utf-8") as f:
-        text = f.read()
-      if max_length != -1:
-        lines = text.splitlines()
-        result = []
-        if len(lines[0]) > max_length:
-          text = lines[0][:max_length]
-          lines[0] = lines[0][max_length:]
-        else:
-          while max_length > 0 and len(lines) > 0:
-            t = lines[0]
-            max_length -= len(t)
-            if max_length >= 0:
-              result.append(t)
-              lines.pop(0)
-              max_length -= len("\n") # Newline character.
-          text = "\n".join(result)
-        if report is None or report(text):
-          with open(self._filename, mode="w", encoding="utf-8") as f:
-            f.write("\n".join(lines))
-      else:
-        if report is None or report(text):
-          self.clear()
+    self._flush_pending()
+    if max_length == -1:
+      chunks = [c._replace(lane=lane) for lane, s in reversed(list(enumerate(self._lanes))) for c in s.read_chunks(max_length)]
+    else:
+      chunks = self._read_lane(max_length, 1, -1, None)
+    if len(chunks) == 0:
+      return ""
+    text = "".join(c.text for c in chunks)
+    if report is None or report(text):
+      for chunk in chunks:
+        self._commit(chunk.end, chunk.lane)
     return text
 
+  def get_texts(self, max_length, count, total_length=-1, report=None):
+    """
+    Get several chunks of the log strings at once.
+    Each chunk is cut out in the same way as `get_text(max_length)`, and all the chunks are committed together.
+
+    Parameters
+    ----
+    max_length: int
+      Maximum number of characters of each chunk.
+      If 1 or less is set for this value, ValueError will occur.
+    count: int
+      Maximum number of chunks.
+    total_length: int
+      Maximum number of characters of all the chunks. -1 means no limit.
+      Only the first chunk is cut in the middle of a line to fit in this value.
+    report: func(texts) -> bool or None
+      A function for reporting.
+      The list of the chunks is stored as a parameter, and if False is returned, none of the chunks are committed.
+
+    Returns
+    ----
+    texts: list of str
+      Chunks of the log string. If there is no log, an empty list is returned.
+    """
+    chunks = self.read_chunks(max_length, count, total_length)
+    texts = [c.text for c in chunks]
+    if len(chunks) > 0 and (report is None or report(texts)):
+      self._commit(chunks[-1].end, chunks[-1].lane, len(chunks))
+    return texts
+
+  def read_chunks(self, max_length, count=1, total_length=-1, start=None):
+    """
+    Read chunks of the log strings without committing them.
+    Each chunk is cut out in the same way as `get_text(max_length)`.
+    Commit the chunks that have been reported with `commit_chunk()` in order.
+
+    Parameters
+    ----
+    max_length: int
+      Maximum number of characters of each chunk.
+      If 1 or less is set for this value, ValueError will occur.
+    count: int
+      Maximum number of chunks.
+    total_length: int
+      Maximum number of characters of all the chunks. -1 means no limit.
+      Only the first chunk is cut in the middle of a line to fit in this value.
+    start: int
+      Position in the storage to start reading. If omitted, the committed position is used.
+      Use the `end` of the last chunk read to read ahead of the committed position.
+      The chunks are read from the same lane as the last chunks read.
+
+    Returns
+    ----
+    chunks: list of LogChunk
+      Chunks of the log string. If there is no log, an empty list is returned.
+      All the chunks are read from the same lane, which is chosen by `priority_share` if `priority_level` is set.
+    """
+    if max_length < 2:
+      raise ValueError("The value of max_length is out of range.")
+    self._flush_pending()
+    return self._read_lane(max_length, count, total_length, start)
+
+  def iter_chunks(self, max_length, start=None):
+    """
+    Read the chunks of the log strings one by one without committing them.
+    Each chunk is cut out in the same way as `get_text(max_length)`, and the log is read incrementally,
+    so only a few times `max_length` bytes are kept in memory however large the log is.
+    Commit each chunk with `commit_chunk()` after it has been reported.
+    The log written after the iteration starts is not included.
+
+    Parameters
+    ----
+    max_length: int
+      Maximum number of characters of each chunk.
+      If 1 or less is set for this value, ValueError will occur.
+    start: int
+      Position in the storage to start reading. If omitted, the committed position is used.
+
+    Yields
+    ----
+    chunk: LogChunk
+      Chunk of the log string.
+    """
+    if max_length < 2:
+      raise ValueError("The value of max_length is out of range.")
+    self._flush_pending()
+    lane = self._readlane if start is not None else self._choose_lane()
+    self._readlane = lane
+    return (c._replace(lane=lane) for c in self._lanes[lane].iter_chunks(max_length, start))
+
+  def commit_chunk(self, chunk):
+    """
+    Record that the log has been reported up to the end of the chunk.
+
+    Parameters
+    ----
+    chunk: LogChunk
+      Chunk returned by `read_chunks()`.
+      The chunk must start at or before the committed position, that is, the chunks before it must have been committed.
+
+    Returns
+    ----
+    committed: bool
+      False if the chunk could not be committed because the chunks before it have not been committed,
+      or the log has been emptied since the chunk was read.
+    """
+    storage = self._lanes[chunk.lane]
+    with storage.lock:
+      offset = storage.offset
+      if chunk.start > offset or chunk.generation != storage.generation:
+        return False
+      if chunk.end > offset:
+        self._commit(chunk.end, chunk.lane)
+      return True
+
+  def _commit(self, position, lane=0, chunks=1):
+    """
+    Record that the log has been reported up to the specified position.
+
+    Parameters
+    ----
+    position: int
+      Position in the storage.
+    lane: int
+      Lane of the storage. 0 for the main storage and 1 for the priority storage.
+    chunks: int
+      Number of the chunks committed, which are counted toward `priority_share`.
+    """
+    storage = self._lanes[lane]
+    with storage.lock:
+      storage.commit(position)
+      self._prioritystreak = self._prioritystreak + chunks if lane == 1 else 0
+      if lane == 1 and not storage.has_text:
+        self._priority_since = None
+      if not any(s.has_text for s in self._lanes):
+        self._pending_since = None
+
+  def _choose_lane(self):
+    """
+    Choose the lane the next chunks are read from.
+    The priority storage is read first, but the main storage is read after `priority_share` chunks of it in a row.
+    """
+    if self._prioritystorage is None or not self._prioritystorage.has_text:
+      return 0
+    if not self._storage.has_text or self._prioritystreak < self._priority_share:
+      return 1
+    return 0
+
+  def _read_lane(self, max_length, count, total_length, start):
+    """
+    Read the chunks from the lane chosen by `_choose_lane()`, or from the last lane if the start position is specified.
+    The chunks of the priority storage are limited to the rest of `priority_share` while the main storage has the log.
+    """
+    lane = self._readlane if start is not None else self._choose_lane()
+    self._readlane = lane
+    if lane == 1 and start is None and self._storage.has_text:
+      count = max(min(count, self._priority_share - self._prioritystreak), 1)
+    return [c._replace(lane=lane) for c in self._lanes[lane].read_chunks(max_length, count, total_length, start)]
+
+  def _has_summaries(self):
+    """
+    Check if the lines of the duplicates or the sampled records are waiting to be written.
+    """
+    if self._sampler is not None and self._sampler.has_counts:
+      return True
+    with self.lock:
+      return any(e[0] > 0 for e in self._duplicates.values())
+
+  def _flush_pending(self):
+    """
+    Make all the records emitted so far readable from the storage.
+    It is called only when the log is read, because the counting of the duplicates and the sampled records ends here.
+    """
+    if self._dedupe_size > 0:
+      self.flush_duplicates()
+    self.flush_sampled()
+    self.flush_queue()
+    if self._unflushed > 0:
+      self.flush()
+    if self._rawstorage is not None:
+      self._render_raw()
+
+  def _count_duplicate(self, record):
+    """
+    Count the record if the same kind of record has been written.
+    Only the fields of the record are hashed, and the record is not formatted.
+
+    Returns
+    ----
+    counted: bool
+      True if the record is counted and must not be written.
+    """
+    exc = None
+    if record.exc_info and record.exc_info[0] is not None:
+      tb = record.exc_info[2]
+      while tb is not None and tb.tb_next is not None:
+        tb = tb.tb_next
+      exc = (record.exc_info[0], None if tb is None else tb.tb_frame.f_code.co_filename, None if tb is None else tb.tb_lineno)
+    msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+    key = (record.name, record.levelno, msg, exc)
+    evicted = None
+    with self.lock:
+      entry = self._duplicates.get(key)
+      if entry is not None:
+        self._duplicates.move_to_end(key)
+        if entry[0] == 0:
+          entry[1] = record.created
+        entry[0] += 1
+        entry[2] = record.created
+        return True
+      # [count, first, last, name, levelno, levelname, message]
+      self._duplicates[key] = [0, None, None, record.name, record.levelno, record.levelname, msg]
+      if len(self._duplicates) > self._dedupe_size:
+        _, evicted = self._duplicates.popitem(last=False)
+    if evicted is not None and evicted[0] > 0:
+      self._write_duplicate(evicted)
+    return False
+
+  def _write_duplicate(self, entry):
+    """
+    Write the line telling how many times the record was repeated.
+    """
+    count, first, last, name, levelno, levelname, message = entry
+    record = logging.makeLogRecord({
+      "name": name, "levelno": levelno, "levelname": levelname, "created": last,
+      "msg": self.DUPLICATE_MESSAGE.format(message=message, count=count,
+        first=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first)),
+        last=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last)))})
+    self._write_record(record)
+
+  def _write_record(self, record):
+    """
+    Write the record to the storage, or put it in the queue in asynchronous mode.
+    """
+    if self._writer is not None:
+      # The record is copied so that the other handlers see it unchanged, like `QueueHandler.prepare()`.
+      # The arguments are merged now, they may be changed by the caller before the record is written.
+      record = copy.copy(record)
+      try:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+          # The traceback keeps the frames of the caller alive, so only its text is queued.
+          if not record.exc_text:
+            record.exc_text = (self.formatter or _default_formatter).formatException(record.exc_info)
+          record.exc_info = None
+      except Exception:
+        self.handleError(record)
+        return
+      if self._try_enqueue(record):
+        return
+    try:
+      if self._is_priority(record):
+        self._write_priority(record)
+        return
+      with self._sink.lock:
+        self._sink.write_record(self._serialize(record), record)
+        self._written(1, record.levelno)
+    except Exception:
+      self.handleError(record)
+
+  def _try_enqueue(self, item):
+    """
+    Put a record or a string in the queue unless the writer thread has been stopped by `close()`.
+
+    Returns
+    ----
+    queued: bool
+      False if the writer thread has been stopped and the item must be written directly.
+    """
+    self.acquire()
+    try:
+      if self._writer is None:
+        return False
+      self._enqueue(item)
+      return True
+    finally:
+      self.release()
+
+  def _is_priority(self, record):
+    """
+    Check if the record is written to the priority storage.
+    """
+    return self._priority_level is not None and record.levelno >= self._priority_level
+
+  def _write_priority(self, record):
+    """
+    Format the record and write it to the priority storage.
+    It is flushed at once, so it can be reported without waiting for the other records.
+    """
+    with self._prioritystorage.lock:
+      self._prioritystorage.write_record(self.format(record), record)
+      self._prioritystorage.flush()
+      if self._priority_since is None:
+        self._priority_since = time.monotonic()
+
+  def _written(self, count, levelno):
+    """
+    Flush the write buffer of the storage if the flush policy requires it.
+    It is called with the lock of the storage held, after records are written.
+
+    Parameters
+    ----
+    count: int
+      Number of records written.
+    levelno: int
+      The highest level of the records written.
+    """
+    if self._unflushed == 0:
+      self._unflushed_since = time.monotonic()
+    self._unflushed += count
+    if (self._unflushed >= self._flush_records or levelno >= self._flush_level or
+        (self._flush_interval is not None and time.monotonic() - self._unflushed_since >= self._flush_interval)):
+      self.flush()
+    elif self._flush_interval is not None and self._flushtimer is None:
+      # Flush the buffer even if no more records are written.
+      self._flushtimer = threading.Timer(self._flush_interval, self.flush)
+      self._flushtimer.daemon = True
+      self._flushtimer.start()
+
+  def _serialize(self, record):
+    """
+    Convert the record to the text written to the storage.
+    In lazy format mode, the record is not formatted and only its fields are serialized in JSON.
+    """
+    if self._rawstorage is None:
+      return self.format(record)
+    if record.exc_info and not record.exc_text:
+      # The traceback cannot be kept, so only it is formatted now.
+      record.exc_text = (self.formatter or _default_formatter).formatException(record.exc_info)
+    fields = {k: getattr(record, k, None) for k in self.RECORD_FIELDS}
+    if not isinstance(record.msg, str):
+      fields["msg"] = str(record.msg)
+    args = record.args
+    if args and not all(_is_json_value(v) for v in (args.values() if isinstance(args, dict) else args)):
+      # The arguments would be formatted differently after they are restored, so the message is merged now.
+      fields["msg"] = record.getMessage()
+      fields["args"] = None
+    elif isinstance(args, dict):
+      fields["args"] = dict(args)
+    elif args:
+      fields["args"] = list(args)
+    return json.dumps(fields, ensure_ascii=False)
+
+  def _serialize_text(self, text):
+    """
+    Convert the text written by `append_log()` to the text written to the storage.
+    """
+    if self._rawstorage is None:
+      return text
+    return json.dumps({"text": text}, ensure_ascii=False)
+
+  def _render(self, data):
+    """
+    Format a serialized record.
+
+    Returns
+    ----
+    text: str
+      Formatted text.
+    record: logging.LogRecord or None
+      The log record restored from the serialized record. None for the text written by `append_log()`.
+    """
+    fields = json.loads(data)
+    if "text" in fields:
+      return fields["text"], None
+    if isinstance(fields.get("args"), list):
+      fields["args"] = tuple(fields["args"])
+    record = logging.makeLogRecord(fields)
+    try:
+      record.getMessage()
+    except Exception:
+      # The arguments have been converted to strings and do not match the message any more.
+      record.msg = "{} {}".format(record.msg, record.args)
+      record.args = None
+    return self.format(record), record
+
+  def _render_raw(self):
+    """
+    Format the serialized records and move them to the storage.
+    The lock of the raw storage is held until the records are committed, so that another process never moves the same records.
+    """
+    with self._renderlock, self._rawstorage.lock:
+      raw = self._rawstorage
+      separator = self.terminator.encode("utf-8")
+      position = raw.offset
+      end = raw.end
+      size = self.RENDER_BLOCK
+      while position < end:
+        data = raw.read(position, size)
+        n = data.rfind(separator) + len(separator)
+        if n < len(separator):
+          if len(data) < size:
+            break
+          # A record larger than the block.
+          size *= 2
+          continue
+        with self._storage.lock:
+          for line in data[:n - len(separator)].split(separator):
+            try:
+              text, record = self._render(line.decode("utf-8"))
+            except Exception:
+              text, record = line.decode("utf-8", errors="replace"), None
+            self._storage.write_record(text, record)
+          self._storage.flush()
+          position += n
+          raw.commit(position)
+
+  def _recover_raw(self):
+    """
+    End the torn record at the end of the raw storage, which is left when the application stopped while writing it.
+    The records are written with the lock held, so a record without its end is never being written by another process.
+    The torn record is rendered as text like the other records that cannot be restored.
+    """
+    raw = self._rawstorage
+    separator = self.terminator.encode("utf-8")
+    with raw.lock:
+      raw.flush()
+      end = raw.end
+      if end > raw.offset and raw.read(max(end - len(separator), raw.base), len(separator)) != separator:
+        raw.write(self.terminator)
+        raw.flush()
+
+  def _mark_pending(self):
+    """
+    Record the time when the log starts to remain.
+    """
+    if self._pending_since is None:
+      self._pending_since = time.monotonic()
+
+  def _enqueue(self, item):
+    """
+    Put a record or a string in the queue according to the overflow policy.
+    """
+    if self._overflow == self.OVERFLOW_BLOCK:
+      self._queue.put(item)
+    elif self._overflow == self.OVERFLOW_DROP_NEWEST:
+      try:
+        self._queue.put_nowait(item)
+      except queue.Full:
+        self._dropped += 1
+    else:
+      while True:
+        try:
+          self._queue.put_nowait(item)
+          break
+        except queue.Full:
+          try:
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self._dropped += 1
+          except queue.Empty:
+            pass
+
+  def _write_queue(self):
+    """
+    The body of the writer thread.
+    Records are taken out of the queue in batches, and the flush policy is applied once per batch.
+    The handler lock must not be taken here, because `logging.shutdown()` holds it while closing the handler.
+    """
+    q = self._queue
+    stop = False
+    while not stop:
+      items = [q.get()]
+      try:
+        while len(items) < self.WRITE_BATCH_SIZE:
+          items.append(q.get_nowait())
+      except queue.Empty:
+        pass
+      with self._sink.lock:
+        written = 0
+        levelno = logging.NOTSET
+        for item in items:
+          if item is self._STOP:
+            stop = True
+            continue
+          record = item if isinstance(item, logging.LogRecord) else logging.makeLogRecord({"msg": item})
+          try:
+            if item is record and self._is_priority(record):
+              self._write_priority(record)
+              continue
+            msg = self._serialize(record) if item is record else self._serialize_text(item)
+            self._sink.write_record(msg, record if item is record else None)
+            written += 1
+            if item is record:
+              levelno = max(levelno, record.levelno)
+          except Exception:
+            self.handleError(record)
+        if written > 0:
+          self._written(written, levelno)
+      for _ in items:
+        q.task_done()
+
   @staticmethod
   def get_defaultfilename():
     """
     Get the default log file name.
     """
-    return Path(__file__).parent / "reporter.log"
\ No newline at end of file
+    return Path(__file__).parent / "reporter.log"
@@ -0,0 +1,5 @@
+from logreporter.storage.filestorage import FileStorage
+from logreporter.storage.journalstorage import JournalStorage
+from logreporter.storage.memorystorage import MemoryStorage
+from logreporter.storage.segmentedfilestorage import SegmentedFileStorage
+from logreporter.storage.sharedfilestorage import SharedFileStorage
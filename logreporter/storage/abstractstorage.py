@@ -0,0 +1,487 @@
+from abc import abstractmethod
+import codecs
+from collections import namedtuple
+import hashlib
+import os
+import threading
+
+class LogChunk(namedtuple("LogChunk", ["text", "start", "end", "generation", "lane"])):
+  """
+  A chunk of the log string and its position range in the storage.
+  `generation` is the generation of the storage when the chunk was read,
+  and `lane` is the storage of `ReporterLogHandler` it was read from, 0 for the main storage and 1 for the priority storage.
+  """
+  __slots__ = ()
+
+  @property
+  def key(self):
+    """
+    Idempotency key of the chunk.
+    The same chunk sent again after a crash has the same key, so the receiver can detect the duplicate.
+    """
+    data = "{}:{}:{}:{}".format(self.generation, self.start, self.end, self.text)
+    if self.lane != 0:
+      data = "{}/{}".format(self.lane, data)
+    data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:32]
+
+LogChunk.__new__.__defaults__ = (0, 0)
+
+class AbstractStorage(object):
+  """
+  The base class of the storage that keeps the log of `ReporterLogHandler`. This class is inherited and used.
+  The log is kept as a sequence of bytes encoded in UTF-8, and the position up to which it has been reported is committed.
+  Each record ends with `RECORD_END`, so that a record that has line breaks can be told from several records.
+  """
+  # The record separator character keeps the log file readable as text.
+  RECORD_END = "\x1e\n"
+  FENCE = "```"
+  # Number of bytes read at a time when searching backwards for the beginning of a record.
+  SCAN_BLOCK = 4096
+  # Whether the committed position is written to the disk before `commit()` returns.
+  fsync = True
+
+  def __init__(self):
+    """
+    Constructor.
+    """
+    # Guards the log. `ReporterLogHandler` does not take its own lock for the storage,
+    # because `logging.shutdown()` holds it while the writer thread is being stopped.
+    self.lock = threading.RLock()
+
+  @property
+  @abstractmethod
+  def offset(self):
+    """
+    The committed position, that is, the beginning of the log that has not been reported yet.
+    """
+    raise NotImplementedError
+
+  @property
+  @abstractmethod
+  def end(self):
+    """
+    The position of the end of the log.
+    """
+    raise NotImplementedError
+
+  @property
+  def generation(self):
+    """
+    Number of times the positions have started again from the beginning.
+    The storage whose positions never go back always returns 0.
+    """
+    return 0
+
+  @property
+  def base(self):
+    """
+    The position of the oldest byte kept in the storage.
+    """
+    return 0
+
+  @property
+  def has_text(self):
+    """
+    Check if the log text that has not been reported exists.
+    """
+    return self.end > self.offset
+
+  @property
+  def pending_bytes(self):
+    """
+    Number of bytes of the log that has not been reported yet.
+    """
+    return max(self.end - self.offset, 0)
+
+  @property
+  def pending_records(self):
+    """
+    Number of records that have not been reported completely yet.
+    By default, the record ends after the committed position are counted.
+    """
+    with self.lock:
+      separator = self.RECORD_END.encode("utf-8")
+      position = self.offset
+      end = self.end
+      count = 0
+      # The last byte of the previous block is kept to find the record end across the blocks.
+      previous = b""
+      while position < end:
+        data = self.read(position, min(self.SCAN_BLOCK, end - position))
+        if len(data) == 0:
+          break
+        count += (previous + data).count(separator)
+        previous = data[-(len(separator) - 1):]
+        position += len(data)
+      return count
+
+  @abstractmethod
+  def write(self, text):
+    """
+    Append the text to the end of the log.
+
+    Parameters
+    ----
+    text: str
+      Text including the line break.
+    """
+    raise NotImplementedError
+
+  def write_record(self, text, record=None):
+    """
+    Append a record to the end of the log.
+    By default, the text is written with `RECORD_END`.
+
+    Parameters
+    ----
+    text: str
+      Text of the record without `RECORD_END`.
+    record: logging.LogRecord or None
+      The log record the text was made from, for the storage that keeps its level and time.
+    """
+    self.write(text + self.RECORD_END)
+
+  def flush(self):
+    """
+    Make the written text readable. Nothing is done by default.
+    """
+    pass
+
+  @abstractmethod
+  def read(self, start, size=-1):
+    """
+    Read the log.
+
+    Parameters
+    ----
+    start: int
+      Position to start reading.
+    size: int
+      Maximum number of bytes to read. -1 means up to the end of the log.
+
+    Returns
+    ----
+    data: bytes
+      Bytes of the log.
+    """
+    raise NotImplementedError
+
+  @abstractmethod
+  def commit(self, position):
+    """
+    Record that the log has been reported up to the specified position.
+
+    Parameters
+    ----
+    position: int
+      Position of the end of the reported log.
+    """
+    raise NotImplementedError
+
+  @abstractmethod
+  def clear(self):
+    """
+    Delete all the log.
+    """
+    raise NotImplementedError
+
+  def close(self):
+    """
+    Release the resources held by the storage. Nothing is done by default.
+    """
+    pass
+
+  def acquire_uploader(self):
+    """
+    Try to become the only uploader of the log. The storage that is not shared with other processes always succeeds.
+
+    Returns
+    ----
+    acquired: bool
+      False if another process is uploading the log.
+    """
+    return True
+
+  def release_uploader(self):
+    """
+    Stop being the uploader of the log. Nothing is done by default.
+    """
+    pass
+
+  def read_chunks(self, max_length, count=1, total_length=-1, start=None):
+    """
+    Read chunks of the log string without committing them.
+    Each chunk consists of the records that fit in `max_length` characters.
+    If the first record does not fit, it is cut at a line break, or in the middle of the line if even one line does not fit.
+    A code fence open at the cut is closed at the end of the chunk and opened again at the beginning of the next chunk.
+
+    Parameters
+    ----
+    max_length: int
+      Maximum number of characters of each chunk. -1 means all the log string as one chunk.
+    count: int
+      Maximum number of chunks.
+    total_length: int
+      Maximum number of characters of all the chunks. -1 means no limit.
+      Only the first chunk is cut in the middle of a record to fit in this value.
+    start: int
+      Position to start reading. If omitted, the committed position is used.
+
+    Returns
+    ----
+    chunks: list of LogChunk
+      Chunks of the log string. If there is no log, an empty list is returned.
+    """
+    with self.lock:
+      self.flush()
+      # The records before the base have been evicted, so reading ahead from them starts at the base.
+      position = max(self.offset if start is None else start, self.base)
+      if position >= self.end:
+        return []
+      chunks, _ = self._read_chunks(max_length, count, total_length, position, self._fence_at(position))
+      return chunks
+
+  def iter_chunks(self, max_length, start=None):
+    """
+    Read the chunks of the log string one by one without committing them.
+    Only the bytes needed for one chunk are read at a time, so the memory used does not depend on the size of the log.
+    The log written after the iteration starts is not included.
+
+    Parameters
+    ----
+    max_length: int
+      Maximum number of characters of each chunk.
+    start: int
+      Position to start reading. If omitted, the committed position is used.
+
+    Yields
+    ----
+    chunk: LogChunk
+      Chunk of the log string.
+    """
+    with self.lock:
+      self.flush()
+      position = max(self.offset if start is None else start, self.base)
+      end = self.end
+      fence = self._fence_at(position) if position < end else None
+    while position < end:
+      with self.lock:
+        if position < self.base:
+          # The records have been evicted while the chunks were being read.
+          position = self.base
+          fence = self._fence_at(position)
+        chunks, fence = self._read_chunks(max_length, 1, -1, position, fence)
+      if len(chunks) == 0:
+        break
+      yield chunks[0]
+      position = chunks[0].end
+
+  def _read_chunks(self, max_length, count, total_length, position, fence):
+    """
+    Read chunks of the log string from the specified position.
+
+    Parameters
+    ----
+    fence: str or None
+      The line that opened the code fence open at the position.
+
+    Returns
+    ----
+    chunks: list of LogChunk
+      Chunks of the log string.
+    fence: str or None
+      The line that opened the code fence open at the end of the last chunk.
+    """
+    if max_length == -1:
+      data = self.read(position)
+      text = data.decode("utf-8").replace(self.RECORD_END, "\n").replace("\r\n", "\n")
+      if fence is not None:
+        text = fence + "\n" + text
+      return [LogChunk(text, position, position + len(data), self.generation)], None
+    chunks = []
+    while len(chunks) < count:
+      length = max_length if total_length == -1 else min(max_length, total_length)
+      if length < 2:
+        break
+      # UTF-8 uses at most 4 bytes per character, so this is enough for `length` characters and a record end.
+      data = self.read(position, length * 4 + 4)
+      eof = len(data) < length * 4 + 4
+      text = codecs.getincrementaldecoder("utf-8")().decode(data, final=eof)
+      text, n, fence = self._cut_text(text, length, eof, split=len(chunks) == 0 or length == max_length, fence=fence)
+      if n == 0:
+        break
+      chunks.append(LogChunk(text, position, position + n, self.generation))
+      position += n
+      if total_length != -1:
+        total_length -= len(text)
+    return chunks, fence
+
+  def _replace_file(self, path, text):
+    """
+    Replace the content of the file atomically, so that a crash leaves either the old or the new content.
+    The file is written to the disk if `fsync` is True.
+    """
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, mode="w", encoding="utf-8") as f:
+      f.write(text)
+      if self.fsync:
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+    if self.fsync and hasattr(os, "O_DIRECTORY"):
+      # Make the rename itself durable.
+      fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+      try:
+        os.fsync(fd)
+      finally:
+        os.close(fd)
+
+  def _fence_at(self, position):
+    """
+    Get the code fence open at the specified position.
+    The beginning of the record that contains the position is searched backwards, and the lines before the position are scanned.
+
+    Returns
+    ----
+    fence: str or None
+      The line that opened the code fence, or None if the position is not in a code fence.
+    """
+    separator = self.RECORD_END.encode("utf-8")
+    base = self.base
+    begin = base
+    block_end = position
+    following = b""
+    while block_end > base:
+      n = min(self.SCAN_BLOCK, block_end - base)
+      # The first byte of the following block is added to find the record end across the blocks.
+      data = self.read(block_end - n, n) + following[:1]
+      i = data.rfind(separator)
+      if i != -1:
+        begin = block_end - n + i + len(separator)
+        break
+      following = data
+      block_end -= n
+    fence = None
+    if begin < position:
+      lines = self.read(begin, position - begin).decode("utf-8", errors="replace").split("\n")
+      for line in lines[:-1]:
+        fence = self._toggle_fence(fence, line)
+    return fence
+
+  @classmethod
+  def _toggle_fence(cls, fence, line):
+    """
+    Get the code fence open after the line.
+    """
+    if line.lstrip().startswith(cls.FENCE):
+      return None if fence is not None else line.strip()
+    return fence
+
+  @classmethod
+  def _cut_text(cls, text, max_length, eof, split=True, fence=None):
+    """
+    Cut out the records at the beginning of the text that fit in the specified number of characters.
+
+    Parameters
+    ----
+    text: str
+      Text read from the log.
+    max_length: int
+      Maximum number of characters.
+    eof: bool
+      Whether the text reaches the end of the log.
+    split: bool
+      Whether to cut the first record when it does not fit in the specified number of characters.
+    fence: str or None
+      The line that opened the code fence open at the beginning of the text.
+
+    Returns
+    ----
+    text: str
+      Text cut out.
+    size: int
+      Number of bytes of the cut out text in the log.
+    fence: str or None
+      The line that opened the code fence open at the end of the cut out text.
+    """
+    records = text.split(cls.RECORD_END)
+    # The text after the last record end is an unfinished record unless the end of the log has been reached.
+    rest = records.pop()
+    terminated = len(records)
+    if eof and rest != "":
+      records.append(rest)
+    result = []
+    size = 0
+    length = 0
+    for i, record in enumerate(records):
+      t = record.replace("\r\n", "\n")
+      if i == 0 and fence is not None:
+        t = fence + "\n" + t
+      length += len(t) + (1 if i > 0 else 0)
+      if length > max_length:
+        break
+      result.append(t)
+      size += len(record.encode("utf-8")) + (len(cls.RECORD_END) if i < terminated else 0)
+    if len(result) > 0:
+      return "\n".join(result), size, None
+    if not split:
+      return "", 0, fence
+    # Cut the first record at the last line break that fits.
+    record = records[0] if len(records) > 0 else rest
+    lines = record.split("\n")
+    # The last line is unfinished unless the record ends in the text.
+    complete = len(lines) if len(records) > 0 else len(lines) - 1
+    closing = "\n" + cls.FENCE
+    result = [] if fence is None else [fence]
+    length = -1 if fence is None else len(fence)
+    state = fence
+    taken = 0
+    # The cut is not placed just after a line that opens a code fence, which would leave an empty code block.
+    cut = None
+    for line in lines[:complete]:
+      t = line[:-1] if line.endswith("\r") else line
+      s = cls._toggle_fence(state, t)
+      if length + 1 + len(t) + (0 if s is None else len(closing)) > max_length:
+        break
+      result.append(t)
+      length += 1 + len(t)
+      size += len(line.encode("utf-8")) + 1
+      taken += 1
+      if s is None or s == state:
+        cut = (len(result), taken, size, s)
+      state = s
+    if cut is not None:
+      n, taken, size, state = cut
+      if taken == len(lines):
+        # The last line is followed by the record end instead of a line break.
+        size += (len(cls.RECORD_END) if terminated > 0 else 0) - 1
+      elif taken == len(lines) - 1 and lines[-1] == "" and terminated > 0:
+        # Only the record end is left.
+        size += len(cls.RECORD_END)
+      return "\n".join(result[:n]) + ("" if state is None else closing), size, state
+    # The next line does not fit, so cut it in the middle.
+    # The lines taken so far only open code fences, and they are kept before the cut line.
+    head = "\n".join(result) + "\n" if len(result) > 0 else ""
+    if state is None:
+      closing = ""
+    available = max_length - len(head) - len(closing)
+    if available < 1 or taken >= len(lines):
+      # There is no room for the code fence.
+      head = ""
+      closing = ""
+      available = max_length
+      taken = 0
+      size = 0
+      state = fence
+    t = lines[taken][:available]
+    size += len(t.encode("utf-8"))
+    if t == lines[taken] and terminated > 0 and (taken == len(lines) - 1 or taken == len(lines) - 2 and lines[-1] == ""):
+      # The rest of the record fits without the code fence, so the record end is also taken.
+      return head + t, size + len(lines) - 1 - taken + len(cls.RECORD_END), None
+    if size == 0:
+      if taken + 1 >= len(lines):
+        return "", 0, fence
+      # An empty line that does not fit with the code fence. Skip the line break.
+      return "", 1, fence
+    return head + t + closing, size, state
@@ -0,0 +1,215 @@
+from pathlib import Path
+import time
+
+from logreporter.storage.abstractstorage import AbstractStorage
+
+class FileStorage(AbstractStorage):
+  """
+  A storage that keeps the log in a file.
+  The committed position is kept in a sidecar file, so extracting a chunk never rewrites the log file itself.
+  The sidecar file is replaced atomically, so a crash never loses the log that has not been reported,
+  although the last chunk may be reported again.
+  The log file is emptied when all the log has been reported, and the generation in the sidecar file is increased.
+  The size of the log file and the number of the records that have not been reported are counted in memory,
+  and they are checked against the file only when it may have been changed by another program.
+  """
+  # Number of seconds the counted size is used without checking the log file.
+  STAT_INTERVAL = 1.0
+
+  def __init__(self, filename):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    filename: Path or str
+      Log file name.
+    """
+    super().__init__()
+    self.filename = Path(filename)
+    self._offsetfile = self.filename.with_name(self.filename.name + ".offset")
+    self._stream = None
+    self._generation = 0
+    self._offset = self._load_offset()
+    # The size of the log file including the buffered text, the number of records after the committed position,
+    # the inode of the log file and the time it was checked.
+    self._size = 0
+    self._records = 0
+    self._inode = None
+    self._checked_at = None
+
+  @property
+  def generation(self):
+    """
+    Number of times the log file has been emptied.
+    """
+    return self._generation
+
+  @property
+  def offset(self):
+    """
+    The committed position in bytes from the beginning of the log file.
+    """
+    with self.lock:
+      if self._offset > self.end:
+        # The file was replaced or truncated outside of this storage.
+        return 0
+      return self._offset
+
+  @property
+  def end(self):
+    """
+    The size of the log file.
+    """
+    with self.lock:
+      self._check()
+      return self._size
+
+  @property
+  def pending_records(self):
+    """
+    Number of records that have not been reported completely yet.
+    """
+    with self.lock:
+      self._check()
+      return self._records
+
+  def write(self, text):
+    """
+    Append the text to the end of the log file.
+    """
+    data = text.encode("utf-8")
+    with self.lock:
+      if self._checked_at is None:
+        self._resync()
+      if self._stream is None:
+        self._stream = open(self.filename, mode="ab")
+      self._stream.write(data)
+      self._size += len(data)
+      self._records += text.count(self.RECORD_END)
+
+  def flush(self):
+    """
+    Flush the written text to the log file.
+    """
+    with self.lock:
+      if self._stream is not None:
+        self._stream.flush()
+
+  def read(self, start, size=-1):
+    """
+    Read the log file.
+    """
+    with self.lock:
+      self.flush()
+      if not self.filename.exists():
+        return b""
+      with open(self.filename, mode="rb") as f:
+        f.seek(start)
+        return f.read(size)
+
+  def commit(self, position):
+    """
+    Record that the log has been reported up to the specified position.
+    When all the log has been reported, the log file is emptied.
+    """
+    with self.lock:
+      if self.end > position:
+        self._records -= self._count_records(self.offset, position)
+        self._save_offset(position)
+      else:
+        self.clear()
+
+  def clear(self):
+    """
+    Empty the log file.
+    The new generation is recorded before the file is emptied, so a crash in between only makes the log sent again.
+    """
+    with self.lock:
+      self.close()
+      self._generation += 1
+      self._save_offset(0)
+      with open(self.filename, mode="wb"):
+        pass
+      self._resync()
+
+  def close(self):
+    """
+    Close the stream of the log file. It is opened again when the next text is written.
+    """
+    with self.lock:
+      if self._stream is not None:
+        self._stream.close()
+        self._stream = None
+
+  def _check(self):
+    """
+    Check the log file if the counted size has been used for `STAT_INTERVAL` seconds.
+    """
+    if self._checked_at is None or time.monotonic() - self._checked_at >= self.STAT_INTERVAL:
+      self._resync()
+
+  def _resync(self):
+    """
+    Check the size of the log file, and count the records again if it has been changed by another program.
+    Only the appended part is counted if the file has grown.
+    """
+    self.flush()
+    try:
+      stat = self.filename.stat()
+      inode, size = stat.st_ino, stat.st_size
+    except OSError:
+      inode, size = None, 0
+    if inode != self._inode or size < self._size:
+      self._records = self._count_records(self._offset if self._offset <= size else 0, size)
+    elif size > self._size:
+      self._records += self._count_records(self._size, size)
+    self._inode, self._size = inode, size
+    self._checked_at = time.monotonic()
+
+  def _count_records(self, start, end):
+    """
+    Count the record ends between the positions of the log file.
+    """
+    if start >= end:
+      return 0
+    self.flush()
+    separator = self.RECORD_END.encode("utf-8")
+    count = 0
+    previous = b""
+    with open(self.filename, mode="rb") as f:
+      f.seek(start)
+      while start < end:
+        data = f.read(min(self.SCAN_BLOCK * 16, end - start))
+        if len(data) == 0:
+          break
+        count += (previous + data).count(separator)
+        previous = data[-(len(separator) - 1):]
+        start += len(data)
+    return count
+
+  def _load_offset(self):
+    """
+    Read the committed position from the sidecar file.
+    """
+    self._generation = 0
+    try:
+      values = [int(v) for v in self._offsetfile.read_text(encoding="utf-8").split()]
+      self._generation = values[1] if len(values) > 1 else 0
+      if values[0] <= self.filename.stat().st_size:
+        return values[0]
+    except (OSError, ValueError, IndexError):
+      pass
+    return 0
+
+  def _save_offset(self, offset):
+    """
+    Write the committed position and the generation to the sidecar file atomically.
+    The sidecar file is not needed while both of them are 0.
+    """
+    self._offset = offset
+    if offset == 0 and self._generation == 0:
+      if self._offsetfile.exists():
+        self._offsetfile.unlink()
+    else:
+      self._replace_file(self._offsetfile, str(offset) if self._generation == 0 else "{} {}".format(offset, self._generation))
@@ -0,0 +1,379 @@
+from pathlib import Path
+import struct
+import sys
+import time
+import zlib
+
+from logreporter.storage.abstractstorage import AbstractStorage, LogChunk
+
+class JournalStorage(AbstractStorage):
+  """
+  A storage that keeps the log in a binary journal file.
+  Each record is written with a header of its length, level, time and CRC, so the records are read without splitting the text,
+  and a record torn by a crash is found and removed when the journal is opened.
+  The records written between flushes are appended to the file with a single write.
+  The committed position is kept in a sidecar file in the same way as `FileStorage`.
+  """
+  MAGIC = b"LRJ1"
+  # Length of the text, CRC of the rest, level and time.
+  HEADER = struct.Struct("<IIBd")
+
+  def __init__(self, filename):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    filename: Path or str
+      Journal file name.
+    """
+    super().__init__()
+    self.filename = Path(filename)
+    self._offsetfile = self.filename.with_name(self.filename.name + ".offset")
+    self._stream = None
+    self._buffer = []
+    self._buffered = 0
+    if not self.filename.exists() or self.filename.stat().st_size < len(self.MAGIC):
+      self.filename.write_bytes(self.MAGIC)
+    elif self.filename.read_bytes()[:len(self.MAGIC)] != self.MAGIC:
+      raise ValueError("{} is not a journal file.".format(self.filename))
+    self._end = self.filename.stat().st_size
+    # The committed position and the beginning of the record that contains it.
+    self._offset = self.base
+    self._record = self.base
+    self._generation = 0
+    try:
+      offset, record, *generation = (int(v) for v in self._offsetfile.read_text(encoding="utf-8").split())
+      self._generation = generation[0] if generation else 0
+      if self.base <= record <= offset <= self._end:
+        self._offset, self._record = offset, record
+    except (OSError, ValueError):
+      pass
+    # The beginning of the record found last, to continue searching from it.
+    self._hint = self._record
+    self._recover()
+
+  @property
+  def base(self):
+    """
+    The position of the first record.
+    """
+    return len(self.MAGIC)
+
+  @property
+  def generation(self):
+    """
+    Number of times the journal has been emptied.
+    """
+    return self._generation
+
+  @property
+  def offset(self):
+    """
+    The committed position.
+    """
+    return self._offset
+
+  @property
+  def end(self):
+    """
+    The position of the end of the journal.
+    """
+    with self.lock:
+      return self._end + self._buffered
+
+  @property
+  def pending_records(self):
+    """
+    Number of records that have not been reported completely yet.
+    Only the headers after the committed record are read.
+    """
+    with self.lock:
+      return sum(1 for _ in self._headers(self._record)) + len(self._buffer) // 2
+
+  def write(self, text):
+    """
+    Append the records in the text.
+    """
+    records = text.split(self.RECORD_END)
+    if records[-1] == "":
+      records.pop()
+    for record in records:
+      self.write_record(record)
+
+  def write_record(self, text, record=None):
+    """
+    Append a record with the level and the time of the log record.
+    It is kept in the buffer until `flush()` is called.
+    """
+    payload = text.encode("utf-8")
+    level = min(max(record.levelno, 0), 255) if record is not None else 0
+    created = record.created if record is not None else time.time()
+    meta = struct.pack("<Bd", level, created)
+    header = self.HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(meta)), level, created)
+    with self.lock:
+      self._buffer.append(header)
+      self._buffer.append(payload)
+      self._buffered += len(header) + len(payload)
+
+  def flush(self):
+    """
+    Write the buffered records to the journal file with a single write.
+    """
+    with self.lock:
+      if self._buffered == 0:
+        return
+      if self._stream is None:
+        self._stream = open(self.filename, mode="ab", buffering=0)
+      self._stream.write(b"".join(self._buffer))
+      self._end += self._buffered
+      self._buffer = []
+      self._buffered = 0
+
+  def read(self, start, size=-1):
+    """
+    Read the journal file as it is.
+    """
+    with self.lock:
+      self.flush()
+      with open(self.filename, mode="rb") as f:
+        f.seek(start)
+        return f.read(size)
+
+  def commit(self, position):
+    """
+    Record that the log has been reported up to the specified position.
+    When all the log has been reported, the journal file is emptied.
+    """
+    with self.lock:
+      self.flush()
+      if position >= self._end:
+        self.clear()
+        return
+      self._record = self._locate(position)
+      self._offset = position
+      self._save_offset()
+
+  def clear(self):
+    """
+    Empty the journal file.
+    The new generation is recorded before the journal is emptied, so a crash in between only makes the log sent again.
+    """
+    with self.lock:
+      self.close()
+      self._buffer = []
+      self._buffered = 0
+      self._generation += 1
+      self._offset = self._record = self._hint = self.base
+      self._save_offset()
+      self.filename.write_bytes(self.MAGIC)
+      self._end = self.base
+
+  def _save_offset(self):
+    """
+    Write the committed position to the sidecar file atomically.
+    """
+    self._replace_file(self._offsetfile, "{} {} {}".format(self._offset, self._record, self._generation))
+
+  def close(self):
+    """
+    Write the buffered records and close the stream of the journal file.
+    """
+    with self.lock:
+      self.flush()
+      if self._stream is not None:
+        self._stream.close()
+        self._stream = None
+
+  def iter_records(self, start=None):
+    """
+    Read the records of the journal.
+
+    Parameters
+    ----
+    start: int
+      Position of the beginning of the record to start reading. If omitted, the first record in the journal is used.
+
+    Yields
+    ----
+    level: int
+      Level of the log record. 0 for the text that is not a log record.
+    created: float
+      Time when the record was written.
+    text: str
+      Text of the record.
+    """
+    with self.lock:
+      self.flush()
+    with open(self.filename, mode="rb") as f:
+      f.seek(self.base if start is None else start)
+      while True:
+        header = f.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+          break
+        length, _, level, created = self.HEADER.unpack(header)
+        yield level, created, f.read(length).decode("utf-8")
+
+  def dump(self, stream, start=None):
+    """
+    Write the records of the journal in the text format of `FileStorage`.
+
+    Parameters
+    ----
+    stream: TextIO
+      Stream to write the text.
+    start: int
+      Position of the beginning of the record to start writing. If omitted, the first record in the journal is used.
+    """
+    for _, _, text in self.iter_records(start):
+      stream.write(text + self.RECORD_END)
+
+  def _recover(self):
+    """
+    Check the records after the committed record, and remove the torn record at the end of the journal and the records after it.
+    """
+    position = self._record
+    with open(self.filename, mode="rb") as f:
+      f.seek(position)
+      while position < self._end:
+        header = f.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+          break
+        length, crc, level, created = self.HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload, zlib.crc32(struct.pack("<Bd", level, created))) != crc:
+          break
+        position += self.HEADER.size + length
+    if position < self._end:
+      with open(self.filename, mode="r+b") as f:
+        f.truncate(position)
+      self._end = position
+      if self._offset > position:
+        self._offset = self._record = self._hint = position
+
+  def _headers(self, start):
+    """
+    Read the headers of the records from the beginning of the record.
+
+    Yields
+    ----
+    start: int
+      Position of the beginning of the record.
+    length: int
+      Number of bytes of the text.
+    """
+    with open(self.filename, mode="rb") as f:
+      while start < self._end:
+        f.seek(start)
+        length = self.HEADER.unpack(f.read(self.HEADER.size))[0]
+        yield start, length
+        start += self.HEADER.size + length
+
+  def _locate(self, position):
+    """
+    Get the beginning of the record that contains the position.
+    The headers are followed from the committed record, skipping the texts.
+    """
+    origin = max((p for p in (self._hint, self._record, self.base) if p <= position))
+    for start, length in self._headers(origin):
+      if position < start + self.HEADER.size + length:
+        self._hint = start
+        return start
+    return self._end
+
+  def _fence_at(self, position):
+    """
+    Get the code fence open at the specified position.
+    """
+    start = self._locate(position)
+    fence = None
+    if start + self.HEADER.size < position:
+      text = self.read(start + self.HEADER.size, position - start - self.HEADER.size).decode("utf-8", errors="replace")
+      for line in text.split("\n")[:-1]:
+        fence = self._toggle_fence(fence, line)
+    return fence
+
+  def _read_chunks(self, max_length, count, total_length, position, fence):
+    """
+    Read chunks of the log string from the specified position.
+    The texts of the records are joined with `RECORD_END` and cut in the same way as the text format,
+    and the positions in the joined text are converted to the positions in the journal.
+    """
+    self.flush()
+    chunks = []
+    while len(chunks) < count and position < self._end:
+      length = max_length if total_length == -1 else min(max_length, total_length)
+      if max_length != -1 and length < 2:
+        break
+      parts, spans, eof = self._read_texts(position, -1 if max_length == -1 else length * 4 + 4)
+      text = "".join(parts)
+      if max_length == -1:
+        text = text.replace(self.RECORD_END, "\n").replace("\r\n", "\n")
+        chunks.append(LogChunk(text if fence is None else fence + "\n" + text, position, self._end, self._generation))
+        return chunks, None
+      text, n, fence = self._cut_text(text, length, eof, split=len(chunks) == 0 or length == max_length, fence=fence)
+      if n == 0:
+        break
+      end = self._end
+      for text_start, text_end, file_start, next_record in spans:
+        if n < text_end:
+          end = file_start + n - text_start
+          break
+        if n <= text_end + len(self.RECORD_END.encode("utf-8")):
+          end = next_record
+          break
+      chunks.append(LogChunk(text, position, end, self._generation))
+      position = end
+      if total_length != -1:
+        total_length -= len(text)
+    return chunks, fence
+
+  def _read_texts(self, position, size):
+    """
+    Read the texts of the records from the position.
+
+    Parameters
+    ----
+    position: int
+      Position to start reading.
+    size: int
+      Number of bytes of the texts to read. -1 means all.
+
+    Returns
+    ----
+    parts: list of str
+      Texts of the records. The text of a complete record is followed by `RECORD_END`.
+    spans: list of tuple
+      Range of each text in bytes of the joined text, the position of the text in the journal and the position of the next record.
+    eof: bool
+      Whether the texts reach the end of the journal.
+    """
+    parts = []
+    spans = []
+    total = 0
+    terminator = self.RECORD_END.encode("utf-8")
+    start = self._locate(position)
+    with open(self.filename, mode="rb") as f:
+      while start < self._end and (size == -1 or total < size):
+        f.seek(start)
+        length = self.HEADER.unpack(f.read(self.HEADER.size))[0]
+        next_record = start + self.HEADER.size + length
+        skip = max(position - start - self.HEADER.size, 0)
+        want = length - skip if size == -1 else min(length - skip, size - total)
+        f.seek(start + self.HEADER.size + skip)
+        data = f.read(want)
+        complete = skip + want == length
+        # Do not cut a character in the middle of the record.
+        text = data.decode("utf-8") if complete else data.decode("utf-8", errors="ignore")
+        data = text.encode("utf-8")
+        spans.append((total, total + len(data), start + self.HEADER.size + skip, next_record))
+        parts.append(text + self.RECORD_END if complete else text)
+        total += len(data) + (len(terminator) if complete else 0)
+        if not complete:
+          return parts, spans, False
+        start = next_record
+    return parts, spans, start >= self._end
+
+if __name__ == "__main__":
+  # Dump the journal in the text format: python -m logreporter.storage.journalstorage <journal file>
+  JournalStorage(sys.argv[1]).dump(sys.stdout)
@@ -0,0 +1,144 @@
+import bisect
+
+from logreporter.storage.abstractstorage import AbstractStorage
+
+class MemoryStorage(AbstractStorage):
+  """
+  A storage that keeps the log only in memory, for environments without a persistent disk.
+  It is a ring buffer of records, and the oldest records are discarded when it exceeds the limits.
+  Positions count the bytes written since the storage was created, so they never go back.
+  """
+  # Number of released records at which the lists of the records are compacted.
+  COMPACT_RECORDS = 1024
+
+  def __init__(self, max_bytes=1024 * 1024, max_records=-1):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    max_bytes: int
+      Maximum number of bytes kept in the buffer. -1 means no limit.
+    max_records: int
+      Maximum number of records kept in the buffer. -1 means no limit.
+    """
+    super().__init__()
+    self.max_bytes = max_bytes
+    self.max_records = max_records
+    self.evicted_records = 0
+    self.evicted_bytes = 0
+    # The records and their start positions. The records before `_head` have been released.
+    self._records = []
+    self._starts = []
+    self._head = 0
+    # Position of the beginning of the first record in the buffer.
+    self._base = 0
+    self._end = 0
+    self._offset = 0
+
+  @property
+  def offset(self):
+    """
+    The committed position.
+    """
+    return self._offset
+
+  @property
+  def end(self):
+    """
+    The position of the end of the log.
+    """
+    return self._end
+
+  @property
+  def pending_records(self):
+    """
+    Number of records that have not been reported completely yet.
+    The reported records are released, so all the records in the buffer are counted.
+    """
+    return len(self._records) - self._head
+
+  @property
+  def base(self):
+    """
+    The position of the beginning of the first record in the buffer.
+    """
+    return self._base
+
+  def write(self, text):
+    """
+    Append the text to the buffer as a record.
+    If the buffer exceeds the limits, the oldest records are discarded even if they have not been reported.
+    """
+    data = text.encode("utf-8")
+    with self.lock:
+      self._records.append(data)
+      self._starts.append(self._end)
+      self._end += len(data)
+      while len(self._records) - self._head > 1 and (
+          self.max_bytes != -1 and self._end - self._base > self.max_bytes or
+          self.max_records != -1 and len(self._records) - self._head > self.max_records):
+        self._evict()
+      self._compact()
+
+  def read(self, start, size=-1):
+    """
+    Read the buffer.
+    The first record is found by a binary search of the start positions, so reading ahead of the committed position is not slow.
+    """
+    with self.lock:
+      start = max(start, self._base)
+      parts = []
+      length = 0
+      i = max(bisect.bisect_right(self._starts, start, self._head) - 1, self._head)
+      while i < len(self._records) and (size == -1 or length < size):
+        part = self._records[i][max(start - self._starts[i], 0):]
+        parts.append(part)
+        length += len(part)
+        i += 1
+      data = b"".join(parts)
+      return data if size == -1 else data[:size]
+
+  def commit(self, position):
+    """
+    Record that the log has been reported up to the specified position, and release the reported records.
+    """
+    with self.lock:
+      while self._head < len(self._records) and self._base + len(self._records[self._head]) <= position:
+        self._base += len(self._records[self._head])
+        self._head += 1
+      self._compact()
+      self._offset = max(self._offset, min(position, self._end))
+
+  def clear(self):
+    """
+    Delete all the records.
+    """
+    with self.lock:
+      self._records.clear()
+      self._starts.clear()
+      self._head = 0
+      self._base = self._end
+      self._offset = self._end
+
+  def _evict(self):
+    """
+    Discard the oldest record.
+    """
+    data = self._records[self._head]
+    self._head += 1
+    unreported = self._base + len(data) - max(self._offset, self._base)
+    if unreported > 0:
+      self.evicted_records += 1
+      self.evicted_bytes += unreported
+    self._base += len(data)
+    self._offset = max(self._offset, self._base)
+
+  def _compact(self):
+    """
+    Remove the released records from the lists when they are the majority.
+    """
+    if self._head >= self.COMPACT_RECORDS and self._head * 2 >= len(self._records) or self._head == len(self._records) > 0:
+      del self._records[:self._head]
+      del self._starts[:self._head]
+      self._head = 0
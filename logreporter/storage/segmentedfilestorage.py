@@ -0,0 +1,508 @@
+import bisect
+import os
+from pathlib import Path
+import threading
+import zlib
+
+from logreporter.storage.abstractstorage import AbstractStorage
+
+class SegmentedFileStorage(AbstractStorage):
+  """
+  A storage that keeps the log in segment files of limited size, and limits the size of the whole backlog.
+  Each segment file is named after the position of its first byte, such as `reporter.log.0000000000001024`.
+  When the backlog exceeds its limits, the oldest segment is removed even if it has not been reported,
+  and a line telling how much log was dropped is written so that it is included in the next report.
+  If the line is removed before it is reported, its numbers are added to the next line instead of counting it as a record.
+  In compressed mode, a segment is compressed into a gzip file such as `reporter.log.0000000000001024.gz` after it is closed.
+  The compression runs on a background thread, so the thread that writes the log does not wait for it,
+  and the uncompressed segment is read until the compression finishes.
+  The positions always count the uncompressed bytes, and the active segment is never compressed.
+  """
+  DROPPED_MESSAGE = "{records} records / {bytes} bytes dropped because the backlog exceeded its limit."
+  # Number of uncompressed bytes in each gzip member of a compressed segment.
+  # A member is the unit that is decompressed to read from the middle of the segment.
+  FRAME_BYTES = 65536
+
+  def __init__(self, filename, segment_bytes=1024 * 1024, max_bytes=-1, max_records=-1, compress=False):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    filename: Path or str
+      Base name of the segment files.
+    segment_bytes: int
+      Size at which the active segment is closed and a new one is started.
+    max_bytes: int
+      Maximum number of bytes of all the segments. -1 means no limit.
+      The active segment is never removed, so the backlog may exceed this value by up to one segment.
+    max_records: int
+      Maximum number of records in all the segments. -1 means no limit.
+    compress: bool
+      If True, the segments are compressed after they are closed. `max_bytes` still counts the uncompressed bytes.
+    """
+    super().__init__()
+    self.filename = Path(filename)
+    self.segment_bytes = segment_bytes
+    self.max_bytes = max_bytes
+    self.max_records = max_records
+    self.compress = compress
+    self.dropped_records = 0
+    self.dropped_bytes = 0
+    self._offsetfile = self.filename.with_name(self.filename.name + ".offset")
+    self._stream = None
+    self._starts = []
+    self._records = {}
+    # Positions of the marker lines written by this instance, with the numbers of the records and the bytes they tell and their lengths.
+    self._markers = {}
+    # Uncompressed positions, file positions and uncompressed size of the members of the compressed segments.
+    self._frames = {}
+    # The last member decompressed, to read the following bytes without decompressing it again.
+    self._framecache = None
+    # The closed segments waiting for the compression, the segment being compressed and the thread that compresses them.
+    self._unsealed = []
+    self._sealing = None
+    self._sealer = None
+    for f in self.filename.parent.glob(self.filename.name + ".*"):
+      suffix = f.name[len(self.filename.name) + 1:]
+      if suffix.endswith(".gz.tmp"):
+        # The compression was interrupted. The uncompressed segment is still there.
+        f.unlink()
+      elif suffix.isdigit():
+        if not f.with_name(f.name + ".gz").exists():
+          self._starts.append(int(suffix))
+        else:
+          # The compressed segment had been completed before the uncompressed one was removed.
+          f.unlink()
+      elif suffix.endswith(".gz") and suffix[:-3].isdigit():
+        self._starts.append(int(suffix[:-3]))
+        self._frames[int(suffix[:-3])] = None
+    self._starts.sort()
+    try:
+      self._offset = int(self._offsetfile.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+      self._offset = self._starts[0] if len(self._starts) > 0 else 0
+    if len(self._starts) > 0:
+      self._end = self._starts[-1] + self._segment_size(self._starts[-1])
+      self._offset = min(max(self._offset, self._starts[0]), self._end)
+    else:
+      self._end = self._offset
+    for start in self._starts:
+      self._records[start] = self._count_records(start, start)
+    if self.compress:
+      with self.lock:
+        for start in self._starts[:-1]:
+          if start not in self._frames:
+            self._schedule_seal(start)
+
+  @property
+  def offset(self):
+    """
+    The committed position.
+    """
+    return self._offset
+
+  @property
+  def end(self):
+    """
+    The position of the end of the log.
+    """
+    return self._end
+
+  @property
+  def base(self):
+    """
+    The position of the beginning of the oldest segment.
+    """
+    return self._starts[0] if len(self._starts) > 0 else self._end
+
+  @property
+  def segments(self):
+    """
+    Paths of the segment files, from the oldest.
+    """
+    return [self._segment_path(start) for start in self._starts]
+
+  def write(self, text):
+    """
+    Append the text to the active segment.
+    A new segment is started if the active one is full, and the oldest segments are removed if the backlog exceeds its limits.
+    """
+    data = text.encode("utf-8")
+    with self.lock:
+      if len(self._starts) == 0 or self._end > self._starts[-1] and (
+          self._end - self._starts[-1] + len(data) > self.segment_bytes or self._starts[-1] in self._frames):
+        self._rotate()
+      self._append(data)
+      records = 0
+      size = 0
+      while len(self._starts) > 1 and (
+          self.max_bytes != -1 and self._end - self._starts[0] > self.max_bytes or
+          self.max_records != -1 and sum(self._records.values()) > self.max_records):
+        r, s = self._evict()
+        records += r
+        size += s
+      if records > 0:
+        marker = (self.DROPPED_MESSAGE.format(records=records, bytes=size) + self.RECORD_END).encode("utf-8")
+        self._markers[self._end] = (records, size, len(marker))
+        self._append(marker)
+
+  def flush(self):
+    """
+    Flush the written text to the active segment.
+    """
+    with self.lock:
+      if self._stream is not None:
+        self._stream.flush()
+
+  def read(self, start, size=-1):
+    """
+    Read the segments from the specified position.
+    """
+    with self.lock:
+      self.flush()
+      parts = []
+      length = 0
+      i = max(bisect.bisect_right(self._starts, start) - 1, 0)
+      while i < len(self._starts) and (size == -1 or length < size):
+        segment_start = self._starts[i]
+        if segment_start in self._frames:
+          part = self._read_compressed(segment_start, max(start - segment_start, 0), -1 if size == -1 else size - length)
+        else:
+          with open(self._segment(segment_start), mode="rb") as f:
+            f.seek(max(start - segment_start, 0))
+            part = f.read(-1 if size == -1 else size - length)
+        parts.append(part)
+        length += len(part)
+        i += 1
+      return b"".join(parts)
+
+  def commit(self, position):
+    """
+    Record that the log has been reported up to the specified position, and remove the segments that have been reported.
+    """
+    with self.lock:
+      self._offset = min(position, self._end)
+      while len(self._starts) > 0 and self._segment_end(0) <= self._offset:
+        if len(self._starts) == 1:
+          self._close_stream()
+        self._remove(self._starts.pop(0))
+      for marker in [m for m in self._markers if m < self._offset]:
+        del self._markers[marker]
+      self._replace_file(self._offsetfile, str(self._offset))
+
+  def clear(self):
+    """
+    Remove all the segments.
+    """
+    with self.lock:
+      self.flush()
+      self.commit(self._end)
+
+  def close(self):
+    """
+    Close the stream of the active segment, and wait until the closed segments have been compressed.
+    """
+    with self.lock:
+      self._close_stream()
+    self.wait_sealed()
+
+  def wait_sealed(self, timeout=None):
+    """
+    Wait until the closed segments have been compressed.
+
+    Parameters
+    ----
+    timeout: float
+      Maximum number of seconds to wait. None means waiting until the compression finishes.
+
+    Returns
+    ----
+    sealed: bool
+      False if the compression is still running after the timeout.
+    """
+    sealer = self._sealer
+    if sealer is not None:
+      sealer.join(timeout)
+      return not sealer.is_alive()
+    return True
+
+  def _segment(self, start):
+    """
+    Get the path of the segment file that starts at the specified position.
+    """
+    return self.filename.with_name("{}.{:016d}".format(self.filename.name, start))
+
+  def _segment_path(self, start):
+    """
+    Get the path of the segment file, which is the compressed file if the segment has been compressed.
+    """
+    path = self._segment(start)
+    return path.with_name(path.name + ".gz") if start in self._frames else path
+
+  def _segment_size(self, start):
+    """
+    Get the number of uncompressed bytes of the segment.
+    """
+    if start in self._frames:
+      return self._frame_index(start)[2]
+    return self._segment(start).stat().st_size
+
+  def _remove(self, start):
+    """
+    Remove the segment file.
+    The segment being compressed is removed by the background thread when the compression finishes.
+    """
+    if start == self._sealing:
+      self._sealing = None
+    else:
+      self._segment_path(start).unlink()
+    del self._records[start]
+    self._frames.pop(start, None)
+    if self._framecache is not None and self._framecache[0] == start:
+      self._framecache = None
+
+  def _schedule_seal(self, start):
+    """
+    Add the closed segment to the segments compressed by the background thread, and start the thread if it is not running.
+    It is called with the lock held.
+    """
+    self._unsealed.append(start)
+    if self._sealer is None:
+      self._sealer = threading.Thread(target=self._seal_segments, name="SegmentedFileStorage", daemon=True)
+      self._sealer.start()
+
+  def _seal_segments(self):
+    """
+    The body of the background thread.
+    The segment is compressed without the lock, because a closed segment is never changed,
+    and the compressed file replaces it with the lock held.
+    """
+    while True:
+      with self.lock:
+        if len(self._unsealed) == 0:
+          self._sealer = None
+          return
+        start = self._unsealed.pop(0)
+        if start not in self._records or start in self._frames:
+          continue
+        self._sealing = start
+      path = self._segment(start)
+      try:
+        result = self._seal(start)
+      except OSError:
+        result = None
+      with self.lock:
+        removed = self._sealing != start
+        self._sealing = None
+        if result is not None and not removed:
+          temp, frames = result
+          os.replace(temp, path.with_name(path.name + ".gz"))
+          path.unlink()
+          self._frames[start] = frames
+        else:
+          # The compression failed, or the segment was removed during the compression.
+          for f in ([] if result is None else [result[0]]) + ([path] if removed else []):
+            try:
+              f.unlink()
+            except OSError:
+              pass
+
+  def _seal(self, start):
+    """
+    Compress the closed segment into a temporary file of gzip members of `FRAME_BYTES` each.
+    The members are decompressed by any gzip tool as one file.
+
+    Returns
+    ----
+    temp: Path
+      The temporary file. None is returned instead of the tuple if the segment is empty.
+    frames: tuple
+      Positions of the members in the same form as `_frame_index()`.
+    """
+    path = self._segment(start)
+    if not path.exists() or path.stat().st_size == 0:
+      return None
+    temp = path.with_name(path.name + ".gz.tmp")
+    positions = []
+    offsets = []
+    size = 0
+    with open(path, mode="rb") as src, open(temp, mode="wb") as dst:
+      for block in iter(lambda: src.read(self.FRAME_BYTES), b""):
+        positions.append(size)
+        offsets.append(dst.tell())
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        dst.write(compressor.compress(block) + compressor.flush())
+        size += len(block)
+      if self.fsync:
+        dst.flush()
+        os.fsync(dst.fileno())
+    return temp, (positions, offsets, size)
+
+  def _frame_index(self, start):
+    """
+    Get the positions of the members of the compressed segment.
+    The index of a segment compressed by another instance is made by decompressing the segment once.
+
+    Returns
+    ----
+    positions: list of int
+      Uncompressed position of each member in the segment.
+    offsets: list of int
+      Position of each member in the compressed file.
+    size: int
+      Number of uncompressed bytes of the segment.
+    """
+    if self._frames[start] is None:
+      positions = []
+      offsets = []
+      size = 0
+      offset = 0
+      decompressor = None
+      data = b""
+      with open(self._segment_path(start), mode="rb") as f:
+        while True:
+          if data == b"":
+            data = f.read(65536)
+            if data == b"":
+              break
+          if decompressor is None:
+            decompressor = zlib.decompressobj(31)
+            positions.append(size)
+            offsets.append(offset)
+          size += len(decompressor.decompress(data))
+          offset += len(data) - len(decompressor.unused_data)
+          data = decompressor.unused_data
+          if decompressor.eof:
+            decompressor = None
+      self._frames[start] = (positions, offsets, size)
+    return self._frames[start]
+
+  def _read_compressed(self, start, position, size):
+    """
+    Read the compressed segment from the position, decompressing only the members that contain the bytes.
+
+    Parameters
+    ----
+    start: int
+      Position of the beginning of the segment.
+    position: int
+      Position in the segment.
+    size: int
+      Number of bytes to read. -1 means all.
+    """
+    positions, offsets, total = self._frame_index(start)
+    parts = []
+    length = 0
+    i = bisect.bisect_right(positions, position) - 1
+    with open(self._segment_path(start), mode="rb") as f:
+      while 0 <= i < len(positions) and position < total and (size == -1 or length < size):
+        if self._framecache is not None and self._framecache[:2] == (start, i):
+          data = self._framecache[2]
+        else:
+          f.seek(offsets[i])
+          data = zlib.decompress(f.read(offsets[i + 1] - offsets[i] if i + 1 < len(offsets) else -1), 31)
+          self._framecache = (start, i, data)
+        part = data[position - positions[i]:] if size == -1 else data[position - positions[i]:position - positions[i] + size - length]
+        parts.append(part)
+        length += len(part)
+        position += len(part)
+        i += 1
+    return b"".join(parts)
+
+  def _segment_end(self, index):
+    """
+    Get the position of the end of the segment.
+    """
+    return self._starts[index + 1] if index + 1 < len(self._starts) else self._end
+
+  def _rotate(self):
+    """
+    Close the active segment and start a new one at the end of the log.
+    The closed segment is compressed on the background thread in compressed mode.
+    """
+    self._close_stream()
+    if self.compress and len(self._starts) > 0 and self._starts[-1] not in self._frames:
+      self._schedule_seal(self._starts[-1])
+    self._starts.append(self._end)
+    self._records[self._end] = 0
+
+  def _append(self, data):
+    """
+    Write the bytes of a record to the active segment.
+    """
+    if self._stream is None:
+      self._stream = open(self._segment(self._starts[-1]), mode="ab")
+    self._stream.write(data)
+    self._end += len(data)
+    self._records[self._starts[-1]] += 1
+
+  def _evict(self):
+    """
+    Remove the oldest segment.
+
+    The marker lines in the segment are not counted as records, and the numbers they tell are returned instead.
+
+    Returns
+    ----
+    records: int
+      Number of the records removed without being reported.
+    size: int
+      Number of the bytes removed without being reported.
+    """
+    start = self._starts[0]
+    end = self._segment_end(0)
+    records = 0
+    size = 0
+    carried_records = 0
+    carried_bytes = 0
+    if self._offset < end:
+      records = self._count_records(start, self._offset)
+      size = end - max(self._offset, start)
+      for position in [m for m in self._markers if self._offset <= m < end]:
+        marker_records, marker_bytes, length = self._markers.pop(position)
+        records -= 1
+        size -= length
+        carried_records += marker_records
+        carried_bytes += marker_bytes
+      self._offset = end
+      self._replace_file(self._offsetfile, str(self._offset))
+    for position in [m for m in self._markers if m < end]:
+      del self._markers[position]
+    self._remove(self._starts.pop(0))
+    self.dropped_records += records
+    self.dropped_bytes += size
+    return records + carried_records, size + carried_bytes
+
+  def _count_records(self, start, position):
+    """
+    Count the records in the segment after the specified position.
+    """
+    separator = self.RECORD_END.encode("utf-8")
+    count = 0
+    following = b""
+    if start in self._frames:
+      position = max(position - start, 0)
+      read = lambda: self._read_compressed(start, position, 65536)
+    else:
+      f = open(self._segment(start), mode="rb")
+      f.seek(max(position - start, 0))
+      read = lambda: f.read(65536)
+    try:
+      for block in iter(read, b""):
+        # The last byte of the previous block is added to count the record end across the blocks.
+        count += (following + block).count(separator)
+        following = block[-1:]
+        position += len(block)
+    finally:
+      if start not in self._frames:
+        f.close()
+    return count
+
+  def _close_stream(self):
+    """
+    Close the stream of the active segment.
+    """
+    if self._stream is not None:
+      self._stream.close()
+      self._stream = None
@@ -0,0 +1,195 @@
+import os
+import threading
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+
+from logreporter.storage.filestorage import FileStorage
+
+class _ProcessLock(object):
+  """
+  A reentrant lock shared by the threads of this process and the other processes that use the same lock file.
+  The lock between the processes is an advisory lock of `fcntl.flock()`.
+  """
+
+  def __init__(self, filename, on_acquire=None):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    filename: Path
+      Lock file name. The file is created if it does not exist, and it is never removed.
+    on_acquire: func() or None
+      A function called when the lock is acquired by the outermost `acquire()`.
+    """
+    self.filename = filename
+    self._on_acquire = on_acquire
+    self._lock = threading.RLock()
+    self._depth = 0
+    self._fd = None
+    self._pid = None
+
+  def acquire(self, blocking=True):
+    """
+    Acquire the lock.
+
+    Parameters
+    ----
+    blocking: bool
+      If False, return immediately when another thread or process holds the lock.
+
+    Returns
+    ----
+    acquired: bool
+      Whether the lock has been acquired.
+    """
+    if not self._lock.acquire(blocking):
+      return False
+    if self._depth == 0:
+      if self._pid != os.getpid():
+        # A descriptor inherited by fork() shares the lock with the parent process, so it is opened again.
+        self._fd = os.open(str(self.filename), os.O_RDWR | os.O_CREAT, 0o644)
+        self._pid = os.getpid()
+      try:
+        fcntl.flock(self._fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except BlockingIOError:
+        self._lock.release()
+        return False
+    self._depth += 1
+    if self._depth == 1 and self._on_acquire is not None:
+      try:
+        self._on_acquire()
+      except BaseException:
+        self.release()
+        raise
+    return True
+
+  def release(self):
+    """
+    Release the lock.
+    """
+    self._depth -= 1
+    if self._depth == 0:
+      fcntl.flock(self._fd, fcntl.LOCK_UN)
+    self._lock.release()
+
+  def close(self):
+    """
+    Close the lock file.
+    """
+    with self._lock:
+      if self._fd is not None and self._pid == os.getpid():
+        os.close(self._fd)
+      self._fd = None
+      self._pid = None
+
+  def __enter__(self):
+    self.acquire()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.release()
+
+class SharedFileStorage(FileStorage):
+  """
+  A storage that keeps the log in a file shared by several processes, such as the workers of a web server.
+  Every operation holds an advisory lock on a lock file next to the log file, so the records of the processes are never mixed,
+  and the committed position written by another process is read again when it has changed.
+  Only the process that holds the uploader lock uploads the log, so the same log is never uploaded twice.
+  fcntl is required to use this class.
+  """
+  # The log file is changed by the other processes, so its size is always checked.
+  STAT_INTERVAL = 0.0
+
+  def __init__(self, filename):
+    """
+    Constructor.
+
+    Parameters
+    ----
+    filename: Path or str
+      Log file name.
+    """
+    if fcntl is None:
+      raise ImportError("fcntl is required to use SharedFileStorage.")
+    super().__init__(filename)
+    self._signature = self._sidecar_signature()
+    self.lock = _ProcessLock(self.filename.with_name(self.filename.name + ".lock"), on_acquire=self._reload_offset)
+    self._uploaderlock = _ProcessLock(self.filename.with_name(self.filename.name + ".upload.lock"))
+
+  @property
+  def generation(self):
+    """
+    Number of times the log file has been emptied by any of the processes.
+    """
+    with self.lock:
+      return self._generation
+
+  def write(self, text):
+    """
+    Append the text to the end of the log file.
+    The text is written to the file before the lock is released, so that it is never mixed with the text of another process.
+    """
+    with self.lock:
+      # Count the text appended by the other processes before this text.
+      self._resync()
+      super().write(text)
+      self._stream.flush()
+
+  def close(self):
+    """
+    Close the stream of the log file.
+    """
+    with self.lock:
+      super().close()
+
+  def acquire_uploader(self):
+    """
+    Try to become the only uploader of the log among the processes.
+    """
+    return self._uploaderlock.acquire(blocking=False)
+
+  def release_uploader(self):
+    """
+    Stop being the uploader of the log.
+    """
+    self._uploaderlock.release()
+
+  def _save_offset(self, offset):
+    """
+    Write the committed position, and remember the sidecar file so that it is not read again by this process.
+    """
+    super()._save_offset(offset)
+    self._signature = self._sidecar_signature()
+
+  def _reload_offset(self):
+    """
+    Read the committed position again if another process has replaced the sidecar file.
+    The sidecar file is always replaced with a new file, so it is compared by its inode and time.
+    """
+    signature = self._sidecar_signature()
+    if signature != self._signature:
+      self._signature = signature
+      offset, generation = self._offset, self._generation
+      self._offset = self._load_offset()
+      if self._checked_at is not None:
+        if generation == self._generation and offset <= self._offset:
+          # Another process has committed the records.
+          self._records -= self._count_records(offset, self._offset)
+        else:
+          # Another process has emptied the log file.
+          self._inode = None
+          self._checked_at = None
+
+  def _sidecar_signature(self):
+    """
+    Get the values that change when the sidecar file is replaced.
+    """
+    try:
+      stat = self._offsetfile.stat()
+    except OSError:
+      return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
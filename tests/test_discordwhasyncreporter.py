@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import unittest
+
+try:
+  import aiohttp
+except ImportError:
+  aiohttp = None
+
+from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.reporter import Reporter
+from logreporter.report.discordwhasyncreporter import DiscordWHAsyncReporter
+from logreporter.report.discordwhreporter import DiscordWHReporter
+from webhookstub import WebhookStub
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed.")
+class TestDiscordWHAsyncReporter(unittest.TestCase):
+  """
+  A test class that verifies the operation of `DiscordWHAsyncReporter`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    logger = logging.getLogger("testlogger")
+    logger.handlers.clear()
+    f = ReporterLogHandler.get_defaultfilename()
+    if f.exists(): f.unlink()
+    Reporter.reset()
+    self.stub = WebhookStub()
+    self.addCleanup(self.stub.close)
+
+  def run_async(self, coroutine):
+    """
+    Run the coroutine on a new event loop.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+      return loop.run_until_complete(coroutine)
+    finally:
+      loop.close()
+
+  #endregion
+
+  #region Normal Department test
+
+  def test_upload_report_async(self):
+    """
+    When you send the following log using `Reporter#upload_report_async()`, check that it can be sent.
+    * Number of characters: 1,000 characters x 3 lines
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHAsyncReporter(self.stub.url))
+    for i in range(3):
+      logger.warn(str(i) * 1000)
+    self.assertTrue(self.run_async(reporter.upload_report_async(message="test message")))
+    self.assertEqual([p["embeds"][0]["description"] for p in self.stub.payloads], [str(i) * 1000 for i in range(3)])
+    self.assertEqual(self.stub.payloads[0]["content"], "test message")
+    self.assertFalse(reporter.log_remaining)
+
+  def test_upload_report_async_concurrency(self):
+    """
+    When you send the following log using `DiscordWHAsyncReporter`, check that all the chunks are sent and committed.
+    * Number of characters: 1,000 characters x 5 lines
+    * concurrency = 3
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHAsyncReporter(self.stub.url, concurrency=3))
+    for i in range(5):
+      logger.warn(str(i) * 1000)
+    self.assertTrue(self.run_async(reporter.upload_report_async()))
+    self.assertEqual(sorted(p["embeds"][0]["description"] for p in self.stub.payloads), [str(i) * 1000 for i in range(5)])
+
+  def test_upload_report_sync(self):
+    """
+    Confirm that `Reporter#upload_report()` can send the log with `DiscordWHAsyncReporter`.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHAsyncReporter(self.stub.url, max_embeds=10))
+    logger.warn("test message")
+    self.assertTrue(reporter.upload_report())
+    self.assertEqual(len(self.stub.requests), 1)
+
+  def test_upload_report_async_sync_reporter(self):
+    """
+    Confirm that `Reporter#upload_report_async()` can send the log with `DiscordWHReporter`.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(self.stub.url))
+    logger.warn("test message")
+    self.assertTrue(self.run_async(reporter.upload_report_async()))
+    self.assertEqual(len(self.stub.requests), 1)
+    reporter.close()
+
+  #endregion
+
+  #region Anomaly test
+
+  def test_upload_report_async_error(self):
+    """
+    When you send the following log using `DiscordWHAsyncReporter`, Confirm that the chunks before the failed request are committed and the rest remain.
+    * The webhook returns 500 to the second request.
+    """
+    self.stub.responses.extend([(204, {}), (500, {})])
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHAsyncReporter(self.stub.url))
+    for i in range(3):
+      logger.warn(str(i) * 1000)
+    with self.assertRaises(aiohttp.ClientResponseError):
+      self.run_async(reporter.upload_report_async())
+    self.assertEqual(reporter._handler.get_text(), "1" * 1000 + "\n" + "2" * 1000 + "\n")
+
+  def test_upload_report_async_cancelled(self):
+    """
+    When `Reporter#upload_report_async()` is cancelled while another upload is running, confirm that the upload lock is not left taken.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(self.stub.url))
+    logger.warn("test message")
+    reporter._uploadlock.acquire()
+    with self.assertRaises(asyncio.TimeoutError):
+      self.run_async(asyncio.wait_for(reporter.upload_report_async(), 0.2))
+    reporter._uploadlock.release()
+    self.assertTrue(reporter._uploadlock.acquire(timeout=1))
+    reporter._uploadlock.release()
+    self.assertTrue(reporter.upload_report())
+    reporter.close()
+
+  #endregion
@@ -1,3 +1,5 @@
+import email.parser
+import gzip
 import json
 import logging
 import unittest
@@ -7,6 +9,8 @@ import requests
 from logreporter.reporterloghandler import ReporterLogHandler
 from logreporter.reporter import Reporter
 from logreporter.report.discordwhreporter import DiscordWHReporter
+from logreporter.storage import MemoryStorage
+from webhookstub import WebhookStub
 
 class TestDiscordWHReporter(unittest.TestCase):
   """
@@ -123,4 +127,257 @@ class TestDiscordWHReporter(unittest.TestCase):
       reporter.upload_report()
     self.assertEqual(reporter._handler.get_text().strip(), "1234567890" * 100)
 
-  #endregion
\ No newline at end of file
+  #endregion
+
+  #region local webhook test
+
+  def test_session_keepalive(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, check that all the requests use the same connection.
+    * Number of characters: 5,000 characters
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url))
+    for i in range(5):
+      logger.warn("1234567890" * 100)
+    self.assertTrue(reporter.upload_report())
+    self.assertEqual(len(stub.requests), 5)
+    self.assertEqual(len(set(r["client"] for r in stub.requests)), 1)
+    reporter.close()
+
+  def test_session_close(self):
+    """
+    Confirm that `Reporter#close()` closes the connections of `DiscordWHReporter`.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    wh = DiscordWHReporter(stub.url)
+    reporter.setup(logger, wh)
+    logger.warn("test message")
+    reporter.upload_report()
+    reporter.close()
+    adapter = wh.session.get_adapter(stub.url)
+    self.assertEqual(len(adapter.poolmanager.pools), 0)
+
+  def test_rate_limited(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, check that the chunk is sent again and all the logs are sent.
+    * The webhook returns 429 to the first request.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    stub.responses.append((429, {"Retry-After": "0.1"}))
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url))
+    logger.warn("test message")
+    self.assertTrue(reporter.upload_report())
+    self.assertEqual(len(stub.requests), 2)
+    self.assertEqual(stub.payloads[0], stub.payloads[1])
+    reporter.close()
+
+  def test_rate_limited_retries_exceeded(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, Confirm that HTTPError occurs and the log remains.
+    * The webhook keeps returning 429.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    stub.responses.extend([(429, {"Retry-After": "0"})] * 3)
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url, rate_limit_retries=2))
+    logger.warn("test message")
+    with self.assertRaises(requests.exceptions.HTTPError):
+      reporter.upload_report()
+    self.assertEqual(len(stub.requests), 3)
+    self.assertEqual(reporter._handler.get_text().strip(), "test message")
+    reporter.close()
+
+  def test_pack_embeds(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, check that several chunks are packed into a request within Discord's limits.
+    * Number of characters: 500 characters x 20 lines
+    * max_embeds = 10
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url, max_embeds=10))
+    for i in range(20):
+      logger.warn("{:03}".format(i) + "x" * 497)
+    self.assertTrue(reporter.upload_report())
+    self.assertEqual(len(stub.requests), 2)
+    lines = []
+    for payload in stub.payloads:
+      descriptions = [e["description"] for e in payload["embeds"]]
+      self.assertLessEqual(len(descriptions), 10)
+      self.assertLessEqual(sum(len(d) for d in descriptions), 6000)
+      self.assertTrue(all(len(d) <= 2000 for d in descriptions))
+      lines.extend("\n".join(descriptions).split("\n"))
+    self.assertEqual(lines, ["{:03}".format(i) + "x" * 497 for i in range(20)])
+    reporter.close()
+
+  def test_pack_embeds_failed(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, Confirm that all the chunks of the failed request remain in the log.
+    * max_embeds = 10
+    * The webhook returns 500.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    stub.responses.append((500, {}))
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url, max_embeds=10))
+    for i in range(5):
+      logger.warn("x" * 1000)
+    with self.assertRaises(requests.exceptions.HTTPError):
+      reporter.upload_report()
+    self.assertEqual(len(stub.payloads[0]["embeds"]), 5)
+    self.assertEqual(reporter._handler.get_text(), ("x" * 1000 + "\n") * 5)
+    reporter.close()
+
+  def test_idempotency_keys(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, check that the same chunk sent again has the same key.
+    * idempotency_keys = True
+    * The webhook returns 500 to the first request.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    stub.responses.append((500, {}))
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url, idempotency_keys=True))
+    logger.warn("test message")
+    with self.assertRaises(requests.exceptions.HTTPError):
+      reporter.upload_report()
+    self.assertTrue(reporter.upload_report())
+    keys = [p["embeds"][0]["footer"]["text"] for p in stub.payloads]
+    self.assertEqual(len(keys), 2)
+    self.assertEqual(keys[0], keys[1])
+    self.assertEqual(len(keys[0]), DiscordWHReporter.KEY_LENGTH)
+    self.assertFalse(reporter._handler.has_text)
+    reporter.close()
+
+  def parse_multipart(self, request):
+    """
+    Get the parts of the multipart request received by the local webhook.
+    """
+    message = email.parser.BytesParser().parsebytes(
+      "Content-Type: {}\r\n\r\n".format(request["headers"]["Content-Type"]).encode("utf-8") + request["body"])
+    return {part.get_param("name", header="Content-Disposition"): part for part in message.get_payload()}
+
+  def test_unreadable_log(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, confirm that the report ends with the log that cannot be read.
+    * lazy_format: True
+    * The last record in the raw storage is being written by another process.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    rlh = ReporterLogHandler(storage=MemoryStorage(), raw_storage=MemoryStorage(), lazy_format=True)
+    rlh.append_log("complete")
+    rlh._rawstorage.write('{"name": "x", "msg": "to')
+    for wh in (DiscordWHReporter(stub.url), DiscordWHReporter(stub.url, attach_threshold=0)):
+      wh.request_report(rlh)
+      self.assertTrue(rlh.has_text)
+      wh.close()
+    self.assertEqual(stub.payloads[0]["embeds"][0]["description"], "complete")
+    self.assertEqual(len(stub.requests), 1)
+
+  def test_attachment(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, check that the log is sent as one gzip file and committed.
+    * Number of characters: 1,000 characters x 50 lines
+    * attach_threshold: 10,000 bytes
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url, attach_threshold=10000))
+    for i in range(50):
+      logger.warn("{:03}".format(i) + "x" * 997)
+    self.assertTrue(reporter.upload_report("test"))
+    self.assertEqual(len(stub.requests), 1)
+    parts = self.parse_multipart(stub.requests[0])
+    payload = json.loads(parts["payload_json"].get_payload(decode=True))
+    self.assertTrue(payload["content"].startswith("test\n50050 bytes"))
+    self.assertEqual(parts["files[0]"].get_filename(), "log.txt.gz")
+    text = gzip.decompress(parts["files[0]"].get_payload(decode=True)).decode("utf-8")
+    self.assertEqual(text, "".join("{:03}".format(i) + "x" * 997 + "\n" for i in range(50)))
+    self.assertFalse(reporter.log_remaining)
+    reporter.close()
+
+  def test_attachment_limit(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, Confirm that each attachment is within `ATTACHMENT_BYTES`.
+    * Number of characters: 1,000 characters x 5 lines
+    * ATTACHMENT_BYTES: 2,500 bytes
+    * ATTACHMENT_CHUNK_LENGTH: 1,000 characters
+    * attach_gzip: False
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    wh = DiscordWHReporter(stub.url, attach_threshold=100, attach_gzip=False)
+    wh.ATTACHMENT_BYTES = 2500
+    wh.ATTACHMENT_CHUNK_LENGTH = 1000
+    reporter.setup(logger, wh)
+    for i in range(5):
+      logger.warn(str(i) * 1000)
+    self.assertTrue(reporter.upload_report())
+    files = [self.parse_multipart(r)["files[0]"].get_payload(decode=True) for r in stub.requests]
+    self.assertEqual([len(f) for f in files], [2002, 2002, 1001])
+    self.assertEqual(b"".join(files), b"".join(str(i).encode("utf-8") * 1000 + b"\n" for i in range(5)))
+    reporter.close()
+
+  def test_attachment_failed(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, Confirm that the attached log remains when the request fails.
+    * attach_threshold: 100 bytes
+    * attach_gzip: False
+    * The webhook returns 429 and then 500.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    stub.responses.extend([(429, {"Retry-After": "0"}), (500, {})])
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url, attach_threshold=100, attach_gzip=False))
+    logger.warn("x" * 200)
+    with self.assertRaises(requests.exceptions.HTTPError):
+      reporter.upload_report()
+    self.assertEqual(len(stub.requests), 2)
+    self.assertEqual(stub.requests[0]["body"], stub.requests[1]["body"])
+    self.assertEqual(self.parse_multipart(stub.requests[1])["files[0]"].get_payload(decode=True), b"x" * 200 + b"\n")
+    self.assertEqual(reporter._handler.get_text(), "x" * 200 + "\n")
+    reporter.close()
+
+  def test_session_404(self):
+    """
+    When you send the following log to a local webhook using `DiscordWHReporter`, Confirm that HTTPError occurs and the log remains.
+    * The webhook returns 404.
+    """
+    stub = WebhookStub()
+    self.addCleanup(stub.close)
+    stub.responses.append((404, {}))
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, DiscordWHReporter(stub.url))
+    logger.warn("test message")
+    with self.assertRaises(requests.exceptions.HTTPError):
+      reporter.upload_report()
+    self.assertEqual(reporter._handler.get_text().strip(), "test message")
+    reporter.close()
+
+  #endregion
@@ -0,0 +1,117 @@
+import logging
+import unittest
+
+from logreporter.reporter import Reporter
+from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.report.abstractreporter import AbstractReporter
+from logreporter.report.fanoutreporter import FanOutReporter
+
+class ChunkReporter(AbstractReporter):
+  """
+  A reporter that keeps the reported chunks, and fails while `failing` is True.
+  """
+  def __init__(self, max_length=20):
+    self.max_length = max_length
+    self.texts = []
+    self.failing = False
+
+  def request_report(self, log_handler, message=""):
+    def report(texts):
+      if self.failing:
+        raise IOError("The sink is not available.")
+      self.texts.extend(texts)
+      return True
+    while log_handler.has_text:
+      if len(log_handler.get_texts(max_length=self.max_length, count=1, report=report)) == 0:
+        break
+
+class TestFanOutReporter(unittest.TestCase):
+  """
+  A test class that verifies the operation of `FanOutReporter`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    logger = logging.getLogger("testlogger")
+    logger.handlers.clear()
+    f = ReporterLogHandler.get_defaultfilename()
+    if f.exists(): f.unlink()
+    Reporter.reset()
+
+  def setup_reporter(self, fanout):
+    """
+    Set up `Reporter` with the reporter and write 3 records.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    reporter.setup(logger, fanout)
+    logger.warn("testing")
+    logger.warn("message")
+    logger.warn("abcdefg")
+    return reporter
+
+  #endregion
+
+  #region fan-out test
+
+  def test_all_sinks(self):
+    """
+    Confirm that all the reporters receive the whole log and the log is removed after all of them have sent it.
+    * Reporters: 2 with different chunk sizes
+    """
+    sinks = [ChunkReporter(max_length=7), ChunkReporter(max_length=20)]
+    reporter = self.setup_reporter(FanOutReporter(sinks))
+    self.assertTrue(reporter.upload_report())
+    self.assertEqual(sinks[0].texts, ["testing", "message", "abcdefg"])
+    self.assertEqual(sinks[1].texts, ["testing\nmessage", "abcdefg"])
+    self.assertFalse(reporter.log_remaining)
+    reporter.close()
+
+  def test_failed_sink(self):
+    """
+    Confirm that the log is kept while a reporter fails, and only the log it has not sent is sent to it after it recovers.
+    * Reporters: 2
+    * quorum: all
+    """
+    sinks = [ChunkReporter(), ChunkReporter()]
+    fanout = FanOutReporter(sinks)
+    reporter = self.setup_reporter(fanout)
+    sinks[1].failing = True
+    with self.assertRaises(IOError):
+      reporter.upload_report()
+    self.assertIsInstance(fanout.errors[1], IOError)
+    self.assertTrue(reporter.log_remaining)
+    sinks[1].failing = False
+    self.assertTrue(reporter.upload_report())
+    self.assertEqual(sinks[0].texts, ["testing\nmessage", "abcdefg"])
+    self.assertEqual(sinks[1].texts, ["testing\nmessage", "abcdefg"])
+    self.assertIsNone(fanout.errors[1])
+    reporter.close()
+
+  def test_quorum(self):
+    """
+    Confirm that the log is removed when the quorum of the reporters have sent it, without raising the error of the other reporter.
+    * Reporters: 3
+    * quorum: 2
+    """
+    sinks = [ChunkReporter(), ChunkReporter(), ChunkReporter()]
+    fanout = FanOutReporter(sinks, quorum=2)
+    reporter = self.setup_reporter(fanout)
+    sinks[2].failing = True
+    self.assertTrue(reporter.upload_report())
+    self.assertEqual(sinks[2].texts, [])
+    self.assertIsInstance(fanout.errors[2], IOError)
+    reporter.close()
+
+  def test_quorum_out_of_range(self):
+    """
+    Confirm that ValueError occurs when the quorum is larger than the number of the reporters.
+    """
+    with self.assertRaises(ValueError):
+      FanOutReporter([ChunkReporter()], quorum=2)
+
+  #endregion
@@ -0,0 +1,113 @@
+import io
+import logging
+from pathlib import Path
+import unittest
+
+from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.storage import JournalStorage
+
+class TestJournalStorage(unittest.TestCase):
+  """
+  A test class that verifies the operation of `JournalStorage`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    logger = logging.getLogger("testlogger")
+    logger.handlers.clear()
+    self.filename = Path(__file__).parent / "out" / "test.journal"
+    self.filename.parent.mkdir(exist_ok=True)
+    self.tearDown()
+
+  def tearDown(self):
+    """
+    Executed after each test method call.
+    """
+    for f in (self.filename, self.filename.with_name(self.filename.name + ".offset")):
+      if f.exists(): f.unlink()
+
+  #endregion
+
+  #region ReporterLogHandler test
+
+  def test_handler_get_text(self):
+    """
+    When `ReporterLogHandler` uses `JournalStorage`, confirm that the log is acquired in the same way as the log file.
+    """
+    rlh = ReporterLogHandler(storage=JournalStorage(self.filename))
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing" * 20)
+    logger.warn("message\nabcdefg")
+    rlh.append_log("test")
+    self.assertEqual(rlh.get_text(max_length=150), "testing" * 20)
+    self.assertEqual(rlh.get_text(max_length=10), "message")
+    self.assertEqual(rlh.get_text(), "abcdefg\ntest\n")
+    self.assertFalse(rlh.has_text)
+    rlh.close()
+
+  def test_handler_resume(self):
+    """
+    When `ReporterLogHandler` uses `JournalStorage`, confirm that the log is acquired from the committed position in the middle of a record after it is opened again.
+    """
+    rlh = ReporterLogHandler(storage=JournalStorage(self.filename))
+    rlh.append_log("testing")
+    rlh.append_log("```\nmessage\nabcdefg\n```")
+    self.assertEqual(rlh.get_text(max_length=20), "testing")
+    self.assertEqual(rlh.get_text(max_length=20), "```\nmessage\n```")
+    rlh.close()
+    rlh = ReporterLogHandler(storage=JournalStorage(self.filename))
+    self.assertEqual(rlh.get_text(), "```\nabcdefg\n```\n")
+    rlh.close()
+
+  #endregion
+
+  #region journal test
+
+  def test_records(self):
+    """
+    Confirm that the level and the time of the log record are kept with the text.
+    """
+    rlh = ReporterLogHandler(storage=JournalStorage(self.filename))
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.error("test message")
+    rlh.append_log("test")
+    records = list(rlh.storage.iter_records())
+    self.assertEqual([(level, text) for level, _, text in records], [(logging.ERROR, "test message"), (0, "test")])
+    self.assertGreater(records[0][1], 0)
+    rlh.close()
+
+  def test_torn_record(self):
+    """
+    Confirm that the record torn at the end of the journal is removed when the journal is opened.
+    """
+    storage = JournalStorage(self.filename)
+    storage.write_record("testing")
+    storage.write_record("message")
+    storage.close()
+    size = self.filename.stat().st_size
+    with open(self.filename, mode="r+b") as f:
+      f.truncate(size - 3)
+    storage = JournalStorage(self.filename)
+    self.assertEqual([text for _, _, text in storage.iter_records()], ["testing"])
+    self.assertEqual(storage.end, size - JournalStorage.HEADER.size - 7)
+    storage.close()
+
+  def test_dump(self):
+    """
+    Confirm that the journal is written in the text format of `FileStorage`.
+    """
+    storage = JournalStorage(self.filename)
+    storage.write_record("testing")
+    storage.write_record("message\nabcdefg")
+    stream = io.StringIO()
+    storage.dump(stream)
+    self.assertEqual(stream.getvalue(), "testing\x1e\nmessage\nabcdefg\x1e\n")
+    storage.close()
+
+  #endregion
@@ -0,0 +1,146 @@
+import logging
+import unittest
+
+from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.storage import MemoryStorage
+
+class TestMemoryStorage(unittest.TestCase):
+  """
+  A test class that verifies the operation of `MemoryStorage`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    logger = logging.getLogger("testlogger")
+    logger.handlers.clear()
+    f = ReporterLogHandler.get_defaultfilename()
+    if f.exists(): f.unlink()
+
+  #endregion
+
+  #region ReporterLogHandler test
+
+  def test_handler_get_text(self):
+    """
+    When `ReporterLogHandler` uses `MemoryStorage`, confirm that the log can be acquired and no file is created.
+    """
+    rlh = ReporterLogHandler(storage=MemoryStorage())
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("test message")
+    rlh.append_log("test")
+    self.assertIsNone(rlh._filename)
+    self.assertFalse(ReporterLogHandler.get_defaultfilename().exists())
+    self.assertTrue(rlh.has_text)
+    self.assertEqual(rlh.get_text(), "test message\ntest\n")
+    self.assertFalse(rlh.has_text)
+
+  def test_handler_get_text_max_length(self):
+    """
+    When `ReporterLogHandler` uses `MemoryStorage`, confirm that the log is divided in the same way as the log file.
+    """
+    rlh = ReporterLogHandler(storage=MemoryStorage())
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing" * 20)
+    logger.warn("message" * 30)
+    logger.warn("abcdefg" * 30)
+    self.assertEqual(rlh.get_text(max_length=351), "{}\n{}".format("testing" * 20, "message" * 30))
+    self.assertEqual(rlh.get_text(max_length=100), "abcdefg" * 14 + "ab")
+    self.assertEqual(rlh.get_text(), "cdefg" + "abcdefg" * 15 + "\n")
+
+  def test_handler_report_cancelled(self):
+    """
+    When `ReporterLogHandler` uses `MemoryStorage`, confirm that the log is not committed if the report fails.
+    """
+    rlh = ReporterLogHandler(storage=MemoryStorage())
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    rlh.get_text(max_length=7, report=lambda text: False)
+    self.assertEqual(rlh.get_text(), "testing\nmessage\n")
+
+  #endregion
+
+  #region ring buffer test
+
+  def test_commit_release(self):
+    """
+    Confirm that the committed records are released from the buffer.
+    """
+    storage = MemoryStorage()
+    storage.write("testing\n")
+    storage.write("message\n")
+    storage.commit(8)
+    self.assertEqual(storage.pending_records, 1)
+    self.assertEqual(storage.base, 8)
+    self.assertEqual(storage.pending_bytes, 8)
+    self.assertEqual(storage.read(storage.offset), b"message\n")
+
+  def test_read_middle(self):
+    """
+    Confirm that the log is read from any position after the released records are removed from the buffer.
+    * Number of records: 3000, each 4 bytes
+    * Committed position: after 2000 records
+    """
+    storage = MemoryStorage(max_bytes=-1)
+    for i in range(3000):
+      storage.write("{:03d}\n".format(i % 1000))
+    storage.commit(8000)
+    self.assertEqual(storage.pending_records, 1000)
+    self.assertEqual(storage.read(0, 8), b"000\n001\n")
+    self.assertEqual(storage.read(10002, 6), b"0\n501\n")
+    self.assertEqual(storage.read(11996), b"999\n")
+    self.assertEqual(storage.read(12000), b"")
+
+  def test_max_records(self):
+    """
+    Confirm that the oldest records are discarded when the number of records exceeds max_records.
+    """
+    storage = MemoryStorage(max_records=2)
+    storage.write("1\n")
+    storage.write("2\n")
+    storage.write("3\n")
+    self.assertEqual(storage.read(storage.offset), b"2\n3\n")
+    self.assertEqual(storage.evicted_records, 1)
+    self.assertEqual(storage.evicted_bytes, 2)
+
+  def test_read_chunks_evicted(self):
+    """
+    Confirm that the chunks read ahead from an evicted position start at the oldest record kept.
+    * max_records: 1
+    """
+    storage = MemoryStorage(max_records=1)
+    for i in range(4):
+      storage.write_record("rec{}".format(i))
+    chunks = storage.read_chunks(6, start=6)
+    self.assertEqual([(c.text, c.start, c.end) for c in chunks], [("rec3", 18, 24)])
+    self.assertEqual([(c.text, c.start, c.end) for c in storage.iter_chunks(6, start=6)], [("rec3", 18, 24)])
+
+  def test_max_bytes(self):
+    """
+    Confirm that the oldest records are discarded when the number of bytes exceeds max_bytes.
+    """
+    storage = MemoryStorage(max_bytes=10)
+    storage.write("12345\n")
+    storage.write("12345\n")
+    self.assertEqual(storage.pending_bytes, 6)
+    self.assertEqual(storage.offset, 6)
+    self.assertEqual(storage.evicted_records, 1)
+
+  def test_clear(self):
+    """
+    Confirm that `MemoryStorage#clear()` deletes all the records.
+    """
+    storage = MemoryStorage()
+    storage.write("testing\n")
+    storage.clear()
+    self.assertFalse(storage.has_text)
+    self.assertEqual(storage.read(storage.offset), b"")
+
+  #endregion
@@ -0,0 +1,119 @@
+import unittest
+
+from logreporter.report.ratelimiter import RateLimiter
+
+class FakeResponse(object):
+  """
+  A minimal substitute of `requests.Response`.
+  """
+  def __init__(self, status_code=204, headers=None, body=None):
+    self.status_code = status_code
+    self.headers = headers or {}
+    self.body = body
+
+  def json(self):
+    if self.body is None:
+      raise ValueError("No JSON body.")
+    return self.body
+
+class FakeClock(object):
+  """
+  A clock that advances only when `sleep()` is called.
+  """
+  def __init__(self):
+    self.now = 0.0
+    self.slept = []
+
+  def __call__(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.slept.append(seconds)
+    self.now += seconds
+
+class TestRateLimiter(unittest.TestCase):
+  """
+  A test class that verifies the operation of `RateLimiter`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    self.clock = FakeClock()
+    self.limiter = RateLimiter(limit=5, period=2.0, clock=self.clock, sleep=self.clock.sleep)
+
+  #endregion
+
+  #region wait() test
+
+  def test_wait_burst(self):
+    """
+    Confirm that requests up to the capacity of the bucket are sent without waiting.
+    """
+    for i in range(5):
+      self.limiter.wait()
+    self.assertEqual(self.clock.slept, [])
+    self.assertEqual(self.limiter.remaining, 0)
+
+  def test_wait_paced(self):
+    """
+    Confirm that the request after the bucket is empty waits for one token to be refilled.
+    """
+    for i in range(6):
+      self.limiter.wait()
+    self.assertAlmostEqual(sum(self.clock.slept), 0.4)
+
+  def test_take(self):
+    """
+    Confirm that `RateLimiter#take()` takes the tokens without waiting and fails when the bucket is empty.
+    """
+    self.assertEqual([self.limiter.take() for i in range(6)], [True] * 5 + [False])
+    self.assertEqual(self.clock.slept, [])
+    self.clock.now += 0.4
+    self.assertTrue(self.limiter.take())
+
+  #endregion
+
+  #region update() test
+
+  def test_update_remaining(self):
+    """
+    Confirm that the bucket follows the following headers.
+    * X-RateLimit-Remaining: 0
+    * X-RateLimit-Reset-After: 1.5
+    """
+    self.limiter.wait()
+    limited = self.limiter.update(FakeResponse(headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "1.5"}))
+    self.assertFalse(limited)
+    self.assertAlmostEqual(self.limiter.delay, 1.5)
+    self.limiter.wait()
+    self.assertAlmostEqual(self.clock.now, 1.5)
+
+  def test_update_429_retry_after(self):
+    """
+    Confirm that the response of HTTP 429 is reported and the next request waits for the time of the Retry-After header.
+    """
+    self.limiter.wait()
+    self.assertTrue(self.limiter.update(FakeResponse(status_code=429, headers={"Retry-After": "3"})))
+    self.assertEqual(self.limiter.state["delay"], 3.0)
+    self.limiter.wait()
+    self.assertAlmostEqual(self.clock.now, 3.0)
+
+  def test_update_429_body(self):
+    """
+    Confirm that the wait time is read from the JSON body when the response of HTTP 429 has no Retry-After header.
+    """
+    self.assertTrue(self.limiter.update(FakeResponse(status_code=429, body={"retry_after": 0.5})))
+    self.assertAlmostEqual(self.limiter.delay, 0.5)
+
+  def test_update_limit(self):
+    """
+    Confirm that the capacity of the bucket follows the X-RateLimit-Limit header.
+    """
+    self.limiter.update(FakeResponse(headers={"X-RateLimit-Limit": "10"}))
+    self.assertEqual(self.limiter.state["limit"], 10)
+
+  #endregion
@@ -0,0 +1,88 @@
+import logging
+import unittest
+
+from logreporter.recordsampler import RecordSampler, SamplingRule
+
+class FakeClock(object):
+  """
+  A clock that advances only when `advance()` is called.
+  """
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+  def advance(self, seconds):
+    self.now += seconds
+
+def make_record(name, levelno=logging.WARNING):
+  """
+  Create a log record of the logger.
+  """
+  return logging.makeLogRecord({"name": name, "levelno": levelno, "levelname": logging.getLevelName(levelno), "msg": "test"})
+
+class TestRecordSampler(unittest.TestCase):
+  """
+  A test class that verifies the operation of `RecordSampler`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    self.clock = FakeClock()
+
+  #endregion
+
+  #region allow() test
+
+  def test_limit(self):
+    """
+    Confirm that the records over the limit are counted for each logger, and the bucket is refilled after the period.
+    * limit: 2 records per 10 seconds
+    """
+    sampler = RecordSampler([SamplingRule(logger="chatty", limit=2, period=10.0)], clock=self.clock)
+    self.assertEqual([sampler.allow(make_record("chatty.sub")) for _ in range(5)], [True, True, False, False, False])
+    self.assertTrue(sampler.allow(make_record("chatty")))
+    self.assertTrue(sampler.allow(make_record("quiet")))
+    self.clock.advance(5.0)
+    self.assertTrue(sampler.allow(make_record("chatty.sub")))
+    self.assertFalse(sampler.allow(make_record("chatty.sub")))
+    self.assertEqual(sampler.sampled_records, 4)
+    self.assertEqual([c[0] for c in sampler.pop_counts()], [4])
+    self.assertEqual(sampler.pop_counts(), [])
+
+  def test_level(self):
+    """
+    Confirm that the rule of a level does not limit the records of the other levels.
+    * level: WARNING
+    * limit: 1 record
+    """
+    sampler = RecordSampler([SamplingRule(level=logging.WARNING, limit=1)], clock=self.clock)
+    self.assertTrue(sampler.allow(make_record("test")))
+    self.assertFalse(sampler.allow(make_record("test")))
+    self.assertTrue(sampler.allow(make_record("test", logging.ERROR)))
+    self.assertEqual(sampler.pop_counts()[0][3:], ("test", logging.WARNING, "WARNING"))
+
+  def test_sample(self):
+    """
+    Confirm that the records are written with the probability of the rule.
+    * sample: 0.5
+    """
+    values = iter([0.1, 0.7, 0.4, 0.9])
+    sampler = RecordSampler([SamplingRule(sample=0.5)], random=lambda: next(values))
+    self.assertEqual([sampler.allow(make_record("test")) for _ in range(4)], [True, False, True, False])
+
+  def test_rule_valueerror(self):
+    """
+    Confirm that ValueError occurs when the limit or the probability is out of range.
+    """
+    with self.assertRaises(ValueError):
+      SamplingRule(limit=0)
+    with self.assertRaises(ValueError):
+      SamplingRule(sample=1.5)
+
+  #endregion
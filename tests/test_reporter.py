@@ -1,13 +1,29 @@
 import logging
 from logreporter.reporterloghandler import ReporterLogHandler
 from pathlib import Path
+import threading
 import unittest
 
 from logreporter.reporter import Reporter
+from logreporter.report.abstractreporter import AbstractReporter
 
 class FormatterSubclass(logging.Formatter):
   pass
 
+class RecordingReporter(AbstractReporter):
+  """
+  A reporter that only keeps the reported text.
+  """
+  def __init__(self):
+    self.texts = []
+    self.reported = threading.Event()
+
+  def request_report(self, log_handler, message=""):
+    text = log_handler.get_text()
+    if text != "":
+      self.texts.append(text)
+      self.reported.set()
+
 class TestReporter(unittest.TestCase):
   """
   A test class that verifies the operation of `Reporter`.
@@ -23,6 +39,8 @@ class TestReporter(unittest.TestCase):
     logger.handlers.clear()
     f = ReporterLogHandler.get_defaultfilename()
     if f.exists(): f.unlink()
+    for f in list(f.parent.glob("reporter.sub.log*")) + list(f.parent.glob("reporter.log.priority*")):
+      f.unlink()
     Reporter.reset()
 
   #endregion
@@ -37,6 +55,15 @@ class TestReporter(unittest.TestCase):
     reporter2 = Reporter()
     self.assertEqual(reporter, reporter2)
 
+  def test_constructor_named(self):
+    """
+    Confirm that `Reporter` returns the same instance for the same name, and a different instance for another name.
+    """
+    self.assertIs(Reporter("billing"), Reporter("billing"))
+    self.assertIsNot(Reporter("billing"), Reporter())
+    self.assertIsNot(Reporter("billing"), Reporter("search"))
+    self.assertEqual(Reporter("billing").name, "billing")
+
   #endregion
 
   #region setup test
@@ -92,4 +119,146 @@ class TestReporter(unittest.TestCase):
     logger.warn("test message")
     self.assertEqual(reporter._handler.get_text().strip(), "testlogger test message")
 
+  def test_setup_async_mode(self):
+    """
+    If you set async_mode in `Reporter#setup()`, confirm that the log is written by the writer thread and can be acquired.
+    """
+    reporter = Reporter()
+    logger = logging.getLogger("testlogger")
+    reporter.setup(logger, None, async_mode=True)
+    logger.warn("test message")
+    self.assertTrue(reporter.log_remaining)
+    self.assertEqual(reporter._handler.get_text().strip(), "test message")
+    self.assertEqual(reporter.dropped_records, 0)
+    reporter._handler.close()
+
+  def test_setup_twice(self):
+    """
+    When `Reporter#setup()` is called twice, confirm that the handler of the first call is removed from its logger.
+    """
+    logger = logging.getLogger("testlogger")
+    logger2 = logging.getLogger("testlogger2")
+    self.addCleanup(logger2.handlers.clear)
+    reporter = Reporter()
+    reporter.setup(logger, None)
+    handler = reporter._handler
+    reporter.setup(logger2, None)
+    self.assertNotIn(handler, logger.handlers)
+    self.assertEqual(logger2.handlers, [reporter._handler])
+    reporter.close()
+
+  def test_setup_named(self):
+    """
+    Confirm that the named instances keep the log in their own files and upload it separately.
+    """
+    logger = logging.getLogger("testlogger")
+    logger2 = logging.getLogger("testlogger2")
+    self.addCleanup(logger2.handlers.clear)
+    reporter = Reporter()
+    reporter2 = Reporter("sub")
+    rr = RecordingReporter()
+    rr2 = RecordingReporter()
+    reporter.setup(logger, rr)
+    reporter2.setup(logger2, rr2)
+    self.addCleanup(reporter2.teardown)
+    self.assertEqual(reporter2._handler._filename.name, "reporter.sub.log")
+    logger.warn("test message")
+    logger2.warn("sub message")
+    reporter2.upload_report()
+    self.assertEqual(rr2.texts, ["sub message\n"])
+    self.assertEqual(rr.texts, [])
+    self.assertTrue(reporter.log_remaining)
+    reporter.close()
+
+  def test_teardown(self):
+    """
+    Confirm that `Reporter#teardown()` removes the handler and the next call with the same name returns a new instance.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter("sub")
+    reporter.setup(logger, None)
+    reporter.teardown()
+    self.assertEqual(logger.handlers, [])
+    self.assertIsNot(Reporter("sub"), reporter)
+
+  #endregion
+
+  #region autoflush test
+
+  def test_autoflush_max_bytes(self):
+    """
+    When the log exceeds `max_bytes` of `Reporter#start_autoflush()`, confirm that the log is uploaded on the background thread.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    rr = RecordingReporter()
+    reporter.setup(logger, rr)
+    reporter.start_autoflush(max_bytes=20, interval=3600, poll=0.01)
+    logger.warn("test")
+    logger.warn("test message test message")
+    self.assertTrue(rr.reported.wait(5))
+    self.assertEqual(rr.texts, ["test\ntest message test message\n"])
+    reporter.close()
+
+  def test_autoflush_interval(self):
+    """
+    When `interval` seconds of `Reporter#start_autoflush()` have passed since the log was written, confirm that the log is uploaded on the background thread.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    rr = RecordingReporter()
+    reporter.setup(logger, rr)
+    reporter.start_autoflush(max_bytes=1024, interval=0.05, poll=0.01)
+    logger.warn("test message")
+    self.assertTrue(rr.reported.wait(5))
+    self.assertEqual(rr.texts, ["test message\n"])
+    self.assertIsNone(reporter._handler.pending_since)
+    reporter.close()
+
+  def test_autoflush_priority_interval(self):
+    """
+    When `priority_interval` seconds of `Reporter#start_autoflush()` have passed since an error record was written,
+    confirm that the log is uploaded before `interval` seconds.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    rr = RecordingReporter()
+    reporter.setup(logger, rr, priority_level=logging.ERROR)
+    reporter.start_autoflush(max_bytes=1024, interval=3600, poll=0.01, priority_interval=0.05)
+    logger.warn("test message")
+    logger.error("error message")
+    self.assertTrue(rr.reported.wait(5))
+    self.assertEqual(rr.texts, ["error message\ntest message\n"])
+    reporter.close()
+
+  def test_autoflush_request(self):
+    """
+    Confirm that `Reporter#request_upload()` uploads the log on the background thread regardless of the amount of the log.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    rr = RecordingReporter()
+    reporter.setup(logger, rr)
+    reporter.start_autoflush(max_bytes=1024, interval=3600, poll=3600)
+    logger.warn("test message")
+    reporter.request_upload()
+    reporter.request_upload()
+    self.assertTrue(rr.reported.wait(5))
+    self.assertEqual(rr.texts, ["test message\n"])
+    reporter.close()
+
+  def test_autoflush_close(self):
+    """
+    Confirm that the remaining log is uploaded when `Reporter#close()` is called.
+    """
+    logger = logging.getLogger("testlogger")
+    reporter = Reporter()
+    rr = RecordingReporter()
+    reporter.setup(logger, rr)
+    reporter.start_autoflush(max_bytes=1024, interval=3600, poll=3600)
+    logger.warn("test message")
+    reporter.close()
+    self.assertEqual(rr.texts, ["test message\n"])
+    self.assertIsNone(reporter._autoflusher)
+
   #endregion
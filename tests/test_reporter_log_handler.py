@@ -1,9 +1,15 @@
+from decimal import Decimal
 from logging import Logger
 from pathlib import Path
+import sys
+import time
 import unittest
+import unittest.mock
 import logging
 
+from logreporter.recordsampler import RecordSampler, SamplingRule
 from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.storage import MemoryStorage
 
 class TestReporterLogHandler(unittest.TestCase):
   """
@@ -20,6 +26,9 @@ class TestReporterLogHandler(unittest.TestCase):
     logger.handlers.clear()
     f = ReporterLogHandler.get_defaultfilename()
     if f.exists(): f.unlink()
+    for suffix in (".offset", ".raw", ".raw.offset", ".priority", ".priority.offset"):
+      o = f.with_name(f.name + suffix)
+      if o.exists(): o.unlink()
 
   #endregion
 
@@ -113,7 +122,7 @@ class TestReporterLogHandler(unittest.TestCase):
     logger.warn("testing" * 30)
     logger.warn("message" * 30)
     self.assertEqual(rlh.get_text(max_length=210), "testing" * 30)
-    self.assertEqual(rlh.get_text(), "message" * 30)
+    self.assertEqual(rlh.get_text(), "message" * 30 + "\n")
 
   def test_get_text_max_length_2line(self):
     """
@@ -130,7 +139,7 @@ class TestReporterLogHandler(unittest.TestCase):
     logger.warn("message" * 30)
     logger.warn("abcdefg" * 30)
     self.assertEqual(rlh.get_text(max_length=351), "{}\n{}".format("testing" * 20, "message" * 30))
-    self.assertEqual(rlh.get_text(), "abcdefg" * 30)
+    self.assertEqual(rlh.get_text(), "abcdefg" * 30 + "\n")
 
   def test_get_text_max_length_2line_little_after(self):
     """
@@ -147,7 +156,7 @@ class TestReporterLogHandler(unittest.TestCase):
     logger.warn("message" * 30)
     logger.warn("abcdefg" * 30)
     self.assertEqual(rlh.get_text(max_length=360), "{}\n{}".format("testing" * 20, "message" * 30))
-    self.assertEqual(rlh.get_text(), "abcdefg" * 30)
+    self.assertEqual(rlh.get_text(), "abcdefg" * 30 + "\n")
 
   def test_get_text_max_length_large_value(self):
     """
@@ -176,7 +185,273 @@ class TestReporterLogHandler(unittest.TestCase):
     logger.addHandler(rlh)
     logger.warn("1" * 20 + "2" * 10)
     self.assertEqual(rlh.get_text(max_length=20), "1" * 20)
-    self.assertEqual(rlh.get_text(), "2" * 10)
+    self.assertEqual(rlh.get_text(), "2" * 10 + "\n")
+
+  #endregion
+
+  #region get_text(max_length) offset test
+
+  def test_get_text_max_length_keep_file(self):
+    """
+    When `ReporterLogHandler#get_text()` is called with max_length, confirm that the log file is not rewritten and only the committed position advances.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    size = rlh._filename.stat().st_size
+    self.assertEqual(rlh.get_text(max_length=7), "testing")
+    self.assertEqual(rlh._filename.stat().st_size, size)
+    self.assertEqual(rlh.storage._offsetfile.read_text(), "9")
+    self.assertTrue(rlh.has_text)
+
+  def test_get_text_max_length_resume(self):
+    """
+    Confirm that another `ReporterLogHandler` for the same file resumes from the committed position.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    rlh.get_text(max_length=7)
+    rlh.close()
+    self.assertEqual(ReporterLogHandler().get_text(max_length=7), "message")
+
+  def test_get_text_max_length_drained(self):
+    """
+    Confirm that the log file is emptied and the committed position is reset when all the log has been extracted.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    rlh.get_text(max_length=7)
+    rlh.get_text(max_length=7)
+    self.assertEqual(rlh._filename.stat().st_size, 0)
+    self.assertEqual(rlh.storage._offsetfile.read_text(), "0 1")
+    logger.warn("abcdefg")
+    self.assertEqual(rlh.get_text(), "abcdefg\n")
+
+  def test_get_text_max_length_atomic(self):
+    """
+    Confirm that the committed position is written through a temporary file that is not left behind.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    rlh.get_text(max_length=7)
+    self.assertEqual(rlh.storage._offsetfile.read_text(), "9")
+    self.assertFalse(rlh.storage._offsetfile.with_name(rlh.storage._offsetfile.name + ".tmp").exists())
+
+  def test_commit_chunk_stale(self):
+    """
+    Confirm that a chunk read before the log file was emptied is not committed, and it has a different key from the new chunk at the same position.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    old = rlh.read_chunks(max_length=7)[0]
+    self.assertEqual(old.key, rlh.read_chunks(max_length=7)[0].key)
+    rlh.get_text()
+    logger.warn("testing")
+    new = rlh.read_chunks(max_length=7)[0]
+    self.assertEqual((new.start, new.end), (old.start, old.end))
+    self.assertNotEqual(new.key, old.key)
+    self.assertFalse(rlh.commit_chunk(old))
+    self.assertTrue(rlh.has_text)
+    self.assertTrue(rlh.commit_chunk(new))
+    self.assertFalse(rlh.has_text)
+
+  def test_get_text_max_length_multibyte(self):
+    """
+    Confirm that multi-byte characters are counted as characters and the committed position is counted in bytes.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("あいう")
+    logger.warn("えお")
+    self.assertEqual(rlh.get_text(max_length=3), "あいう")
+    self.assertEqual(rlh.get_text(max_length=3), "えお")
+    self.assertFalse(rlh.has_text)
+
+  #endregion
+
+  #region get_texts() test
+
+  def test_get_texts(self):
+    """
+    When `ReporterLogHandler#get_texts()` is called under the following conditions, confirm that the log is divided into the specified number of chunks.
+    * max_length: 1 line of the log
+    * count: 2
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    logger.warn("abcdefg")
+    self.assertEqual(rlh.get_texts(max_length=7, count=2), ["testing", "message"])
+    self.assertEqual(rlh.get_text(), "abcdefg\n")
+
+  def test_get_texts_total_length(self):
+    """
+    When `ReporterLogHandler#get_texts()` is called under the following conditions, confirm that the line that does not fit in total_length is left for the next call.
+    * max_length: 2 lines of the log
+    * total_length: 2.5 lines of the log
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    logger.warn("abcdefg")
+    self.assertEqual(rlh.get_texts(max_length=15, count=10, total_length=20), ["testing\nmessage"])
+    self.assertEqual(rlh.get_texts(max_length=15, count=10, total_length=20), ["abcdefg"])
+    self.assertEqual(rlh.get_texts(max_length=15, count=10, total_length=20), [])
+
+  def test_get_texts_report_cancelled(self):
+    """
+    When `ReporterLogHandler#get_texts()` is called under the following conditions, confirm that none of the chunks are committed.
+    * Return value of the function specified by the `report` parameter: False
+    """
+    def test(texts):
+      self.assertEqual(texts, ["testing", "message"])
+      return False
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    rlh.get_texts(max_length=7, count=2, report=test)
+    self.assertEqual(rlh.get_text(), "testing\nmessage\n")
+
+  #endregion
+
+  #region record test
+
+  def test_get_text_multiline_record(self):
+    """
+    When `ReporterLogHandler#get_text()` is called under the following conditions, confirm that the record is not divided.
+    * The log has 2 records of 2 lines.
+    * max_length: 1.5 records of the log
+    """
+    rlh = ReporterLogHandler()
+    rlh.append_log("ab\ncd")
+    rlh.append_log("ef\ngh")
+    self.assertEqual(rlh.get_text(max_length=8), "ab\ncd")
+    self.assertEqual(rlh.get_text(max_length=8), "ef\ngh")
+
+  def test_get_text_code_fence(self):
+    """
+    When `ReporterLogHandler#get_text()` is called under the following conditions, confirm that the code fence is closed at the end of each chunk and opened again in the next chunk.
+    * The record has a code fence that does not fit in max_length.
+    """
+    rlh = ReporterLogHandler()
+    rlh.append_log("**exc**\n```python\nline1\nline2\nline3\n```")
+    rlh.append_log("last")
+    texts = []
+    while rlh.has_text:
+      texts.append(rlh.get_text(max_length=26))
+    self.assertEqual(texts, ["**exc**", "```python\nline1\nline2\n```", "```python\nline3\n```\nlast"])
+
+  def test_get_text_code_fence_cut_line(self):
+    """
+    When `ReporterLogHandler#get_text()` is called under the following conditions, confirm that the line is cut inside the code fence.
+    * A line in the code fence does not fit in max_length.
+    """
+    rlh = ReporterLogHandler()
+    rlh.append_log("```\n" + "a" * 20 + "\n```")
+    self.assertEqual(rlh.get_text(max_length=20), "```\n" + "a" * 12 + "\n```")
+    self.assertEqual(rlh.get_text(max_length=20), "```\n" + "a" * 8 + "\n```")
+
+  def test_get_text_record_end_left(self):
+    """
+    When `ReporterLogHandler#get_text()` is called under the following conditions, confirm that the record end is taken with the record,
+    and no empty chunk is left.
+    * The record ends with a line break.
+    * max_length: the length of the record without the line break
+    """
+    rlh = ReporterLogHandler()
+    rlh.append_log("abcd\n")
+    self.assertEqual(rlh.get_text(max_length=4), "abcd")
+    self.assertFalse(rlh.has_text)
+
+  def test_get_text_code_fence_end_of_log(self):
+    """
+    When `ReporterLogHandler#get_text()` is called under the following conditions, confirm that no empty chunk is read at the end of the log.
+    * The record is an empty code fence.
+    * max_length: the length of the fence
+    """
+    rlh = ReporterLogHandler()
+    rlh.append_log("```\n```")
+    texts = []
+    while rlh.has_text and len(texts) < 10:
+      texts.append(rlh.get_text(max_length=3))
+    self.assertEqual(texts, ["```", "", "```"])
+
+  #endregion
+
+  #region iter_chunks() test
+
+  def test_iter_chunks(self):
+    """
+    When `ReporterLogHandler#iter_chunks()` is called, confirm that the chunks are yielded in order and each of them can be committed.
+    * Only the first chunk is committed.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    logger.warn("abcdefg")
+    chunks = []
+    for chunk in rlh.iter_chunks(max_length=15):
+      chunks.append(chunk)
+      if len(chunks) == 1:
+        self.assertTrue(rlh.commit_chunk(chunk))
+    self.assertEqual([(c.text, c.start, c.end) for c in chunks], [("testing\nmessage", 0, 18), ("abcdefg", 18, 27)])
+    self.assertEqual(rlh.get_text(), "abcdefg\n")
+
+  def test_iter_chunks_bounded_read(self):
+    """
+    When `ReporterLogHandler#iter_chunks()` is called, confirm that the log is not read at once.
+    * Size of the log: 1000 lines
+    """
+    rlh = ReporterLogHandler()
+    for i in range(1000):
+      rlh.append_log("message{:04d}".format(i))
+    sizes = []
+    read = rlh.storage.read
+    def record_read(start, size=-1):
+      sizes.append(size)
+      return read(start, size)
+    rlh.storage.read = record_read
+    texts = [c.text for c in rlh.iter_chunks(max_length=100)]
+    self.assertEqual("\n".join(texts), "\n".join("message{:04d}".format(i) for i in range(1000)))
+    self.assertTrue(all(0 < s <= 404 for s in sizes))
+
+  def test_iter_chunks_drain(self):
+    """
+    When all the chunks yielded by `ReporterLogHandler#iter_chunks()` are committed, confirm that the iteration stops
+    and the log written during the iteration is left for the next report.
+    """
+    rlh = ReporterLogHandler()
+    rlh.append_log("testing")
+    rlh.append_log("message")
+    texts = []
+    for chunk in rlh.iter_chunks(max_length=7):
+      texts.append(chunk.text)
+      rlh.commit_chunk(chunk)
+      rlh.append_log("abcdefghijklmnopqrstuvwxyz")
+    self.assertEqual(texts, ["testing", "message"])
+    self.assertEqual(rlh.get_text(), "abcdefghijklmnopqrstuvwxyz\nabcdefghijklmnopqrstuvwxyz\n")
 
   #endregion
 
@@ -404,6 +679,534 @@ class TestReporterLogHandler(unittest.TestCase):
     rlh = ReporterLogHandler()
     self.assertFalse(rlh.has_text)
 
+  def test_pending_records(self):
+    """
+    Confirm that `ReporterLogHandler#pending_records` and `pending_bytes` follow the written and committed records.
+    * A record in the middle of being reported is counted as pending.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message\nabcdefg")
+    self.assertEqual((rlh.pending_records, rlh.pending_bytes), (2, 26))
+    rlh.get_text(max_length=7)
+    self.assertEqual((rlh.pending_records, rlh.pending_bytes), (1, 17))
+    rlh.get_text(max_length=7)
+    self.assertEqual((rlh.pending_records, rlh.pending_bytes), (1, 9))
+    rlh.get_text()
+    self.assertEqual((rlh.pending_records, rlh.pending_bytes), (0, 0))
+    rlh.close()
+
+  def test_pending_records_no_stat(self):
+    """
+    Confirm that `ReporterLogHandler#has_text` does not check the log file while the counted size is used.
+    """
+    rlh = ReporterLogHandler()
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    self.assertTrue(rlh.has_text)
+    with unittest.mock.patch.object(Path, "stat", side_effect=AssertionError("stat() was called.")):
+      for i in range(100):
+        self.assertTrue(rlh.has_text)
+    rlh.close()
+
+  def test_pending_records_external_change(self):
+    """
+    Confirm that the records appended to the log file by another program are counted after `STAT_INTERVAL`.
+    """
+    rlh = ReporterLogHandler()
+    rlh.storage.STAT_INTERVAL = 0.1
+    rlh.append_log("testing")
+    self.assertEqual(rlh.pending_records, 1)
+    with open(rlh._filename, mode="a", encoding="utf-8") as f:
+      f.write("message\x1e\nabcdefg\x1e\n")
+    time.sleep(0.2)
+    self.assertEqual(rlh.pending_records, 3)
+    self.assertEqual(rlh.get_text(), "testing\nmessage\nabcdefg\n")
+    rlh.close()
+
+  #endregion
+
+  #region async_mode test
+
+  def wait_taken(self, rlh):
+    """
+    Wait until the writer thread takes all the records out of the queue.
+    """
+    for _ in range(500):
+      if rlh._queue.empty():
+        break
+      time.sleep(0.01)
+
+  def test_async_mode(self):
+    """
+    Confirm that the log output in asynchronous mode can be acquired by `ReporterLogHandler#get_text()`.
+    """
+    rlh = ReporterLogHandler(async_mode=True)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("test %s", "message")
+    rlh.append_log("test")
+    self.assertTrue(rlh.has_text)
+    self.assertEqual(rlh.get_text(), "test message\ntest\n")
+    rlh.close()
+
+  def test_async_mode_bad_arguments(self):
+    """
+    Confirm that a record whose arguments do not match the message is passed to `handleError()` in asynchronous mode,
+    without raising the error to the caller.
+    """
+    rlh = ReporterLogHandler(async_mode=True)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    with unittest.mock.patch.object(rlh, "handleError") as handle_error:
+      logger.warn("%d items", "notanumber")
+    handle_error.assert_called_once()
+    logger.warn("test message")
+    self.assertEqual(rlh.get_text(), "test message\n")
+    rlh.close()
+
+  def test_async_mode_record_unchanged(self):
+    """
+    Confirm that the record passed to the other handlers is not changed in asynchronous mode.
+    """
+    rlh = ReporterLogHandler(async_mode=True)
+    try:
+      raise ValueError("test")
+    except ValueError:
+      record = logging.makeLogRecord({"msg": "test %s", "args": ("message",), "exc_info": sys.exc_info()})
+    rlh.handle(record)
+    self.assertEqual(record.msg, "test %s")
+    self.assertEqual(record.args, ("message",))
+    self.assertIsNotNone(record.exc_info)
+    text = rlh.get_text()
+    self.assertTrue(text.startswith("test message\nTraceback"))
+    self.assertIn("ValueError: test", text)
+    rlh.close()
+
+  def test_async_mode_after_close(self):
+    """
+    Confirm that a record emitted after `ReporterLogHandler#close()` in asynchronous mode is written without an error.
+    """
+    rlh = ReporterLogHandler(async_mode=True)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("test message")
+    rlh.close()
+    with unittest.mock.patch.object(rlh, "handleError") as handle_error:
+      logger.warn("after close")
+      rlh.append_log("after close")
+    handle_error.assert_not_called()
+    self.assertEqual(rlh._filename.read_text(encoding="utf-8"), "test message\x1e\nafter close\x1e\nafter close\x1e\n")
+
+  def test_async_mode_close(self):
+    """
+    Confirm that the records in the queue are written when `ReporterLogHandler#close()` is called in asynchronous mode.
+    """
+    rlh = ReporterLogHandler(async_mode=True)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    for i in range(300):
+      logger.warn("test message")
+    rlh.close()
+    self.assertEqual(rlh._filename.read_text(encoding="utf-8"), "test message\x1e\n" * 300)
+
+  def test_async_mode_drop_newest(self):
+    """
+    Confirm that the record being added is discarded when the queue is full under the following conditions.
+    * overflow = OVERFLOW_DROP_NEWEST
+    """
+    rlh = ReporterLogHandler(async_mode=True, queue_size=1, overflow=ReporterLogHandler.OVERFLOW_DROP_NEWEST)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    with rlh.storage.lock:
+      logger.warn("1")
+      self.wait_taken(rlh)
+      logger.warn("2")
+      logger.warn("3")
+    self.assertEqual(rlh.get_text(), "1\n2\n")
+    self.assertEqual(rlh.dropped_records, 1)
+    rlh.close()
+
+  def test_async_mode_drop_oldest(self):
+    """
+    Confirm that the oldest record in the queue is discarded when the queue is full under the following conditions.
+    * overflow = OVERFLOW_DROP_OLDEST
+    """
+    rlh = ReporterLogHandler(async_mode=True, queue_size=1, overflow=ReporterLogHandler.OVERFLOW_DROP_OLDEST)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    with rlh.storage.lock:
+      logger.warn("1")
+      self.wait_taken(rlh)
+      logger.warn("2")
+      logger.warn("3")
+    self.assertEqual(rlh.get_text(), "1\n3\n")
+    self.assertEqual(rlh.dropped_records, 1)
+    rlh.close()
+
+  #endregion
+
+  #region dedupe_size test
+
+  def test_dedupe(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the repeated records are written only once with a summary.
+    * dedupe_size: 10
+    * The same message template is logged 5 times with different arguments.
+    """
+    rlh = ReporterLogHandler(dedupe_size=10)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    for i in range(5):
+      logger.warn("test message %d", i)
+    logger.error("test message %d", 5)
+    text = rlh.get_text()
+    self.assertTrue(text.startswith("test message 0\ntest message 5\n\"test message %d\" was repeated 4 more times from "))
+    logger.warn("test message %d", 6)
+    self.assertEqual(rlh.get_text(), "test message 6\n")
+
+  def test_dedupe_probed(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that checking the log between the repeated records
+    does not end the counting.
+    * dedupe_size: 10
+    * `has_text`, `pending_bytes` and `pending_records` are checked after each of 5 bursts of 100 records.
+    """
+    rlh = ReporterLogHandler(dedupe_size=10)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    for i in range(5):
+      for j in range(100):
+        logger.warn("test message %d", j)
+      self.assertTrue(rlh.has_text)
+      self.assertEqual(rlh.pending_bytes, 16)
+      self.assertEqual(rlh.pending_records, 1)
+    lines = rlh.get_text().splitlines()
+    self.assertEqual(len(lines), 2)
+    self.assertTrue(lines[1].startswith("\"test message %d\" was repeated 499 more times from "))
+
+  def test_dedupe_not_formatted(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the counted records are not formatted.
+    * dedupe_size: 10
+    """
+    class CountingFormatter(logging.Formatter):
+      count = 0
+      def format(self, record):
+        CountingFormatter.count += 1
+        return super().format(record)
+    rlh = ReporterLogHandler(dedupe_size=10)
+    rlh.setFormatter(CountingFormatter())
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    for i in range(100):
+      logger.warn("test message")
+    self.assertEqual(CountingFormatter.count, 1)
+    rlh.get_text()
+    self.assertEqual(CountingFormatter.count, 2)
+
+  def test_dedupe_evicted(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the summary is written when the record is evicted from the table.
+    * dedupe_size: 1
+    """
+    rlh = ReporterLogHandler(dedupe_size=1)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("testing")
+    logger.warn("message")
+    logger.warn("testing")
+    lines = rlh.get_text().splitlines()
+    self.assertEqual(len(lines), 4)
+    self.assertEqual(lines[0], "testing")
+    self.assertTrue(lines[1].startswith("\"testing\" was repeated 1 more times"))
+    self.assertEqual(lines[2:], ["message", "testing"])
+
+  #endregion
+
+  #region flush policy test
+
+  def test_flush_records(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the records are written to the file every 3 records.
+    * flush_records: 3
+    """
+    rlh = ReporterLogHandler(flush_records=3)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    self.assertEqual(rlh._filename.stat().st_size, 0)
+    logger.warn("abcdefg")
+    self.assertEqual(rlh._filename.stat().st_size, 27)
+    rlh.close()
+
+  def test_flush_level(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that an error record is written at once with the buffered records.
+    * flush_records: 100
+    """
+    rlh = ReporterLogHandler(flush_records=100)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    rlh.append_log("message")
+    self.assertEqual(rlh._filename.stat().st_size, 0)
+    logger.error("abcdefg")
+    self.assertEqual(rlh._filename.read_text(encoding="utf-8"), "testing\x1e\nmessage\x1e\nabcdefg\x1e\n")
+    rlh.close()
+
+  def test_flush_interval(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the buffered record is written after the interval without another record.
+    * flush_records: 100
+    * flush_interval: 0.1 seconds
+    """
+    rlh = ReporterLogHandler(flush_records=100, flush_interval=0.1)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    self.assertEqual(rlh._filename.stat().st_size, 0)
+    time.sleep(0.5)
+    self.assertEqual(rlh._filename.stat().st_size, 9)
+    rlh.close()
+
+  def test_flush_buffered_read(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the buffered records are read.
+    * flush_records: 100
+    """
+    rlh = ReporterLogHandler(flush_records=100)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    self.assertTrue(rlh.has_text)
+    logger.warn("message")
+    self.assertEqual(rlh.get_text(), "testing\nmessage\n")
+    rlh.close()
+
+  #endregion
+
+  #region sampler test
+
+  def test_sampler(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the records over the limit are not formatted,
+    and their number is written before the log is read.
+    * sampler: 2 records of "testlogger"
+    """
+    class CountingFormatter(logging.Formatter):
+      count = 0
+      def format(self, record):
+        CountingFormatter.count += 1
+        return super().format(record)
+    sampler = RecordSampler([SamplingRule(logger="testlogger", limit=2, period=3600)])
+    rlh = ReporterLogHandler(sampler=sampler)
+    rlh.setFormatter(CountingFormatter())
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    for i in range(5):
+      logger.warn("message %d", i)
+    self.assertEqual(CountingFormatter.count, 2)
+    lines = rlh.get_text().splitlines()
+    self.assertEqual(lines[:2], ["message 0", "message 1"])
+    self.assertTrue(lines[2].startswith("3 WARNING records of \"testlogger\" were not written by the sampling"))
+    self.assertEqual(len(lines), 3)
+    rlh.close()
+
+  #endregion
+
+  #region priority_level test
+
+  def test_priority_first(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the error record is read before the earlier records.
+    * priority_level: ERROR
+    """
+    rlh = ReporterLogHandler(priority_level=logging.ERROR)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.warn("message")
+    logger.error("abcdefg")
+    self.assertIsNotNone(rlh.priority_pending_since)
+    self.assertEqual(rlh.pending_records, 3)
+    self.assertEqual(rlh.get_text(max_length=20), "abcdefg")
+    self.assertIsNone(rlh.priority_pending_since)
+    self.assertEqual(rlh.get_text(max_length=20), "testing\nmessage")
+    self.assertFalse(rlh.has_text)
+    rlh.close()
+
+  def test_priority_share(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that a chunk of the other records is read after 2 chunks of the error records.
+    * priority_level: ERROR
+    * priority_share: 2
+    """
+    rlh = ReporterLogHandler(priority_level=logging.ERROR, priority_share=2)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("warn1")
+    logger.warn("warn2")
+    logger.error("error1")
+    logger.error("error2")
+    logger.critical("error3")
+    texts = []
+    while rlh.has_text:
+      texts.append(rlh.get_text(max_length=6))
+    self.assertEqual(texts, ["error1", "error2", "warn1", "error3", "warn2"])
+    rlh.close()
+
+  def test_priority_share_get_texts(self):
+    """
+    When `ReporterLogHandler#get_texts()` is called under the following conditions, confirm that the share counts the chunks, not the reads.
+    * priority_level: ERROR
+    * priority_share: 2
+    * count: 10
+    """
+    rlh = ReporterLogHandler(priority_level=logging.ERROR, priority_share=2)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("warn1")
+    for i in range(3):
+      logger.error("error{}".format(i + 1))
+    texts = []
+    while rlh.has_text:
+      texts.append(rlh.get_texts(max_length=6, count=10))
+    self.assertEqual(texts, [["error1", "error2"], ["warn1"], ["error3"]])
+    rlh.close()
+
+  def test_priority_get_text_all(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the whole log starts with the error records,
+    and nothing is removed when the report fails.
+    * priority_level: ERROR
+    * storage: MemoryStorage
+    """
+    rlh = ReporterLogHandler(storage=MemoryStorage(), priority_level=logging.ERROR)
+    self.assertIsInstance(rlh.priority_storage, MemoryStorage)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.error("abcdefg")
+    self.assertEqual(rlh.get_text(report=lambda text: False), "abcdefg\ntesting\n")
+    self.assertTrue(rlh.has_text)
+    self.assertEqual(rlh.get_text(), "abcdefg\ntesting\n")
+    self.assertFalse(rlh.has_text)
+    rlh.close()
+
+  def test_priority_commit_chunk(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the chunks of the error records are committed to their own storage.
+    * priority_level: ERROR
+    """
+    rlh = ReporterLogHandler(priority_level=logging.ERROR)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("testing")
+    logger.error("testing")
+    chunks = rlh.read_chunks(max_length=20)
+    self.assertEqual([(c.text, c.lane) for c in chunks], [("testing", 1)])
+    self.assertTrue(rlh.commit_chunk(chunks[0]))
+    self.assertFalse(rlh.priority_storage.has_text)
+    chunk = rlh.read_chunks(max_length=20)[0]
+    self.assertEqual((chunk.text, chunk.lane), ("testing", 0))
+    self.assertNotEqual(chunk.key, chunks[0].key)
+    rlh.close()
+
+  #endregion
+
+  #region lazy_format test
+
+  def test_lazy_format(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the records are formatted when the log is read.
+    * lazy_format: True
+    """
+    class CountingFormatter(logging.Formatter):
+      count = 0
+      def format(self, record):
+        CountingFormatter.count += 1
+        return super().format(record)
+    rlh = ReporterLogHandler(lazy_format=True)
+    rlh.setFormatter(CountingFormatter("%(levelname)s:%(message)s"))
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    logger.warn("test message %d", 1)
+    rlh.append_log("test")
+    self.assertEqual(CountingFormatter.count, 0)
+    self.assertFalse(rlh._filename.exists())
+    self.assertEqual(rlh.get_text(), "WARNING:test message 1\ntest\n")
+    self.assertEqual(CountingFormatter.count, 1)
+    self.assertFalse(rlh._rawstorage.has_text)
+
+  def test_lazy_format_exception(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the traceback and the arguments that cannot be serialized are kept.
+    * lazy_format: True
+    * The record has an exception and an argument of a class.
+    """
+    rlh = ReporterLogHandler(lazy_format=True)
+    logger = logging.getLogger("testlogger")
+    logger.addHandler(rlh)
+    try:
+      raise ValueError("test error")
+    except ValueError:
+      logger.exception("test message %s", Path("test"))
+    text = rlh.get_text()
+    self.assertTrue(text.startswith("test message test\nTraceback (most recent call last):"))
+    self.assertIn("ValueError: test error", text)
+
+  def test_lazy_format_arguments(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the arguments other than JSON values
+    are formatted in the same way as without lazy format mode.
+    * lazy_format: True
+    * The arguments are Decimal for %d and %.1f, and a list for %r.
+    """
+    logger = logging.getLogger("testlogger")
+    texts = []
+    for lazy_format in (False, True):
+      rlh = ReporterLogHandler(storage=MemoryStorage(), lazy_format=lazy_format)
+      logger.addHandler(rlh)
+      logger.warn("count %d, price %.1f", Decimal(3), Decimal("2.5"))
+      logger.warn("items %r of %s", [1, 2], "test")
+      logger.removeHandler(rlh)
+      texts.append(rlh.get_text())
+    self.assertEqual(texts[1], "count 3, price 2.5\nitems [1, 2] of test\n")
+    self.assertEqual(texts[0], texts[1])
+
+  def test_lazy_format_resume(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the records serialized by the previous instance are formatted.
+    * lazy_format: True
+    """
+    rlh = ReporterLogHandler(lazy_format=True)
+    rlh.append_log("testing")
+    rlh.close()
+    rlh = ReporterLogHandler(lazy_format=True)
+    self.assertTrue(rlh.has_text)
+    self.assertEqual(rlh.get_text(), "testing\n")
+    rlh.close()
+
+  def test_lazy_format_torn(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, confirm that the torn record at the end of the raw storage is rendered as text.
+    * lazy_format: True
+    * The previous instance stopped while writing the last record.
+    """
+    f = ReporterLogHandler.get_defaultfilename()
+    raw = f.with_name(f.name + ".raw")
+    raw.write_bytes(b'{"text": "complete"}\x1e\n{"name": "x", "msg": "to')
+    rlh = ReporterLogHandler(lazy_format=True)
+    self.assertEqual(rlh.get_text(), 'complete\n{"name": "x", "msg": "to\n')
+    self.assertFalse(rlh.has_text)
+    rlh.close()
+
   #endregion
 
   #region Anomaly test.
@@ -422,6 +1225,14 @@ class TestReporterLogHandler(unittest.TestCase):
     with self.assertRaises(ValueError):
       rlh.get_text(max_length=0)
 
+  def test_overflow_valueerror(self):
+    """
+    When `ReporterLogHandler` is created under the following conditions, Confirm that ValueError occurs.
+    * overflow = unknown value
+    """
+    with self.assertRaises(ValueError):
+      ReporterLogHandler(async_mode=True, overflow="unknown")
+
   def test_handler_multiple_registration(self):
     """
     Confirm that `ReporterLogHandler#clear()` works normally with `ReporterLogHandler` registered in two loggers.
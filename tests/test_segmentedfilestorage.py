@@ -0,0 +1,245 @@
+import gzip
+from pathlib import Path
+import threading
+import unittest
+
+from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.storage import SegmentedFileStorage
+
+class TestSegmentedFileStorage(unittest.TestCase):
+  """
+  A test class that verifies the operation of `SegmentedFileStorage`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    self.filename = Path(__file__).parent / "out" / "segment.log"
+    self.filename.parent.mkdir(exist_ok=True)
+    self.tearDown()
+
+  def tearDown(self):
+    """
+    Executed after each test method call.
+    """
+    for f in self.filename.parent.glob(self.filename.name + ".*"):
+      f.unlink()
+
+  #endregion
+
+  #region rotation test
+
+  def test_rotate(self):
+    """
+    Confirm that a new segment is started when the active segment is full, and the log is read across the segments.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16)
+    storage.write("1234567\n")
+    storage.write("1234567\n")
+    storage.write("1234567\n")
+    self.assertEqual(len(storage.segments), 2)
+    self.assertEqual(storage.segments[1].name, "segment.log.0000000000000016")
+    self.assertEqual(storage.read(4, 16), b"567\n1234567\n1234")
+    storage.close()
+
+  def test_commit_remove_segments(self):
+    """
+    Confirm that the reported segments are removed and the positions continue after all the segments are removed.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=8)
+    storage.write("1234567\n")
+    storage.write("abcdefg\n")
+    storage.commit(10)
+    self.assertEqual(len(storage.segments), 1)
+    self.assertEqual(storage.read(storage.offset), b"cdefg\n")
+    storage.commit(16)
+    self.assertEqual(storage.segments, [])
+    storage.write("testing\n")
+    self.assertEqual(storage.segments[0].name, "segment.log.0000000000000016")
+    self.assertEqual(storage.pending_bytes, 8)
+    storage.close()
+
+  def test_reopen(self):
+    """
+    Confirm that the segments and the committed position are restored by a new instance.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=8)
+    storage.write("1234567\n")
+    storage.write("abcdefg\n")
+    storage.commit(4)
+    storage.close()
+    storage = SegmentedFileStorage(self.filename, segment_bytes=8)
+    self.assertEqual(storage.offset, 4)
+    self.assertEqual(storage.end, 16)
+    self.assertEqual(storage.read(storage.offset), b"567\nabcdefg\n")
+    storage.close()
+
+  #endregion
+
+  #region eviction test
+
+  def test_max_bytes(self):
+    """
+    Confirm that the oldest segment is removed and a marker line is written when the backlog exceeds max_bytes.
+    * The marker tells the number of records and bytes that have not been reported.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16, max_bytes=24)
+    storage.write("123456\x1e\n")
+    storage.write("123456\x1e\n")
+    storage.commit(8)
+    storage.write("abcdef\x1e\n")
+    storage.write("hijklm\x1e\n")
+    self.assertEqual(storage.dropped_records, 1)
+    self.assertEqual(storage.dropped_bytes, 8)
+    self.assertEqual(storage.read(storage.offset).decode("utf-8"),
+      "abcdef\x1e\nhijklm\x1e\n" + SegmentedFileStorage.DROPPED_MESSAGE.format(records=1, bytes=8) + "\x1e\n")
+    storage.close()
+
+  def test_max_records(self):
+    """
+    Confirm that the oldest segment is removed when the number of records exceeds max_records.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=6, max_records=2)
+    storage.write("1\x1e\n")
+    storage.write("2\x1e\n")
+    storage.write("3\x1e\n")
+    self.assertEqual(storage.dropped_records, 2)
+    self.assertEqual(storage.read(storage.offset).decode("utf-8"),
+      "3\x1e\n" + SegmentedFileStorage.DROPPED_MESSAGE.format(records=2, bytes=6) + "\x1e\n")
+    storage.close()
+
+  def test_max_bytes_marker_removed(self):
+    """
+    Confirm that the numbers of a marker line removed before it is reported are added to the next marker line,
+    so that the marker lines tell the number of the records lost.
+    * segment_bytes: 1000
+    * max_bytes: 3000
+    * Number of records: 200, each 100 bytes
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=1000, max_bytes=3000)
+    for i in range(200):
+      storage.write("{:098d}\x1e\n".format(i))
+    records = storage.read(storage.offset).decode("utf-8").split("\x1e\n")[:-1]
+    markers = [[int(w) for w in r.split()[0:4:3]] for r in records if r.endswith("dropped because the backlog exceeded its limit.")]
+    lost = 200 - (len(records) - len(markers))
+    self.assertGreater(lost, 0)
+    self.assertEqual([sum(m[0] for m in markers), sum(m[1] for m in markers)], [lost, lost * 100])
+    self.assertEqual(storage.dropped_records, lost)
+    self.assertEqual(storage.dropped_bytes, lost * 100)
+    storage.close()
+
+  def test_handler_get_text(self):
+    """
+    When `ReporterLogHandler` uses `SegmentedFileStorage`, confirm that the marker line is included in the report.
+    """
+    rlh = ReporterLogHandler(storage=SegmentedFileStorage(self.filename, segment_bytes=8, max_bytes=8))
+    rlh.append_log("123456")
+    rlh.append_log("abcdef")
+    self.assertEqual(rlh._filename, self.filename)
+    self.assertEqual(rlh.get_text(),
+      "abcdef\n" + SegmentedFileStorage.DROPPED_MESSAGE.format(records=1, bytes=8) + "\n")
+    self.assertFalse(rlh.has_text)
+    rlh.close()
+
+  #endregion
+
+  #region compression test
+
+  def test_compress(self):
+    """
+    Confirm that the closed segment is compressed into a gzip file and the log is read across the compressed segment.
+    * FRAME_BYTES: 4
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16, compress=True)
+    storage.FRAME_BYTES = 4
+    storage.write("1234567\n")
+    storage.write("abcdefg\n")
+    storage.write("testing\n")
+    self.assertTrue(storage.wait_sealed(5))
+    self.assertEqual([f.name for f in storage.segments], ["segment.log.0000000000000000.gz", "segment.log.0000000000000016"])
+    self.assertEqual(gzip.decompress(storage.segments[0].read_bytes()), b"1234567\nabcdefg\n")
+    self.assertEqual(storage.read(5, 8), b"67\nabcde")
+    self.assertEqual(storage.read(13), b"fg\ntesting\n")
+    storage.commit(16)
+    self.assertEqual(len(storage.segments), 1)
+    storage.close()
+
+  def test_compress_background(self):
+    """
+    Confirm that the writing thread does not wait for the compression, and the uncompressed segment is read until it finishes.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16, compress=True)
+    started = threading.Event()
+    resume = threading.Event()
+    seal = storage._seal
+    def slow_seal(start):
+      started.set()
+      resume.wait(5)
+      return seal(start)
+    storage._seal = slow_seal
+    storage.write("1234567\n")
+    storage.write("abcdefg\n")
+    storage.write("testing\n")
+    self.assertTrue(started.wait(5))
+    self.assertEqual([f.name for f in storage.segments], ["segment.log.0000000000000000", "segment.log.0000000000000016"])
+    self.assertEqual(storage.read(5, 8), b"67\nabcde")
+    resume.set()
+    self.assertTrue(storage.wait_sealed(5))
+    self.assertEqual(storage.segments[0].name, "segment.log.0000000000000000.gz")
+    self.assertEqual(storage.read(5, 8), b"67\nabcde")
+    storage.close()
+
+  def test_compress_removed(self):
+    """
+    Confirm that the segment committed during its compression is removed with the compressed file.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16, compress=True)
+    resume = threading.Event()
+    seal = storage._seal
+    storage._seal = lambda start: resume.wait(5) and seal(start)
+    storage.write("1234567\n")
+    storage.write("abcdefg\n")
+    storage.write("testing\n")
+    storage.commit(16)
+    resume.set()
+    self.assertTrue(storage.wait_sealed(5))
+    self.assertEqual([f.name for f in self.filename.parent.glob("segment.log.00*")], ["segment.log.0000000000000016"])
+    storage.close()
+
+  def test_compress_reopen(self):
+    """
+    Confirm that a new instance reads the compressed segments and counts their records.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16, compress=True)
+    storage.write("123456\x1e\n")
+    storage.write("abcdef\x1e\n")
+    storage.write("testing\n")
+    storage.commit(4)
+    storage.close()
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16, compress=True)
+    self.assertEqual(storage.end, 24)
+    self.assertEqual(storage.pending_records, 2)
+    self.assertEqual(storage.read(storage.offset), b"56\x1e\nabcdef\x1e\ntesting\n")
+    storage.write("message\n")
+    self.assertEqual([f.name for f in storage.segments], ["segment.log.0000000000000000.gz", "segment.log.0000000000000016"])
+    self.assertEqual(storage.read(16), b"testing\nmessage\n")
+    storage.close()
+
+  def test_compress_interrupted(self):
+    """
+    Confirm that the uncompressed segment is used when the compression was interrupted.
+    """
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16)
+    storage.write("1234567\n")
+    storage.close()
+    segment = storage.segments[0]
+    segment.with_name(segment.name + ".gz.tmp").write_bytes(b"broken")
+    storage = SegmentedFileStorage(self.filename, segment_bytes=16, compress=True)
+    self.assertEqual([f.name for f in self.filename.parent.glob("segment.log.*")], [segment.name])
+    self.assertEqual(storage.read(0), b"1234567\n")
+    storage.close()
+
+  #endregion
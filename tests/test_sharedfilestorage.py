@@ -0,0 +1,121 @@
+import multiprocessing
+from pathlib import Path
+import unittest
+
+from logreporter.reporterloghandler import ReporterLogHandler
+from logreporter.storage import sharedfilestorage
+from logreporter.storage import SharedFileStorage
+
+def write_records(filename, name, count):
+  """
+  Write records to the shared log file from a child process.
+  """
+  storage = SharedFileStorage(filename)
+  for i in range(count):
+    storage.write_record("{}-{:04}\n".format(name, i) + name * 50)
+  storage.close()
+
+def try_upload(filename, results):
+  """
+  Try to become the uploader from a child process.
+  """
+  storage = SharedFileStorage(filename)
+  results.put(storage.acquire_uploader())
+
+@unittest.skipIf(sharedfilestorage.fcntl is None, "fcntl is not available.")
+class TestSharedFileStorage(unittest.TestCase):
+  """
+  A test class that verifies the operation of `SharedFileStorage`.
+  """
+
+  #region prepare
+
+  def setUp(self):
+    """
+    Executed for each test method call.
+    """
+    self.filename = Path(__file__).parent / "out" / "shared.log"
+    self.filename.parent.mkdir(exist_ok=True)
+    self.tearDown()
+
+  def tearDown(self):
+    """
+    Executed after each test method call.
+    """
+    for f in self.filename.parent.glob(self.filename.name + "*"):
+      f.unlink()
+
+  #endregion
+
+  #region multi-process test
+
+  def test_concurrent_writers(self):
+    """
+    When several processes write to the same log file at the same time, confirm that no record is mixed with another.
+    * Number of processes: 4
+    * Number of records: 200 per process
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=write_records, args=(self.filename, name, 200)) for name in "abcd"]
+    for p in processes:
+      p.start()
+    for p in processes:
+      p.join()
+    records = self.filename.read_text(encoding="utf-8").split(SharedFileStorage.RECORD_END)
+    self.assertEqual(records.pop(), "")
+    self.assertEqual(len(records), 800)
+    for name in "abcd":
+      texts = [r for r in records if r.startswith(name + "-")]
+      self.assertEqual(texts, ["{}-{:04}\n".format(name, i) + name * 50 for i in range(200)])
+
+  def test_elected_uploader(self):
+    """
+    Confirm that only one process becomes the uploader, and another process can become it after it is released.
+    """
+    storage = SharedFileStorage(self.filename)
+    self.assertTrue(storage.acquire_uploader())
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    p = context.Process(target=try_upload, args=(self.filename, results))
+    p.start()
+    self.assertFalse(results.get(timeout=30))
+    p.join()
+    storage.release_uploader()
+    p = context.Process(target=try_upload, args=(self.filename, results))
+    p.start()
+    self.assertTrue(results.get(timeout=30))
+    p.join()
+
+  #endregion
+
+  #region offset test
+
+  def test_commit_visible(self):
+    """
+    Confirm that the position committed by another instance is used, and the log emptied by it is not read again.
+    """
+    writer = SharedFileStorage(self.filename)
+    uploader = ReporterLogHandler(storage=SharedFileStorage(self.filename))
+    writer.write_record("testing")
+    writer.write_record("message")
+    self.assertEqual(uploader.get_text(max_length=7), "testing")
+    self.assertEqual(writer.offset, 9)
+    self.assertEqual(writer.pending_records, 1)
+    self.assertEqual(uploader.get_text(), "message\n")
+    self.assertEqual(writer.generation, 1)
+    writer.write_record("abcdefg")
+    self.assertEqual(uploader.get_text(), "abcdefg\n")
+    writer.close()
+    uploader.close()
+
+  def test_handler_shared(self):
+    """
+    Confirm that `ReporterLogHandler` uses `SharedFileStorage` when shared is True.
+    """
+    rlh = ReporterLogHandler(filename=self.filename, shared=True)
+    self.assertIsInstance(rlh.storage, SharedFileStorage)
+    rlh.append_log("test")
+    self.assertEqual(rlh.get_text(), "test\n")
+    rlh.close()
+
+  #endregion
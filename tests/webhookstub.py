@@ -0,0 +1,64 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+class WebhookStub(object):
+  """
+  A local HTTP server that imitates Discord's webhook for testing.
+  The received requests are stored in `requests`, and the responses can be set in `responses`.
+  """
+
+  def __init__(self):
+    """
+    Constructor.
+    The server starts listening on a free port of the local host.
+    """
+    self.requests = []
+    self.responses = []
+    stub = self
+
+    class Handler(BaseHTTPRequestHandler):
+      protocol_version = "HTTP/1.1"
+
+      def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        stub.requests.append({
+          "client": self.client_address,
+          "headers": dict(self.headers),
+          "body": body,
+        })
+        status, headers = stub.responses.pop(0) if len(stub.responses) > 0 else (204, {})
+        self.send_response(status)
+        for k, v in headers.items():
+          self.send_header(k, v)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+      def log_message(self, format, *args):
+        pass
+
+    self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    self.server.daemon_threads = True
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    self.thread.start()
+
+  @property
+  def url(self):
+    """
+    URL of the webhook.
+    """
+    return "http://127.0.0.1:{}/api/webhooks/test".format(self.server.server_address[1])
+
+  @property
+  def payloads(self):
+    """
+    JSON payloads of the received requests.
+    """
+    return [json.loads(r["body"]) for r in self.requests]
+
+  def close(self):
+    """
+    Stop the server.
+    """
+    self.server.shutdown()
+    self.server.server_close()